@@ -0,0 +1,299 @@
+import asyncio
+import os
+import random
+import re
+import time
+from collections import OrderedDict, deque
+import httpx
+from cache import MemoryBackend
+import metrics
+from messages import AFFIRMATIONS, QUOTES
+
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")  # e.g. http://127.0.0.1:8700/v1 for bench/fake_openai.py
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "20"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+
+SYSTEM_PROMPT = "You are a motivational coach who helps people refocus."
+MAX_TOKENS = 100
+
+# === /motivate response layer ===
+MOTIVATE_POOL_SIZE = int(os.getenv("MOTIVATE_POOL_SIZE", "5"))               # varied answers kept per prompt
+MOTIVATE_CACHE_TTL = float(os.getenv("MOTIVATE_CACHE_TTL", "21600"))
+MOTIVATE_CACHE_PROMPTS = int(os.getenv("MOTIVATE_CACHE_PROMPTS", "500"))
+MOTIVATE_CACHE_MAX_CHARS = int(os.getenv("MOTIVATE_CACHE_MAX_CHARS", "120"))  # longer prompts are too personal to reuse
+MOTIVATE_USER_BURST_TOKENS = int(os.getenv("MOTIVATE_USER_BURST_TOKENS", "450"))
+MOTIVATE_USER_TOKENS_PER_HOUR = int(os.getenv("MOTIVATE_USER_TOKENS_PER_HOUR", "1500"))
+MOTIVATE_GLOBAL_TOKENS_PER_MINUTE = int(os.getenv("MOTIVATE_GLOBAL_TOKENS_PER_MINUTE", "20000"))
+
+_OPENAI_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30)
+_openai_seconds = metrics.histogram("openai_request_seconds", "Streamed completion wall time", ("outcome",), _OPENAI_BUCKETS)
+_openai_first_token = metrics.histogram("openai_first_token_seconds", "Time to the first streamed token", (), _OPENAI_BUCKETS)
+_motivate_responses = metrics.counter("motivate_responses_total", "/motivate replies by where they came from", ("source",))
+
+_client = None
+
+
+def get_client():
+    """The process-wide AsyncOpenAI client, reusing keep-alive connections across calls."""
+    global _client
+    if _client is None:
+        from openai import AsyncOpenAI  # the SDK is slow to import; many runs never need it
+        timeout = httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+        _client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=OPENAI_BASE_URL,
+            timeout=timeout,
+            max_retries=OPENAI_MAX_RETRIES,
+            http_client=httpx.AsyncClient(
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+                    keepalive_expiry=60,
+                ),
+            ),
+        )
+    return _client
+
+
+async def close():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+async def stream_motivation(prompt):
+    """Yield the coach's reply to ``prompt`` piece by piece as tokens arrive."""
+    stream = await get_client().chat.completions.create(
+        model=OPENAI_MODEL,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=MAX_TOKENS,
+        temperature=0.9,
+        stream=True,
+    )
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def normalize_prompt(prompt):
+    """Case-, punctuation- and whitespace-insensitive form of a prompt, used as the cache key."""
+    return " ".join(re.sub(r"[^\w\s]", " ", prompt.lower()).split())
+
+
+def estimate_tokens(prompt):
+    # ~4 characters per token for English, plus the system prompt and the reply budget.
+    return (len(SYSTEM_PROMPT) + len(prompt)) // 4 + MAX_TOKENS
+
+
+class TokenBucket:
+    def __init__(self, capacity, refill_per_second):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def full(self):
+        self._refill()
+        return self._tokens >= self.capacity
+
+    def try_take(self, amount):
+        self._refill()
+        if self._tokens < amount:
+            return False
+        self._tokens -= amount
+        return True
+
+    def refund(self, amount):
+        self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class MotivationService:
+    """Serves /motivate replies with as few paid completions as possible.
+
+    In order: a prompt whose pool already holds ``pool_size`` varied answers
+    is served from the pool; an identical prompt already in flight shares that
+    call; otherwise a completion is made if both the user's and the global
+    token bucket allow it. Over budget, it answers from the pool if there is
+    one, else from the static affirmation/quote messages.
+    """
+
+    def __init__(self, pool_size=MOTIVATE_POOL_SIZE, cache_ttl=MOTIVATE_CACHE_TTL,
+                 cache_prompts=MOTIVATE_CACHE_PROMPTS, user_burst=MOTIVATE_USER_BURST_TOKENS,
+                 user_per_hour=MOTIVATE_USER_TOKENS_PER_HOUR, global_per_minute=MOTIVATE_GLOBAL_TOKENS_PER_MINUTE,
+                 generate=None, max_users=10000):
+        self.pool_size = pool_size
+        self.user_burst = user_burst
+        self.user_rate = user_per_hour / 3600
+        self.max_users = max_users
+        self._generate = generate or stream_motivation
+        self._pools = MemoryBackend(max_entries=cache_prompts, ttl=cache_ttl)
+        self._inflight = {}
+        self._user_buckets = OrderedDict()
+        self._global_bucket = TokenBucket(global_per_minute, global_per_minute / 60)
+        self._latencies = deque(maxlen=1000)  # seconds per upstream completion
+        self._first_token = deque(maxlen=1000)
+        self.counters = {
+            "requests": 0,
+            "cache_hits": 0,
+            "coalesced": 0,
+            "upstream_calls": 0,
+            "upstream_errors": 0,
+            "budget_denied": 0,
+            "fallbacks": 0,
+        }
+
+    def _user_bucket(self, user_id):
+        bucket = self._user_buckets.get(user_id)
+        if bucket is None:
+            bucket = self._user_buckets[user_id] = TokenBucket(self.user_burst, self.user_rate)
+            if len(self._user_buckets) > self.max_users:
+                # Evict the least recently used user only if their bucket has refilled anyway.
+                oldest, oldest_bucket = next(iter(self._user_buckets.items()))
+                if oldest_bucket.full():
+                    del self._user_buckets[oldest]
+        self._user_buckets.move_to_end(user_id)
+        return bucket
+
+    def _take_budget(self, user_id, cost):
+        user_bucket = self._user_bucket(user_id)
+        if not user_bucket.try_take(cost):
+            return False
+        if not self._global_bucket.try_take(cost):
+            user_bucket.refund(cost)
+            return False
+        return True
+
+    def _pool(self, key):
+        hit, pool = self._pools.get((key,))
+        return pool if hit else []
+
+    def _remember(self, key, text):
+        if len(key) > MOTIVATE_CACHE_MAX_CHARS:
+            return
+        pool = self._pool(key)
+        if text not in pool:
+            self._pools.set((key,), (pool + [text])[-self.pool_size:], self._pools.generation(key))
+
+    def _fallback(self):
+        self.counters["fallbacks"] += 1
+        return random.choice(AFFIRMATIONS + QUOTES)
+
+    async def respond(self, user_id, prompt, on_text=None):
+        """Return ``(text, source)`` where source is cache, coalesced, upstream or fallback.
+
+        ``on_text(text_so_far)`` is awaited as tokens stream in, for upstream calls only.
+        """
+        text, source = await self._respond(user_id, prompt, on_text)
+        _motivate_responses.inc(source=source)
+        return text, source
+
+    async def _respond(self, user_id, prompt, on_text):
+        self.counters["requests"] += 1
+        key = normalize_prompt(prompt)
+        pool = self._pool(key)
+        if len(pool) >= self.pool_size:
+            self.counters["cache_hits"] += 1
+            return random.choice(pool), "cache"
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.counters["coalesced"] += 1
+            try:
+                return await asyncio.shield(inflight), "coalesced"
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise  # this request was cancelled, not the call it was waiting on
+                return self._fallback(), "fallback"
+            except Exception:
+                return self._fallback(), "fallback"
+
+        if not self._take_budget(str(user_id), estimate_tokens(prompt)):
+            self.counters["budget_denied"] += 1
+            if pool:
+                self.counters["cache_hits"] += 1
+                return random.choice(pool), "cache"
+            return self._fallback(), "fallback"
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            text = await self._call_upstream(prompt, on_text)
+            future.set_result(text)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # followers re-raise it; don't warn about it going unretrieved
+            print(f"⚠️ GPT error: {e}")
+            return self._fallback(), "fallback"
+        finally:
+            del self._inflight[key]
+            if not future.done():
+                future.cancel()  # the leader was cancelled: release its followers
+        self._remember(key, text)
+        return text, "upstream"
+
+    async def _call_upstream(self, prompt, on_text):
+        self.counters["upstream_calls"] += 1
+        started = time.perf_counter()
+        text = ""
+        outcome = "ok"
+        try:
+            async for piece in self._generate(prompt):
+                if not text:
+                    self._first_token.append(time.perf_counter() - started)
+                    _openai_first_token.observe(self._first_token[-1])
+                text += piece
+                if on_text is not None:
+                    try:
+                        await on_text(text)
+                    except Exception as e:
+                        # The caller's display failed, not the completion: stop updating it and finish the reply.
+                        print(f"⚠️ /motivate progress update failed: {e}")
+                        on_text = None
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception:
+            self.counters["upstream_errors"] += 1
+            outcome = "error"
+            raise
+        finally:
+            self._latencies.append(time.perf_counter() - started)
+            _openai_seconds.observe(self._latencies[-1], outcome=outcome)
+        text = text.strip()
+        if not text:
+            raise ValueError("empty completion")
+        return text
+
+    def stats(self):
+        def percentile(samples, q):
+            if not samples:
+                return None
+            ordered = sorted(samples)
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+        requests = self.counters["requests"]
+        served_without_upstream = self.counters["cache_hits"] + self.counters["coalesced"]
+        return {
+            **self.counters,
+            "hit_rate": round(served_without_upstream / requests, 3) if requests else 0.0,
+            "cached_prompts": self._pools.size(),
+            "upstream_latency_p50": percentile(self._latencies, 0.5),
+            "upstream_latency_p95": percentile(self._latencies, 0.95),
+            "first_token_p50": percentile(self._first_token, 0.5),
+        }
+
+
+motivation = MotivationService()
@@ -0,0 +1,60 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import db
+
+# One worker per pooled connection: extra workers would only queue on the pool.
+_executor = ThreadPoolExecutor(max_workers=db.DB_POOL_MAX, thread_name_prefix="db")
+
+
+async def run(fn, *args, **kwargs):
+    """Run a blocking ``db`` call on the DB thread pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+def _wrap(fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await run(fn, *args, **kwargs)
+    return wrapper
+
+
+def shutdown():
+    _executor.shutdown(wait=True)
+    db.close_pool()
+
+
+# === Async db API ===
+init_db = _wrap(db.init_db)
+get_state = _wrap(db.get_state)
+set_state = _wrap(db.set_state)
+get_user = _wrap(db.get_user)
+set_reminder = _wrap(db.set_reminder)
+clear_reminder = _wrap(db.clear_reminder)
+add_task = _wrap(db.add_task)
+get_tasks = _wrap(db.get_tasks)
+get_tasks_page = _wrap(db.get_tasks_page)
+get_data_version = _wrap(db.get_data_version)
+search_open_tasks = _wrap(db.search_open_tasks)
+complete_task = _wrap(db.complete_task)
+complete_task_by_id = _wrap(db.complete_task_by_id)
+delete_task = _wrap(db.delete_task)
+add_tasks = _wrap(db.add_tasks)
+complete_tasks = _wrap(db.complete_tasks)
+delete_tasks = _wrap(db.delete_tasks)
+get_calendar_tasks = _wrap(db.get_calendar_tasks)
+search_tasks = _wrap(db.search_tasks)
+get_label_counts = _wrap(db.get_label_counts)
+get_completed_tasks = _wrap(db.get_completed_tasks)
+get_completed_tasks_page = _wrap(db.get_completed_tasks_page)
+count_completed_tasks = _wrap(db.count_completed_tasks)
+get_daily_completion_stats = _wrap(db.get_daily_completion_stats)
+backfill_daily_stats = _wrap(db.backfill_daily_stats)
+clear_completed_tasks = _wrap(db.clear_completed_tasks)
+update_streak = _wrap(db.update_streak)
+recompute_streaks = _wrap(db.recompute_streaks)
+get_streak = _wrap(db.get_streak)
+get_reminder_users = _wrap(db.get_reminder_users)
+set_last_dm = _wrap(db.set_last_dm)
+set_last_dm_many = _wrap(db.set_last_dm_many)
@@ -0,0 +1,173 @@
+"""Drive every dashboard_api.py route with signed session cookies and report latency.
+
+    python -m bench.seed --users 200
+    python -m bench.api --users 200 --requests 500 --concurrency 20
+
+By default the app runs in-process through httpx's ASGI transport, so nothing
+but the database is needed; --url targets a running server instead (it must
+share SESSION_SECRET). /oauth/discord is covered by bench/oauth_login.py and
+the never-ending /events stream is not measured here.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import time
+from base64 import b64encode
+from datetime import date, timedelta
+import httpx
+from itsdangerous import TimestampSigner
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from bench.report import print_table, summarize
+from bench.seed import bench_user_ids
+
+
+def session_cookie(user_id, secret=None):
+    """A ``session`` cookie value as Starlette's SessionMiddleware would sign it."""
+    secret = secret or os.getenv("SESSION_SECRET", "supersecretkey123")
+    session = {"user": {"id": user_id, "username": f"bench#{user_id[-4:]}"}}
+    return TimestampSigner(str(secret)).sign(b64encode(json.dumps(session).encode())).decode()
+
+
+class _Users:
+    """Round-robins over seeded users and remembers task ids created during the run."""
+
+    def __init__(self, user_ids):
+        self.ids = user_ids
+        self._next = itertools.cycle(user_ids)
+        self.cookies = {user_id: session_cookie(user_id) for user_id in user_ids}
+        self.created = {user_id: [] for user_id in user_ids}
+
+    def next(self):
+        return next(self._next)
+
+    def take_created(self, user_id):
+        return self.created[user_id].pop() if self.created[user_id] else None
+
+
+def _record_created(users, user_id, response):
+    if response.status_code == 200:
+        body = response.json()
+        if "task" in body:
+            users.created[user_id].append(body["task"]["id"])
+        users.created[user_id].extend(body.get("ids", []))
+
+
+_METRICS_AUTH = {"Authorization": f"Bearer {os.environ['METRICS_TOKEN']}"} if os.getenv("METRICS_TOKEN") else None
+
+_first = date.today().replace(day=1)
+_MONTH = (_first, (_first + timedelta(days=31)).replace(day=1) - timedelta(days=1))  # this month, for /calendar
+
+# (name, build(user_id, users) -> (method, path, json body[, headers]) or None, after(users, user_id, response))
+ROUTES = [
+    ("GET /status", lambda u, users: ("GET", "/status", None), None),
+    ("GET /me", lambda u, users: ("GET", "/me", None), None),
+    ("GET /tasks/{id}", lambda u, users: ("GET", f"/tasks/{u}", None), None),
+    ("GET /tasks/{id}?limit=50", lambda u, users: ("GET", f"/tasks/{u}?limit=50", None), None),
+    ("GET /streak/{id}", lambda u, users: ("GET", f"/streak/{u}", None), None),
+    ("GET /summary/{id}", lambda u, users: ("GET", f"/summary/{u}", None), None),
+    ("GET /xp/{id}", lambda u, users: ("GET", f"/xp/{u}", None), None),
+    ("GET /xp_heatmap/{id}", lambda u, users: ("GET", f"/xp_heatmap/{u}?days=180", None), None),
+    ("GET /analytics/{id}", lambda u, users: ("GET", f"/analytics/{u}", None), None),
+    ("GET /calendar/{id}", lambda u, users: ("GET", f"/calendar/{u}?from={_MONTH[0]}&to={_MONTH[1]}", None), None),
+    ("GET /tasks/{id}?label=work", lambda u, users: ("GET", f"/tasks/{u}?label=work&limit=50", None), None),
+    ("GET /labels/{id}", lambda u, users: ("GET", f"/labels/{u}", None), None),
+    ("GET /search/{id}", lambda u, users: ("GET", f"/search/{u}?q=bench", None), None),
+    ("GET /dashboard/me", lambda u, users: ("GET", "/dashboard/me?heatmap_days=180", None), None),
+    ("GET /metrics", lambda u, users: ("GET", "/metrics", None, _METRICS_AUTH) if _METRICS_AUTH else None, None),
+    ("POST /task", lambda u, users: ("POST", "/task", {"name": "bench task", "labels": "work", "priority": "high"}),
+     _record_created),
+    ("POST /done", lambda u, users: _with_created(users, u, lambda i: ("POST", "/done", {"user_id": u, "id": i})),
+     None),
+    ("POST /tasks/bulk", lambda u, users: ("POST", "/tasks/bulk", {"tasks": [{"name": f"bulk {n}"} for n in range(20)]}),
+     _record_created),
+    ("POST /tasks/bulk/done", lambda u, users: _with_batch(users, u, 10, lambda ids: ("POST", "/tasks/bulk/done", {"ids": ids})),
+     None),
+    ("POST /tasks/bulk/delete", lambda u, users: _with_batch(users, u, 10, lambda ids: ("POST", "/tasks/bulk/delete", {"ids": ids})),
+     None),
+    ("DELETE /task/{id}", lambda u, users: _with_created(users, u, lambda i: ("DELETE", f"/task/{i}", None)), None),
+    ("POST /logout", lambda u, users: ("POST", "/logout", None), None),
+]
+
+
+def _with_created(users, user_id, build):
+    task_id = users.take_created(user_id)
+    return build(task_id) if task_id is not None else None
+
+
+def _with_batch(users, user_id, size, build):
+    ids = [i for i in (users.take_created(user_id) for _ in range(size)) if i is not None]
+    return build(ids) if ids else None
+
+
+async def run_route(client, users, build, after, requests, concurrency):
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        user_id = users.next()
+        spec = build(user_id, users)
+        if spec is None:
+            return
+        method, path, body, *headers = spec
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body,
+                                                headers={"Cookie": f"session={users.cookies[user_id]}",
+                                                         **(headers[0] if headers else {})})
+            except httpx.HTTPError:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            errors += 1
+        elif after is not None:
+            after(users, user_id, response)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+def _client(url):
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=30)
+    import db
+    import dashboard_api
+
+    db.init_db()  # the ASGI transport does not run startup events
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=dashboard_api.app), base_url="https://bench", timeout=30)
+
+
+async def run(user_count=100, requests=300, concurrency=20, url=None, routes=None):
+    """Measure each route in ROUTES order (writes feed later routes their task ids)."""
+    users = _Users(bench_user_ids(user_count))
+    results = {}
+    async with _client(url) as client:
+        for name, build, after in ROUTES:
+            if routes and name not in routes:
+                continue
+            results[name] = await run_route(client, users, build, after, requests, concurrency)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100, help="Seeded users to spread requests over")
+    parser.add_argument("--requests", type=int, default=300, help="Requests per route")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--url", help="Benchmark a running server instead of the in-process app")
+    args = parser.parse_args()
+    results = asyncio.run(run(args.users, args.requests, args.concurrency, args.url))
+    print_table(f"API — {args.requests} requests/route at concurrency {args.concurrency}", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""Call reliabot.py slash-command callbacks and reminder ticks with fake Discord objects.
+
+    python -m bench.seed --users 200
+    python -m bench.bot --users 200 --iterations 200 --reminder-sizes 100,1000,10000
+
+Nothing talks to Discord or OpenAI: interactions, users and DM channels are
+stand-ins that only record what would have been sent, and /motivate is served
+by a local token generator. Each reminder size schedules that many users due
+now and measures one ``schedule_daily_checkins`` tick.
+"""
+import argparse
+import asyncio
+import time
+import discord
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from bench.report import print_table, summarize
+from bench.seed import bench_user_ids
+
+
+# === Fake Discord objects ===
+class FakeMessage:
+    def __init__(self, content=None):
+        self.content = content
+
+    async def edit(self, content=None, **kwargs):
+        self.content = content
+        return self
+
+
+class FakeChannel:
+    def __init__(self):
+        self.sent = 0
+
+    async def send(self, content=None, **kwargs):
+        self.sent += 1
+        return FakeMessage(content)
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = int(user_id)
+        self.name = f"bench{user_id[-4:]}"
+        self.display_name = self.name
+        self.mention = f"<@{user_id}>"
+        self.dm_channel = None
+
+    async def create_dm(self):
+        self.dm_channel = FakeChannel()
+        return self.dm_channel
+
+
+class FakeResponse:
+    def __init__(self):
+        self.messages = []
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def send_message(self, content=None, **kwargs):
+        self._done = True
+        self.messages.append(content)
+
+    async def defer(self, **kwargs):
+        self._done = True
+
+    async def send_modal(self, modal):
+        self._done = True
+
+
+class FakeFollowup(FakeChannel):
+    pass
+
+
+class FakeInteraction:
+    def __init__(self, user):
+        self.user = user
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+        self.created_at = discord.utils.utcnow()
+        self.command = None
+
+
+class FakeClient:
+    """Enough of ``discord.Client`` for DMFanout: cached users only, no HTTP."""
+
+    def __init__(self):
+        self._users = {}
+
+    def get_user(self, user_id):
+        return self._users.setdefault(user_id, FakeUser(str(user_id)))
+
+    async def fetch_user(self, user_id):
+        return self.get_user(user_id)
+
+
+async def _fake_generate(prompt):
+    for word in "Start with the smallest step you can finish in five minutes.".split():
+        yield word + " "
+
+
+# === Commands ===
+def _command_calls(reliabot, user_id):
+    """(name, coroutine factory) pairs covering every command that doesn't only open a modal."""
+    callbacks = {command.name: command.callback for command in reliabot.bot.tree.get_commands()}
+
+    async def done_by_id(interaction):
+        matches = await reliabot.async_db.search_open_tasks(user_id, "", 1)
+        await callbacks["done"](interaction, f"id:{matches[0][0]}" if matches else "missing task")
+
+    return [
+        ("/motivate", lambda i: callbacks["motivate"](i, "I can't get started on my essay")),
+        ("/affirmation", lambda i: callbacks["affirmation"](i)),
+        ("/panic", lambda i: callbacks["panic"](i)),
+        ("/refocus", lambda i: callbacks["refocus"](i)),
+        ("/review", lambda i: callbacks["review"](i)),
+        ("/buddy", lambda i: callbacks["buddy"](i)),
+        ("/quote", lambda i: callbacks["quote"](i)),
+        ("/addtask", lambda i: callbacks["addtask"](i, "bench task")),
+        ("/addtask (multi-line)", lambda i: callbacks["addtask"](i, "- one\n- two\n- three")),
+        ("/progress", lambda i: callbacks["progress"](i)),
+        ("/done autocomplete", lambda i: reliabot.done_autocomplete(i, "bench")),
+        ("/done", done_by_id),
+        ("/find", lambda i: callbacks["find"](i, "bench")),
+        ("/listdone", lambda i: callbacks["listdone"](i)),
+        ("/summary", lambda i: callbacks["summary"](i)),
+        ("/streak", lambda i: callbacks["streak"](i)),
+        ("/setreminder", lambda i: callbacks["setreminder"](i, 9, 30, "Europe/London")),
+        ("/stopreminder", lambda i: callbacks["stopreminder"](i)),
+        ("/guide", lambda i: callbacks["guide"](i)),
+        ("/whoami", lambda i: callbacks["whoami"](i)),
+    ]
+
+
+async def bench_commands(reliabot, user_ids, iterations):
+    calls = {user_id: dict(_command_calls(reliabot, user_id)) for user_id in user_ids}
+    results = {}
+    for name in calls[user_ids[0]]:
+        latencies = []
+        errors = 0
+        started = time.perf_counter()
+        for n in range(iterations):
+            user_id = user_ids[n % len(user_ids)]
+            call = calls[user_id][name]
+            interaction = FakeInteraction(FakeUser(user_id))
+            t0 = time.perf_counter()
+            try:
+                await call(interaction)
+            except Exception as e:
+                errors += 1
+                if errors == 1:
+                    print(f"⚠️ {name} raised {type(e).__name__}: {e}")
+                continue
+            latencies.append(time.perf_counter() - t0)
+        results[name] = summarize(latencies, time.perf_counter() - started, errors)
+    return results
+
+
+# === Scheduler ===
+async def bench_scheduler(reliabot, sizes):
+    from fanout import DMFanout
+    from scheduler import ReminderScheduler
+
+    results = {}
+    for size in sizes:
+        # 00:00 UTC has always passed today, so catch-up makes every reminder due now.
+        # Ids beyond the seeded population have no users row; their last_dm update is a no-op.
+        rows = [{"user_id": user_id, "reminder_hour": 0, "reminder_minute": 0, "timezone": "UTC", "last_dm": None}
+                for user_id in bench_user_ids(size)]
+        reliabot.reminders = ReminderScheduler()
+        load_started = time.perf_counter()
+        reliabot.reminders.load(rows)
+        load_seconds = time.perf_counter() - load_started
+        reliabot.checkin_fanout = DMFanout(FakeClient(), concurrency=64, rate=1_000_000, cache_size=size)
+
+        started = time.perf_counter()
+        await reliabot.schedule_daily_checkins.coro()
+        tick = time.perf_counter() - started
+        started = time.perf_counter()
+        await reliabot.schedule_daily_checkins.coro()  # nothing due: the idle tick cost
+        idle = time.perf_counter() - started
+        results[str(size)] = {
+            "reminders": size,
+            "load_ms": round(load_seconds * 1000, 2),
+            "tick_ms": round(tick * 1000, 2),
+            "per_user_us": round(tick / size * 1e6, 1),
+            "idle_tick_ms": round(idle * 1000, 3),
+        }
+        print(f"⏰ {size:>7} reminders: load {results[str(size)]['load_ms']} ms, "
+              f"tick {results[str(size)]['tick_ms']} ms, idle tick {results[str(size)]['idle_tick_ms']} ms")
+    return results
+
+
+async def run(user_count=100, iterations=100, reminder_sizes=(100, 1000, 10000)):
+    import ai
+    import reliabot
+
+    reliabot.db.init_db()  # the bot itself migrates in setup_hook, which is not run here
+
+    # Serve /motivate from a local generator with a budget that never runs out.
+    ai.motivation = ai.MotivationService(generate=_fake_generate, global_per_minute=10 ** 9,
+                                         user_burst=10 ** 9, user_per_hour=10 ** 9)
+    user_ids = bench_user_ids(user_count)
+    return {
+        "commands": await bench_commands(reliabot, user_ids, iterations),
+        "scheduler": await bench_scheduler(reliabot, reminder_sizes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100, help="Seeded users to act as")
+    parser.add_argument("--iterations", type=int, default=100, help="Calls per command")
+    parser.add_argument("--reminder-sizes", default="100,1000,10000")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.reminder_sizes.split(",")]
+    results = asyncio.run(run(args.users, args.iterations, sizes))
+    print_table(f"Bot commands — {args.iterations} calls each", results["commands"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Throughput of per-row vs. batched task writes against a real database.
+
+    DATABASE_URL=postgres://... python -m bench.bulk_tasks --tasks 500 --rounds 3
+
+Each round adds N tasks one at a time and then as one batch, then completes
+and deletes them the same two ways. Everything is written under a throwaway
+"bench-" user that is removed afterwards.
+"""
+import argparse
+import time
+import uuid
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import db
+
+
+def _timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def _report(label, count, seconds):
+    print(f"{label:<28} {count:>6} rows  {seconds * 1000:>9.1f} ms  {count / seconds:>9.0f} rows/s")
+
+
+def _cleanup(user_id):
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM tasks WHERE user_id = %s", (user_id,))
+            cur.execute("DELETE FROM user_daily_stats WHERE user_id = %s", (user_id,))
+            cur.execute("DELETE FROM users WHERE user_id = %s", (user_id,))
+
+
+def run_round(user_id, count):
+    names = [f"bench task {i}" for i in range(count)]
+
+    rows, seconds = _timed(lambda: [db.add_task(user_id, name)["id"] for name in names])
+    _report("add_task x N", count, seconds)
+    _, seconds = _timed(lambda: [db.complete_task_by_id(user_id, task_id) for task_id in rows])
+    _report("complete_task_by_id x N", count, seconds)
+    _, seconds = _timed(lambda: [db.delete_task(user_id, task_id) for task_id in rows])
+    _report("delete_task x N", count, seconds)
+
+    ids, seconds = _timed(lambda: db.add_tasks(user_id, names))
+    _report("add_tasks", count, seconds)
+    _, seconds = _timed(lambda: db.complete_tasks(user_id, ids))
+    _report("complete_tasks", count, seconds)
+    _, seconds = _timed(lambda: db.delete_tasks(user_id, ids))
+    _report("delete_tasks", count, seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=500, help="Tasks per round")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    db.init_db()
+    user_id = f"bench-{uuid.uuid4().hex[:12]}"
+    try:
+        for i in range(args.rounds):
+            print(f"— round {i + 1}/{args.rounds}")
+            run_round(user_id, args.tasks)
+    finally:
+        _cleanup(user_id)
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
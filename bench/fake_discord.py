@@ -0,0 +1,41 @@
+"""Local stand-in for the two Discord API calls made by /oauth/discord.
+
+    uvicorn bench.fake_discord:app --port 8701
+    DISCORD_API_BASE=http://127.0.0.1:8701/api uvicorn dashboard_api:app --port 8000
+
+FAKE_DISCORD_DELAY sets the simulated latency of each call (seconds).
+"""
+import asyncio
+import os
+from urllib.parse import parse_qs
+from fastapi import FastAPI, Header, HTTPException, Request
+
+DELAY = float(os.getenv("FAKE_DISCORD_DELAY", "0.05"))
+
+app = FastAPI()
+
+
+@app.post("/api/oauth2/token")
+async def token(request: Request):
+    # Parsed by hand so the stub doesn't need python-multipart for Form fields.
+    form = {key: values[0] for key, values in parse_qs((await request.body()).decode()).items()}
+    await asyncio.sleep(DELAY)
+    if form.get("grant_type") != "authorization_code" or "code" not in form:
+        raise HTTPException(status_code=400, detail="invalid_grant")
+    code = form["code"]
+    return {
+        "access_token": f"fake-{code}",
+        "token_type": "Bearer",
+        "expires_in": 604800,
+        "refresh_token": "fake-refresh",
+        "scope": "identify",
+    }
+
+
+@app.get("/api/users/@me")
+async def me(authorization: str = Header(...)):
+    await asyncio.sleep(DELAY)
+    code = authorization.removeprefix("Bearer fake-")
+    # Derive a stable numeric id from the code so each simulated login is a distinct user.
+    user_id = str(100000000000000000 + sum(ord(c) * 31 ** i for i, c in enumerate(code)) % 10 ** 17)
+    return {"id": user_id, "username": f"bench-{code}", "discriminator": "0"}
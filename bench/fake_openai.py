@@ -0,0 +1,57 @@
+"""Local stand-in for the OpenAI chat-completions endpoint.
+
+    uvicorn bench.fake_openai:app --port 8700
+    OPENAI_BASE_URL=http://127.0.0.1:8700/v1 OPENAI_API_KEY=test python reliabot.py
+
+FAKE_OPENAI_TOKEN_DELAY sets the pause between streamed tokens (seconds).
+"""
+import asyncio
+import json
+import os
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+TOKEN_DELAY = float(os.getenv("FAKE_OPENAI_TOKEN_DELAY", "0.02"))
+REPLY = "You have already started by asking. Pick one small step, do it for five minutes, and let momentum carry you."
+
+app = FastAPI()
+
+
+def _chunk(completion_id, model, delta, finish_reason=None):
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "fake")
+    completion_id = f"chatcmpl-fake-{time.time_ns()}"
+    tokens = [word + " " for word in REPLY.split()]
+
+    if not body.get("stream"):
+        await asyncio.sleep(TOKEN_DELAY * len(tokens))
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": REPLY}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+        }
+
+    async def events():
+        yield f"data: {json.dumps(_chunk(completion_id, model, {'role': 'assistant', 'content': ''}))}\n\n"
+        for token in tokens:
+            await asyncio.sleep(TOKEN_DELAY)
+            yield f"data: {json.dumps(_chunk(completion_id, model, {'content': token}))}\n\n"
+        yield f"data: {json.dumps(_chunk(completion_id, model, {}, 'stop'))}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
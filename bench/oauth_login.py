@@ -0,0 +1,57 @@
+"""Concurrent /oauth/discord logins against a running API backed by bench/fake_discord.py.
+
+    uvicorn bench.fake_discord:app --port 8701
+    DISCORD_API_BASE=http://127.0.0.1:8701/api DISCORD_CLIENT_ID=x DISCORD_CLIENT_SECRET=x \
+        DISCORD_REDIRECT_URI=http://localhost uvicorn dashboard_api:app --port 8000
+    python -m bench.oauth_login --api http://127.0.0.1:8000 --logins 500 --concurrency 50
+
+With blocking HTTP calls in the route, throughput is capped at roughly one
+login per two upstream round trips; with the pooled async client it scales
+with --concurrency.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+
+
+async def login(client, code, latencies):
+    started = time.perf_counter()
+    response = await client.get("/oauth/discord", params={"code": code})
+    latencies.append(time.perf_counter() - started)
+    return response.status_code in (302, 307) and "set-cookie" in response.headers
+
+
+async def run(api, logins, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(base_url=api, follow_redirects=False, timeout=30) as client:
+        async def one(i):
+            async with semaphore:
+                return await login(client, f"code{i}", latencies)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(one(i) for i in range(logins)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ok = sum(results)
+    print(f"{ok}/{logins} logins ok in {elapsed:.2f}s — {ok / elapsed:.1f} logins/s at concurrency {concurrency}")
+    print(f"p50 {statistics.median(latencies) * 1000:.1f} ms   "
+          f"p95 {latencies[int(0.95 * (len(latencies) - 1))] * 1000:.1f} ms   "
+          f"max {latencies[-1] * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--api", default="http://127.0.0.1:8000")
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.api, args.logins, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Latency summaries and JSON result files shared by the bench scripts."""
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(latencies, seconds, errors=0):
+    """Throughput and p50/p95/p99 (milliseconds) for one measured phase."""
+    ordered = sorted(latencies)
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "per_second": round(len(ordered) / seconds, 1) if seconds > 0 else 0.0,
+        "p50_ms": ms(percentile(ordered, 0.50)),
+        "p95_ms": ms(percentile(ordered, 0.95)),
+        "p99_ms": ms(percentile(ordered, 0.99)),
+        "max_ms": ms(ordered[-1] if ordered else None),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path, results, params):
+    """Write ``results`` with enough context to compare runs across commits."""
+    document = {
+        "commit": _git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "params": params,
+        "results": results,
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2)
+    print(f"📝 Results written to {path}")
+
+
+def print_table(title, rows):
+    print(f"\n{title}")
+    print(f"{'':<28} {'req':>7} {'err':>5} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, r in rows.items():
+        print(f"{name:<28} {r['requests']:>7} {r['errors']:>5} {r['per_second']:>9} "
+              f"{r['p50_ms']!s:>9} {r['p95_ms']!s:>9} {r['p99_ms']!s:>9}")
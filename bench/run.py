@@ -0,0 +1,57 @@
+"""Seed, run the API, bot and scheduler benchmarks, and write one JSON result file.
+
+    DATABASE_URL=postgres://localhost/reliabot_bench python -m bench.run --output bench/results/$(git rev-parse --short HEAD).json
+
+Runs offline against a local database: Discord and OpenAI are faked. Compare
+two result files to spot regressions between commits.
+"""
+import argparse
+import asyncio
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import db
+from bench import api, bot
+from bench.report import print_table, write_results
+from bench.seed import seed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--tasks", type=int, default=50, help="Tasks per user")
+    parser.add_argument("--days", type=int, default=90, help="Days of history")
+    parser.add_argument("--requests", type=int, default=300, help="Requests per API route")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=100, help="Calls per bot command")
+    parser.add_argument("--reminder-sizes", default="100,1000,10000")
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse the population from a previous run")
+    parser.add_argument("--output", default="bench/results/latest.json")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.reminder_sizes.split(",")]
+
+    db.init_db()
+    results = {}
+    try:
+        if not args.skip_seed:
+            results["seed"] = seed(args.users, args.tasks, args.days)
+            print(f"🌱 Seeded {results['seed']['users']} users / {results['seed']['tasks']} tasks "
+                  f"in {results['seed']['seconds']}s.")
+
+        async def measure():
+            results["api"] = await api.run(args.users, args.requests, args.concurrency)
+            results.update(await bot.run(args.users, args.iterations, sizes))
+
+        asyncio.run(measure())
+        print_table(f"API — {args.requests} requests/route at concurrency {args.concurrency}", results["api"])
+        print_table(f"Bot commands — {args.iterations} calls each", results["commands"])
+        results["db_pool"] = db.pool_stats()
+        results["cache"] = db.cache_stats()
+        write_results(args.output, results, vars(args))
+    finally:
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Seed a local database with a synthetic population for benchmarks.
+
+    DATABASE_URL=postgres://localhost/reliabot_bench python -m bench.seed --users 200 --tasks 100 --days 120
+    python -m bench.seed --users 200 --clean
+
+Users get deterministic numeric ids (they look like Discord snowflakes, which
+the bot requires), so re-seeding or --clean only touches rows created here.
+Point DATABASE_URL at a throwaway database.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+import psycopg2.extras
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import db
+
+BENCH_ID_BASE = 900_000_000_000_000_000
+LABELS = ["work", "home", "health", "study", "errands", "social"]
+PRIORITIES = ["low", "medium", "high", None]
+RECURRENCES = [None, None, None, "daily", "weekly", "monthly"]
+
+
+def bench_user_ids(count):
+    return [str(BENCH_ID_BASE + i) for i in range(count)]
+
+
+def clean(user_ids):
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM tasks WHERE user_id = ANY(%s)", (user_ids,))
+            cur.execute("DELETE FROM user_daily_stats WHERE user_id = ANY(%s)", (user_ids,))
+            cur.execute("DELETE FROM user_label_counts WHERE user_id = ANY(%s)", (user_ids,))
+            cur.execute("DELETE FROM users WHERE user_id = ANY(%s)", (user_ids,))
+    db.cache.clear()
+    db.task_index.clear()
+
+
+def _task_rows(user_id, tasks, days, completed_share, rng, now):
+    for i in range(tasks):
+        created_at = now - timedelta(days=rng.uniform(0, days))
+        completed = rng.random() < completed_share
+        completed_at = min(now, created_at + timedelta(hours=rng.expovariate(1 / 30))) if completed else None
+        due_at = created_at + timedelta(days=rng.randint(0, 14)) if rng.random() < 0.4 else None
+        labels = ",".join(rng.sample(LABELS, rng.randint(0, 2))) or None
+        yield (
+            user_id, f"Synthetic task {i} for {user_id[-4:]}", completed, created_at, completed_at,
+            completed_at.date() if completed_at else None, "", due_at,
+            rng.choice(RECURRENCES), labels, rng.choice(PRIORITIES),
+        )
+
+
+def seed(users=100, tasks=50, days=90, completed_share=0.6, reminder_share=0.5, random_seed=42):
+    """Create ``users`` users with ``tasks`` tasks each spread over ``days`` days; return stats."""
+    started = time.perf_counter()
+    rng = random.Random(random_seed)
+    now = datetime.now(timezone.utc)
+    user_ids = bench_user_ids(users)
+    clean(user_ids)
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            psycopg2.extras.execute_values(cur, '''
+                INSERT INTO users (user_id, streak, last_check, reminder_hour, reminder_minute, timezone)
+                VALUES %s
+            ''', [
+                (user_id, 0, None, rng.randint(0, 23) if rng.random() < reminder_share else None,
+                 rng.choice([0, 15, 30, 45]), rng.choice(["UTC", "Europe/London", "America/New_York", "Asia/Tokyo"]))
+                for user_id in user_ids
+            ], page_size=1000)
+    rows = 0
+    for user_id in user_ids:
+        # One transaction per user keeps memory flat for large populations.
+        batch = list(_task_rows(user_id, tasks, days, completed_share, rng, now))
+        with db.get_connection() as conn:
+            with conn.cursor() as cur:
+                psycopg2.extras.execute_values(cur, '''
+                    INSERT INTO tasks (user_id, task, completed, created_at, completed_at, completed_date,
+                                       description, due_at, recurrence, labels, priority)
+                    VALUES %s
+                ''', batch, page_size=1000)
+        rows += len(batch)
+    db.backfill_daily_stats(user_ids)
+    db.backfill_labels(user_ids)
+    db.recompute_streaks(user_ids)
+    return {
+        "users": users,
+        "tasks": rows,
+        "days": days,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--tasks", type=int, default=50, help="Tasks per user")
+    parser.add_argument("--days", type=int, default=90, help="Days of history")
+    parser.add_argument("--clean", action="store_true", help="Only remove previously seeded users")
+    args = parser.parse_args()
+
+    db.init_db()
+    try:
+        if args.clean:
+            clean(bench_user_ids(args.users))
+            print(f"🧹 Removed {args.users} bench user(s).")
+        else:
+            result = seed(args.users, args.tasks, args.days)
+            print(f"🌱 Seeded {result['users']} users / {result['tasks']} tasks in {result['seconds']}s.")
+    finally:
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")  # "memory" or "none"
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "60"))
+
+
+class MemoryBackend:
+    """In-process LRU with a TTL per entry, indexed by user for precise invalidation.
+
+    Keys are tuples whose first element is the user id. A backend shared across
+    workers (e.g. Redis) only needs to implement the same methods.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._by_user = {}             # user_id -> {keys}
+        self._generations = {}         # user_id -> int, bumped on every invalidation
+
+    def generation(self, user_id):
+        return self._generations.get(user_id, 0)
+
+    def get(self, key):
+        """Return ``(hit, value)``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                return False, None
+            self._entries.move_to_end(key)
+            return True, entry[1]
+
+    def set(self, key, value, generation):
+        """Store ``value`` unless the user was invalidated since ``generation`` was read."""
+        user_id = key[0]
+        with self._lock:
+            if self._generations.get(user_id, 0) != generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            self._by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            for key in self._by_user.pop(user_id, ()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            for user_id in self._by_user:
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self._entries.clear()
+            self._by_user.clear()
+
+    def size(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        keys = self._by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[key[0]]
+
+
+class NullBackend:
+    """Caches nothing; every lookup is a miss."""
+
+    evictions = 0
+
+    def generation(self, user_id):
+        return 0
+
+    def get(self, key):
+        return False, None
+
+    def set(self, key, value, generation):
+        pass
+
+    def invalidate_user(self, user_id):
+        pass
+
+    def clear(self):
+        pass
+
+    def size(self):
+        return 0
+
+
+BACKENDS = {
+    "memory": MemoryBackend,
+    "none": NullBackend,
+}
+
+
+class Cache:
+    """Per-user read-through cache in front of ``db`` read functions."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def cached(self, name, bypass=lambda: False):
+        """Decorate ``fn(user_id, ...)`` so its result is cached per user and arguments.
+
+        ``bypass()`` returning true skips the cache, e.g. inside a write transaction.
+        """
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(user_id, *args, **kwargs):
+                if bypass():
+                    return fn(user_id, *args, **kwargs)
+                key = (str(user_id), name, args, tuple(sorted(kwargs.items())))
+                hit, value = self.backend.get(key)
+                if hit:
+                    self.hits += 1
+                    return value
+                self.misses += 1
+                generation = self.backend.generation(key[0])
+                value = fn(user_id, *args, **kwargs)
+                self.backend.set(key, value, generation)
+                return value
+            return wrapper
+        return decorator
+
+    def invalidate_user(self, user_id):
+        self.invalidations += 1
+        self.backend.invalidate_user(str(user_id))
+
+    def clear(self):
+        self.invalidations += 1
+        self.backend.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": self.backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.backend.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+def make_cache(backend=CACHE_BACKEND):
+    return Cache(BACKENDS[backend]())
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import os
+import psycopg2
+import psycopg2.extensions
+import db
+
+CHANGEFEED_QUEUE_SIZE = int(os.getenv("CHANGEFEED_QUEUE_SIZE", "100"))
+CHANGEFEED_RECONNECT_SECONDS = float(os.getenv("CHANGEFEED_RECONNECT_SECONDS", "5"))
+CHANGEFEED_POLL_SECONDS = float(os.getenv("CHANGEFEED_POLL_SECONDS", "0.5"))  # DB_BACKEND=sqlite only
+
+
+class ChangeFeed:
+    """Listens on ``db.CHANGE_CHANNEL`` over one dedicated connection and fans events out per user.
+
+    Each notification from another process drops that user's cached reads and
+    open-task index here, so every API worker (and the bot) stays coherent
+    without waiting for the cache TTL. Subscribers get an ``asyncio.Queue`` of
+    ``{"user_id", "events"}`` dicts; a subscriber that falls behind, or any
+    subscriber after the listener reconnects, receives ``{"type": "resync"}``
+    and should reload instead of applying deltas.
+
+    With ``DB_BACKEND=sqlite`` there is no LISTEN; the feed tails the
+    database's change log instead (see ``sqlite_db``).
+    """
+
+    def __init__(self, dsn=None, channel=None, queue_size=CHANGEFEED_QUEUE_SIZE):
+        self.dsn = dsn or db.DATABASE_URL
+        self.channel = channel or db.CHANGE_CHANNEL
+        self.queue_size = queue_size
+        self.received = 0
+        self.dropped = 0
+        self.reconnects = 0
+        self._conn = None
+        self._loop = None
+        self._task = None
+        self._lost = None
+        self._subscribers = {}  # user_id -> {asyncio.Queue}
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._loop = asyncio.get_running_loop()
+            self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(str(user_id), set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        queues = self._subscribers.get(str(user_id))
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[str(user_id)]
+
+    def subscriber_count(self):
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def stats(self):
+        return {
+            "listening": self._conn is not None,
+            "subscribers": self.subscriber_count(),
+            "received": self.received,
+            "dropped": self.dropped,
+            "reconnects": self.reconnects,
+        }
+
+    # === Listener ===
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=3)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {self.channel}")
+        return conn
+
+    async def _run(self):
+        if db.DB_BACKEND == "sqlite":
+            return await self._tail()
+        first = True
+        while True:
+            try:
+                self._conn = await asyncio.to_thread(self._connect)
+            except psycopg2.Error as e:
+                print(f"⚠️ Change feed connect failed: {e}")
+                await asyncio.sleep(CHANGEFEED_RECONNECT_SECONDS)
+                continue
+            if not first:
+                # Anything committed while we were disconnected was missed.
+                self.reconnects += 1
+                self._resync()
+            first = False
+            print(f"📡 Listening for changes on {self.channel}")
+            self._lost = asyncio.Event()
+            self._loop.add_reader(self._conn.fileno(), self._on_readable)
+            try:
+                await self._lost.wait()
+            finally:
+                self._loop.remove_reader(self._conn.fileno())
+                try:
+                    self._conn.close()
+                except psycopg2.Error:
+                    pass
+                self._conn = None
+            print("⚠️ Change feed connection lost; reconnecting")
+            await asyncio.sleep(CHANGEFEED_RECONNECT_SECONDS)
+
+    def _on_readable(self):
+        try:
+            self._conn.poll()
+        except psycopg2.Error:
+            self._lost.set()
+            return
+        while self._conn.notifies:
+            self._dispatch(self._conn.notifies.pop(0).payload)
+
+    # === SQLite change log ===
+    async def _tail(self):
+        """Poll ``PRAGMA data_version`` (it moves on every commit) and dispatch new change-log rows."""
+        import sqlite3
+        import sqlite_db
+
+        last_id = None
+        while True:
+            try:
+                self._conn = sqlite_db.connect()
+                if last_id is None:
+                    last_id = sqlite_db.latest_change_id(self._conn)
+                print(f"📡 Tailing the change log in {sqlite_db.SQLITE_PATH}")
+                version = None
+                while True:
+                    current = self._conn.execute("PRAGMA data_version").fetchone()[0]
+                    if current != version:
+                        version = current
+                        last_id = await self._read_changes(sqlite_db, last_id)
+                    await asyncio.sleep(CHANGEFEED_POLL_SECONDS)
+            except sqlite3.Error as e:
+                print(f"⚠️ Change log read failed: {e}; retrying")
+            finally:
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+            self.reconnects += 1
+            await asyncio.sleep(CHANGEFEED_RECONNECT_SECONDS)
+
+    async def _read_changes(self, sqlite_db, last_id, limit=500):
+        while True:
+            rows = await asyncio.to_thread(sqlite_db.changes_since, self._conn, last_id, limit)
+            if rows and rows[0][0] > last_id + 1:
+                # Rows we never read were pruned already.
+                self._resync()
+            for change_id, payload in rows:
+                self._dispatch(payload)
+                last_id = change_id
+            if len(rows) < limit:
+                return last_id
+
+    def _resync(self):
+        # Drop everything cached here and tell subscribers to reload.
+        db.cache.clear()
+        db.task_index.clear()
+        self._broadcast({"type": "resync"})
+
+    def _dispatch(self, payload):
+        self.received += 1
+        try:
+            change = json.loads(payload)
+        except ValueError:
+            return
+        user_id = str(change["user_id"])
+        if change.get("origin") != db.ORIGIN:
+            # Our own writes were already applied locally after commit.
+            db.cache.invalidate_user(user_id)
+            db.task_index.invalidate_user(user_id)
+        for queue in list(self._subscribers.get(user_id, ())):
+            self._offer(queue, {"user_id": user_id, "events": change["events"]})
+
+    def _broadcast(self, event):
+        for user_id, queues in self._subscribers.items():
+            for queue in list(queues):
+                self._offer(queue, {"user_id": user_id, "events": [event]})
+
+    def _offer(self, queue, message):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A slow client: replace its backlog with one resync marker.
+            self.dropped += 1
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait({"user_id": message["user_id"], "events": [{"type": "resync"}]})
@@ -1,25 +1,45 @@
-﻿from fastapi import FastAPI, HTTPException, Request
+﻿from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
 from starlette.middleware.sessions import SessionMiddleware
 from pydantic import BaseModel, constr
-from typing import Optional
-from collections import defaultdict
-from datetime import datetime
+from typing import List, Optional
+from datetime import date, datetime, timedelta
+import asyncio
+import base64
+import hmac
 import os
 import time
-import requests
+import httpx
+import json
 from urllib.parse import urlencode
 from dotenv import load_dotenv
 import db
-from db import get_connection, migrate_tasks_table
+import async_db
+import metrics
+from changefeed import ChangeFeed
+from scheduler import resolve_timezone
+import recurrence
+import export
 import traceback
 from fastapi import Path
 
 load_dotenv()
 
+BULK_MAX_TASKS = int(os.getenv("BULK_MAX_TASKS", "500"))
+CALENDAR_MAX_DAYS = int(os.getenv("CALENDAR_MAX_DAYS", "366"))
+DISCORD_API_BASE = os.getenv("DISCORD_API_BASE", "https://discord.com/api")  # point at bench/fake_discord.py to load-test logins
+TASKS_MAX_PAGE = int(os.getenv("TASKS_MAX_PAGE", "200"))
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "100"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # /metrics requires "Authorization: Bearer <token>"; unset: no /metrics
+
 app = FastAPI()
 START_TIME = time.time()
+change_feed = ChangeFeed()
 
 # CORS & Session
 app.add_middleware(
@@ -31,6 +51,32 @@ app.add_middleware(
     session_cookie="session"
 )
 
+# === Metrics ===
+_http_seconds = metrics.histogram("http_request_seconds", "API latency until the response starts",
+                                  ("method", "route", "status"))
+_http_in_flight = metrics.gauge("http_requests_in_flight", "API requests being handled")
+metrics.gauge("sse_subscribers", "Open /events streams", fn=change_feed.subscriber_count)
+_in_flight = 0
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    global _in_flight
+    _in_flight += 1
+    _http_in_flight.set(_in_flight)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        _in_flight -= 1
+        _http_in_flight.set(_in_flight)
+        # Label by route template (/tasks/{user_id}), not the raw path, to keep cardinality bounded.
+        route = request.scope.get("route")
+        _http_seconds.observe(time.perf_counter() - started, method=request.method,
+                              route=getattr(route, "path", "unmatched"), status=status)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["https://reliabot.netlify.app"],
@@ -39,6 +85,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# === Outbound HTTP ===
+_http_client = None
+
+def get_http_client():
+    """The process-wide httpx client, reusing keep-alive connections to Discord across logins."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            base_url=DISCORD_API_BASE,
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+                keepalive_expiry=60,
+            ),
+        )
+    return _http_client
+
 # === Models ===
 class TaskCreate(BaseModel):
     name: constr(max_length=255)
@@ -48,18 +112,94 @@ class TaskCreate(BaseModel):
     labels: Optional[str] = None
     priority: Optional[str] = None
 
+class BulkTaskCreate(BaseModel):
+    tasks: List[TaskCreate]
+
+class TaskIds(BaseModel):
+    ids: List[int]
+
 class DoneTask(BaseModel):
     user_id: str
-    task: str
+    task: Optional[str] = None
+    id: Optional[int] = None
+
+# === Conditional GETs ===
+# ETags come from the user's data_version, which every committed write bumps, so
+# an unchanged response is answered with 304 without running its queries.
+# "no-cache" makes browsers store the response but revalidate it on every use.
+
+def _etag(*parts):
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+def _cache_headers(etag):
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+def _not_modified(request, etag):
+    return etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(","))
+
+# === Cursors ===
+# Keyset page positions, handed to clients as opaque URL-safe strings.
+def _encode_cursor(after):
+    if after is None:
+        return None
+    value, task_id = after
+    raw = json.dumps([value.isoformat() if hasattr(value, "isoformat") else value, task_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        value, task_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if value != db.PAGE_NULL_KEY:
+            value = datetime.fromisoformat(value)  # a bad value is a 400 here, not a database error
+        return (value, int(task_id))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 # === Routes ===
 @app.get("/tasks/{user_id}")
-def get_tasks(user_id: str, request: Request):
+async def get_tasks(
+    user_id: str,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    status: Optional[str] = Query(None, pattern="^(open|done)$"),
+    label: Optional[str] = None,
+    priority: Optional[str] = None,
+):
+    """The user's tasks, newest first.
+
+    Without ``limit``/``cursor``/``status``/``label``/``priority`` this is the
+    whole list, as before. With any of them it is one page: ``{"tasks": [...], "next_cursor": ...}``,
+    where ``next_cursor`` (``null`` on the last page) fetches the next one.
+    """
     user = request.session.get("user")
     if not user or str(user.get("id")) != str(user_id):
         print(f"❌ Forbidden: session user {user.get('id') if user else 'None'} tried to access {user_id}")
         raise HTTPException(status_code=403, detail="Forbidden")
-    return db.get_tasks(user_id)
+    etag = _etag(await async_db.get_data_version(user_id))
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=_cache_headers(etag))
+    response.headers.update(_cache_headers(etag))
+    if limit is None and cursor is None and status is None and not label and not priority:
+        return await async_db.get_tasks(user_id)
+    tasks, after = await async_db.get_tasks_page(user_id, min(limit or db.TASKS_PAGE_SIZE, TASKS_MAX_PAGE),
+                                                 _decode_cursor(cursor), status, label=label, priority=priority)
+    return {"tasks": tasks, "next_cursor": _encode_cursor(after)}
+
+@app.get("/labels/{user_id}")
+async def get_labels(user_id: str, request: Request, response: Response):
+    """The user's labels with how many tasks (and open tasks) carry each, by name."""
+    user = request.session.get("user")
+    if not user or str(user.get("id")) != str(user_id):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    etag = _etag(await async_db.get_data_version(user_id))
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=_cache_headers(etag))
+    response.headers.update(_cache_headers(etag))
+    return {"labels": await async_db.get_label_counts(user_id)}
 
 @app.post("/task")
 async def create_task(request: Request, task: TaskCreate):
@@ -68,143 +208,243 @@ async def create_task(request: Request, task: TaskCreate):
         raise HTTPException(status_code=401, detail="Unauthorized")
 
     user_id = str(user["id"])
-    created_at = datetime.utcnow()
 
     try:
-        with get_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    INSERT INTO users (user_id, streak, last_check)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (user_id) DO NOTHING
-                    """,
-                    (user_id, 0, None)
-                )
-
-                cur.execute(
-                    """
-                    INSERT INTO tasks (user_id, task, created_at, due_at, description, recurrence, labels, priority)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    """,
-                    (user_id, task.name, created_at, task.due_at, task.description, task.recurrence, task.labels, task.priority),
-                )
-            conn.commit()
+        created = await async_db.add_task(
+            user_id, task.name,
+            description=task.description,
+            due_at=task.due_at,
+            recurrence=task.recurrence,
+            labels=task.labels,
+            priority=task.priority,
+        )
     except Exception as e:
         print("🚨 ERROR in /task route:", e)
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
-    return {"message": "Task added"}
+    return {"message": "Task added", "task": created}
+
+@app.post("/tasks/bulk")
+async def create_tasks(request: Request, body: BulkTaskCreate):
+    user = request.session.get("user")
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    if len(body.tasks) > BULK_MAX_TASKS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_TASKS} tasks per request.")
+
+    ids = await async_db.add_tasks(str(user["id"]), [
+        {
+            "task": task.name,
+            "description": task.description,
+            "due_at": task.due_at,
+            "recurrence": task.recurrence,
+            "labels": task.labels,
+            "priority": task.priority,
+        }
+        for task in body.tasks
+    ])
+    return {"message": f"{len(ids)} task(s) added", "ids": ids}
+
+@app.post("/tasks/bulk/done")
+async def complete_tasks(request: Request, body: TaskIds):
+    user = request.session.get("user")
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    if len(body.ids) > BULK_MAX_TASKS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_TASKS} tasks per request.")
+
+    completed, streak = await async_db.complete_tasks(str(user["id"]), body.ids)
+    return {"completed": completed, "streak": streak}
+
+@app.post("/tasks/bulk/delete")
+async def delete_tasks(request: Request, body: TaskIds):
+    user = request.session.get("user")
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    if len(body.ids) > BULK_MAX_TASKS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_TASKS} tasks per request.")
+
+    return {"deleted": await async_db.delete_tasks(str(user["id"]), body.ids)}
 
 @app.post("/done")
-def mark_task_done(item: DoneTask, request: Request):
+async def mark_task_done(item: DoneTask, request: Request):
     user = request.session.get("user")
     if not user or str(user.get("id")) != str(item.user_id):
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    success = db.complete_task(item.user_id, item.task)
+    if item.id is not None:
+        success = await async_db.complete_task_by_id(item.user_id, item.id) is not None
+    elif item.task:
+        success = await async_db.complete_task(item.user_id, item.task)
+    else:
+        raise HTTPException(status_code=422, detail="Provide a task id or name.")
     if not success:
         raise HTTPException(status_code=404, detail="Task not found.")
 
-    db.update_streak(item.user_id)
+    await async_db.update_streak(item.user_id)
     return {"message": "Task marked as done."}
 
 @app.get("/streak/{user_id}")
-def get_streak(user_id: str, request: Request):
+async def get_streak(user_id: str, request: Request):
     user = request.session.get("user")
     if not user or str(user.get("id")) != str(user_id):
         print(f"❌ Forbidden: session user {user.get('id') if user else 'None'} tried to access {user_id}")
         raise HTTPException(status_code=403, detail="Forbidden")
-    return {"streak": db.get_streak(user_id)}
-
-@app.get("/summary/{user_id}")
-def get_summary(user_id: str, request: Request):
+    return {"streak": await async_db.get_streak(user_id)}
+
+@app.get("/calendar/{user_id}")
+async def get_calendar(
+    user_id: str,
+    request: Request,
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    tz: Optional[str] = None,
+):
+    """Tasks and recurring-task occurrences on the local days ``from`` to ``to`` (inclusive) in ``tz``."""
     user = request.session.get("user")
     if not user or str(user.get("id")) != str(user_id):
-        print(f"❌ Forbidden: session user {user.get('id') if user else 'None'} tried to access {user_id}")
         raise HTTPException(status_code=403, detail="Forbidden")
-
-    completed = db.get_completed_tasks(user_id)
-    this_week = [t for t in completed if (datetime.now().date() - datetime.strptime(t[1], "%Y-%m-%d").date()).days <= 7]
+    if end < start or (end - start).days >= CALENDAR_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Use a window of 1 to {CALENDAR_MAX_DAYS} days.")
+    try:
+        zone = resolve_timezone(tz)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    end = end + timedelta(days=1)
+    window = (datetime.combine(start, datetime.min.time(), tzinfo=zone),
+              datetime.combine(end, datetime.min.time(), tzinfo=zone))
+    tasks = await async_db.get_calendar_tasks(user_id, *window)
     return {
-        "completed_this_week": len(this_week),
-        "total_completed": len(completed),
-        "streak": db.get_streak(user_id)
+        "from": start.isoformat(),
+        "to": (end - timedelta(days=1)).isoformat(),
+        "timezone": zone.key,
+        "items": recurrence.calendar_items(tasks, start, end, zone),
     }
 
-@app.get("/xp/{user_id}")
-def get_user_xp(user_id: str, request: Request):
-    """Return basic XP stats based on completed tasks."""
+@app.get("/search/{user_id}")
+async def search_tasks(
+    user_id: str,
+    request: Request,
+    q: str = "",
+    status: Optional[str] = Query(None, pattern="^(open|done)$"),
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    label: Optional[str] = None,
+    priority: Optional[str] = None,
+    limit: int = Query(20, ge=1),
+    offset: int = Query(0, ge=0),
+):
+    """Full-text search over a user's task titles, descriptions and labels, best matches first."""
+    user = request.session.get("user")
+    if not user or str(user.get("id")) != str(user_id):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    results = await async_db.search_tasks(user_id, q, status=status, since=since, until=until, label=label,
+                                          priority=priority, limit=min(limit, SEARCH_MAX_RESULTS), offset=offset)
+    return {"query": q, "results": results}
+
+@app.get("/export/{user_id}")
+async def export_history(user_id: str, request: Request, format: str = Query("ndjson", pattern="^(ndjson|csv)$")):
+    """Stream the user's profile, tasks and daily completions as NDJSON or CSV, gzipped if the client accepts it."""
     user = request.session.get("user")
     if not user or str(user.get("id")) != str(user_id):
         raise HTTPException(status_code=403, detail="Forbidden")
+    media_type, extension = export.FORMATS[format]
+    gzip = "gzip" in request.headers.get("accept-encoding", "")
+    headers = {
+        "Content-Disposition": f'attachment; filename="reliabot-export-{user_id}.{extension}"',
+        "Vary": "Accept-Encoding",
+    }
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    # A sync generator: Starlette pulls each chunk in its threadpool, off the event loop.
+    return StreamingResponse(export.iter_export(user_id, format, gzip=gzip), media_type=media_type, headers=headers)
 
-    completed = db.get_completed_tasks(user_id)
-    total_xp = len(completed)
-    level = total_xp // 100
-    progress = total_xp % 100
+# === Payload Helpers ===
+# Shared by the per-widget routes and /dashboard so both return identical shapes.
+def _days_ago(days):
+    return (datetime.now().date() - timedelta(days=days)).isoformat()
 
+def _summary_payload(completed_this_week, total_completed, streak):
+    return {
+        "completed_this_week": completed_this_week,
+        "total_completed": total_completed,
+        "streak": streak
+    }
+
+def _xp_payload(total_xp):
     return {
         "xp": total_xp,
-        "level": level,
-        "progress": progress,
+        "level": total_xp // 100,
+        "progress": total_xp % 100,
     }
 
-@app.get("/xp_heatmap/{user_id}")
-def get_xp_heatmap(user_id: str, request: Request):
+def _heatmap_payload(stats):
+    return {day: row["count"] for day, row in stats.items()}
+
+def _analytics_payload(stats):
+    week_start = _days_ago(7)
+    recent = {day: row for day, row in stats.items() if day >= week_start}
+    return {
+        "daily_counts": {day: row["count"] for day, row in recent.items()},
+        "completion_time_minutes": {
+            day: round(row["avg_seconds"] / 60, 2)
+            for day, row in recent.items()
+            if row["avg_seconds"] is not None
+        }
+    }
+
+def _status_payload():
+    return {
+        "status": "Bot is online",
+        "uptime": round(time.time() - START_TIME),
+        "timestamp": datetime.now().isoformat(),
+        "db_pool": db.pool_stats(),
+        "cache": db.cache_stats(),
+        "changefeed": change_feed.stats()
+    }
+
+@app.get("/summary/{user_id}")
+async def get_summary(user_id: str, request: Request):
     user = request.session.get("user")
     if not user or str(user.get("id")) != str(user_id):
+        print(f"❌ Forbidden: session user {user.get('id') if user else 'None'} tried to access {user_id}")
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    completed_tasks = db.get_completed_tasks(user_id)
-    heatmap_data = defaultdict(int)
+    completed_this_week, total_completed, streak = await asyncio.gather(
+        async_db.count_completed_tasks(user_id, since=_days_ago(7)),
+        async_db.count_completed_tasks(user_id),
+        async_db.get_streak(user_id),
+    )
+    return _summary_payload(completed_this_week, total_completed, streak)
 
-    for _, completed_date_str, _, _ in completed_tasks:
-        try:
-            day = datetime.strptime(completed_date_str, "%Y-%m-%d").strftime("%Y-%m-%d")
-            heatmap_data[day] += 1
-        except:
-            continue
+@app.get("/xp/{user_id}")
+async def get_user_xp(user_id: str, request: Request):
+    """Return basic XP stats based on completed tasks."""
+    user = request.session.get("user")
+    if not user or str(user.get("id")) != str(user_id):
+        raise HTTPException(status_code=403, detail="Forbidden")
 
-    return dict(heatmap_data)
+    return _xp_payload(await async_db.count_completed_tasks(user_id))
+
+@app.get("/xp_heatmap/{user_id}")
+async def get_xp_heatmap(user_id: str, request: Request, days: int = Query(365, ge=1, le=3660)):
+    user = request.session.get("user")
+    if not user or str(user.get("id")) != str(user_id):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    return _heatmap_payload(await async_db.get_daily_completion_stats(user_id, _days_ago(days)))
 
 
 @app.get("/analytics/{user_id}")
-def get_analytics(user_id: str, request: Request):
+async def get_analytics(user_id: str, request: Request):
     user = request.session.get("user")
     if not user or str(user.get("id")) != str(user_id):
         print(f"❌ Forbidden: session user {user.get('id') if user else 'None'} tried to access {user_id}")
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    completed_tasks = db.get_completed_tasks(user_id)
-    daily_counts = defaultdict(int)
-    completion_times_by_day = defaultdict(list)
-
-    for task, completed_date_str, created_at_str, completed_at_str in completed_tasks:
-        try:
-            completed_date = datetime.strptime(completed_date_str, "%Y-%m-%d").date()
-            if (datetime.now().date() - completed_date).days > 7:
-                continue
-
-            daily_counts[completed_date.strftime("%Y-%m-%d")] += 1
-
-            created_at = datetime.fromisoformat(created_at_str)
-            completed_at = datetime.fromisoformat(completed_at_str)
-            completion_seconds = (completed_at - created_at).total_seconds()
-            completion_times_by_day[completed_date.strftime("%Y-%m-%d")].append(completion_seconds)
-        except Exception as e:
-            print("Error processing task:", e)
-
-    average_completion_time = {
-        day: round(sum(times) / len(times) / 60, 2)
-        for day, times in completion_times_by_day.items()
-    }
-
-    return {
-        "daily_counts": dict(daily_counts),
-        "completion_time_minutes": average_completion_time
-    }
+    return _analytics_payload(await async_db.get_daily_completion_stats(user_id, _days_ago(7)))
 
 @app.post("/logout")
 def logout(request: Request):
@@ -212,12 +452,8 @@ def logout(request: Request):
     return {"message": "Logged out"}
 
 @app.get("/status")
-def get_status():
-    return {
-        "status": "Bot is online",
-        "uptime": round(time.time() - START_TIME),
-        "timestamp": datetime.now().isoformat()
-    }
+async def get_status():
+    return _status_payload()
 
 @app.get("/me")
 def get_logged_in_user(request: Request):
@@ -226,6 +462,83 @@ def get_logged_in_user(request: Request):
         raise HTTPException(status_code=401, detail="Not logged in")
     return user
 
+DASHBOARD_FIELDS = ("me", "status", "streak", "tasks", "summary", "xp", "heatmap", "analytics")
+
+def _load_dashboard(user_id, fields, heatmap_days):
+    """Run every query the requested fields need in one read-only transaction."""
+    data = {}
+    with db.read_snapshot():
+        if "tasks" in fields:
+            data["tasks"] = db.get_tasks(user_id)
+        if {"streak", "summary"} & fields:
+            data["streak"] = db.get_streak(user_id)
+        if {"summary", "xp"} & fields:
+            data["total_completed"] = db.count_completed_tasks(user_id)
+        if "summary" in fields:
+            data["completed_this_week"] = db.count_completed_tasks(user_id, since=_days_ago(7))
+        if {"heatmap", "analytics"} & fields:
+            window = heatmap_days if "heatmap" in fields else 7
+            data["daily_stats"] = db.get_daily_completion_stats(user_id, _days_ago(max(window, 7)))
+    return data
+
+@app.get("/dashboard/{user_id}")
+async def get_dashboard(
+    user_id: str,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = None,
+    heatmap_days: int = Query(365, ge=1, le=3660),
+):
+    """Everything the dashboard renders, in one response.
+
+    ``user_id`` may be ``me`` for the session user. ``fields`` is a comma
+    list from DASHBOARD_FIELDS (default: all of them).
+    """
+    user = request.session.get("user")
+    if not user:
+        raise HTTPException(status_code=401, detail="Not logged in")
+    if user_id == "me":
+        user_id = str(user["id"])
+    if str(user.get("id")) != str(user_id):
+        print(f"❌ Forbidden: session user {user.get('id')} tried to access {user_id}")
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    wanted = {f.strip() for f in fields.split(",") if f.strip()} if fields else set(DASHBOARD_FIELDS)
+    unknown = wanted - set(DASHBOARD_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    # /status reports live timings, so only responses without it are cacheable.
+    # Heatmap and analytics windows end today, so the date is part of the tag.
+    if "status" not in wanted:
+        etag = _etag(await async_db.get_data_version(user_id), date.today().isoformat())
+        if _not_modified(request, etag):
+            return Response(status_code=304, headers=_cache_headers(etag))
+        response.headers.update(_cache_headers(etag))
+
+    data = {}
+    if wanted - {"me", "status"}:
+        data = await async_db.run(_load_dashboard, user_id, wanted, heatmap_days)
+    payload = {}
+    if "me" in wanted:
+        payload["me"] = user
+    if "status" in wanted:
+        payload["status"] = _status_payload()
+    if "streak" in wanted:
+        payload["streak"] = data["streak"]
+    if "tasks" in wanted:
+        payload["tasks"] = data["tasks"]
+    if "summary" in wanted:
+        payload["summary"] = _summary_payload(data["completed_this_week"], data["total_completed"], data["streak"])
+    if "xp" in wanted:
+        payload["xp"] = _xp_payload(data["total_completed"])
+    if "heatmap" in wanted:
+        since = _days_ago(heatmap_days)
+        payload["heatmap"] = _heatmap_payload({day: row for day, row in data["daily_stats"].items() if day >= since})
+    if "analytics" in wanted:
+        payload["analytics"] = _analytics_payload(data["daily_stats"])
+    return payload
+
 @app.get("/oauth/discord")
 async def discord_oauth(request: Request, code: str):
     data = {
@@ -238,13 +551,18 @@ async def discord_oauth(request: Request, code: str):
     }
 
     headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    token_response = requests.post("https://discord.com/api/oauth2/token", data=urlencode(data), headers=headers)
-    token_response.raise_for_status()
-    access_token = token_response.json()["access_token"]
+    client = get_http_client()
+    try:
+        token_response = await client.post("/oauth2/token", content=urlencode(data), headers=headers)
+        token_response.raise_for_status()
+        access_token = token_response.json()["access_token"]
 
-    user_response = requests.get("https://discord.com/api/users/@me", headers={"Authorization": f"Bearer {access_token}"})
-    user_response.raise_for_status()
-    user = user_response.json()
+        user_response = await client.get("/users/@me", headers={"Authorization": f"Bearer {access_token}"})
+        user_response.raise_for_status()
+        user = user_response.json()
+    except httpx.HTTPError as e:
+        print(f"🚨 Discord OAuth failed: {e!r}")
+        raise HTTPException(status_code=502, detail="Discord login failed")
 
     request.session["user"] = {
         "id": user["id"],
@@ -254,22 +572,66 @@ async def discord_oauth(request: Request, code: str):
     return RedirectResponse(url="https://reliabot.netlify.app")
 
 @app.delete("/task/{task_id}")
-def delete_task(task_id: int, request: Request):
+async def delete_task(task_id: int, request: Request):
     user = request.session.get("user")
     if not user:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute("DELETE FROM tasks WHERE id = %s AND user_id = %s", (task_id, str(user["id"])))
-            conn.commit()
+    await async_db.delete_task(str(user["id"]), task_id)
     return {"message": "Task deleted"}
 
-# === Startup ===
-@app.on_event("startup")
-def startup():
-    db.init_db()
+@app.get("/metrics")
+def get_metrics(request: Request):
+    # Per-route and OpenAI usage stays off the public app unless a token is configured.
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+# === Live Updates ===
+@app.get("/events")
+async def events(request: Request):
+    """Server-Sent Events stream of the session user's changes, as small deltas.
 
+    Each message is ``{"events": [...]}``; see ``db._changed`` for event types.
+    ``changed`` and ``resync`` mean the client should reload instead.
+    """
+    user = request.session.get("user")
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    user_id = str(user["id"])
+    queue = change_feed.subscribe(user_id)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(queue.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"  # keeps proxies from closing an idle stream
+                    continue
+                yield f"data: {json.dumps({'events': message['events']})}\n\n"
+        finally:
+            change_feed.unsubscribe(user_id, queue)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+# === Startup ===
 @app.on_event("startup")
-def startup_migrate():
-    migrate_tasks_table()
+async def startup():
+    started = time.perf_counter()
+    version = await asyncio.to_thread(db.init_db)  # one version check once the schema is current
+    change_feed.start()
+    print(f"🗄️ Schema version {version}; startup took {time.perf_counter() - started:.2f}s.")
+
+@app.on_event("shutdown")
+async def shutdown():
+    await change_feed.stop()
+    if _http_client is not None:
+        await _http_client.aclose()
+    async_db.shutdown()
@@ -1,41 +1,415 @@
 import psycopg2
 import psycopg2.extras
+import psycopg2.extensions
+import psycopg2.pool
+import collections
+import functools
+import json
 import os
-from datetime import datetime
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from cache import make_cache
+from labels import labels_text, normalize_labels
+from task_index import TaskIndex
+import metrics
 
 DATABASE_URL = os.getenv("DATABASE_URL")  # Set this on Railway
+DB_BACKEND = os.getenv("DB_BACKEND", "postgres")  # "postgres" or "sqlite" (embedded; see sqlite_db.py)
+CHANGE_CHANNEL = os.getenv("DB_CHANGE_CHANNEL", "reliabot_changes")
+DB_NOTIFY = os.getenv("DB_NOTIFY", "1") != "0"
 
+# === Connection Pool ===
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))            # seconds to wait for a free connection
+DB_POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", "30"))      # idle seconds before a checkout is pinged
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))  # seconds before a connection is recycled
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "0"))  # log statements slower than this; 0 disables
+SEARCH_MAX_TERMS = int(os.getenv("SEARCH_MAX_TERMS", "8"))
+TASKS_PAGE_SIZE = int(os.getenv("TASKS_PAGE_SIZE", "50"))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))  # rows fetched per round trip while exporting
+
+
+class PoolTimeout(psycopg2.pool.PoolError):
+    pass
+
+
+class InstrumentedCursor(psycopg2.extras.DictCursor):
+    """DictCursor that times each statement and counts its rows, per calling db function."""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            elapsed = time.perf_counter() - started
+            function = getattr(_local, "function", None) or "other"
+            _query_seconds.observe(elapsed, function=function)
+            if self.rowcount > 0:
+                _query_rows.inc(self.rowcount, function=function)
+            if DB_SLOW_QUERY_MS and elapsed * 1000 >= DB_SLOW_QUERY_MS:
+                statement = " ".join((self.query or b"").decode(errors="replace").split())
+                print(f"🐢 Slow query ({elapsed * 1000:.0f} ms) in {function}: {statement[:500]}")
+
+
+class ConnectionPool:
+    """Thread-safe, bounded pool of psycopg2 connections.
+
+    Checkout blocks (up to ``timeout``) when ``maxconn`` connections are in use.
+    Connections that sat idle longer than ``ping_after`` are pinged before being
+    handed out, and closed, broken or expired connections are replaced.
+    """
+
+    def __init__(self, dsn, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT,
+                 ping_after=DB_POOL_PING_AFTER, max_lifetime=DB_POOL_MAX_LIFETIME):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = max(maxconn, minconn, 1)
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self.max_lifetime = max_lifetime
+        self._cond = threading.Condition()
+        self._idle = []  # [(conn, last_used)], most recently used last
+        self._born = {}  # conn -> creation time, for every open connection
+        self._opening = 0  # slots reserved by checkouts that are still connecting
+        self._closed = False
+        self._counters = {
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "created": 0,
+            "recycled": 0,
+        }
+        for _ in range(minconn):
+            conn = self._connect()
+            self._idle.append((conn, time.monotonic()))
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, cursor_factory=InstrumentedCursor)
+        with self._cond:
+            self._born[conn] = time.monotonic()
+            self._counters["created"] += 1
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._born.pop(conn, None)
+            self._counters["recycled"] += 1
+            self._cond.notify()
+
+    def _healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        now = time.monotonic()
+        if now - self._born.get(conn, now) > self.max_lifetime:
+            return False
+        if now - last_used > self.ping_after:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                return False
+        return True
+
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise psycopg2.pool.PoolError("connection pool is closed")
+                waited = False
+                while not self._idle and len(self._born) + self._opening >= self.maxconn:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters["timeouts"] += 1
+                        raise PoolTimeout(f"no database connection available after {self.timeout}s")
+                    if not waited:
+                        self._counters["waits"] += 1
+                        waited = True
+                    self._cond.wait(remaining)
+                entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    # Reserve the slot, then connect outside the lock.
+                    self._opening += 1
+            if entry is None:
+                try:
+                    conn = self._connect()
+                finally:
+                    with self._cond:
+                        self._opening -= 1
+                        self._cond.notify()
+            else:
+                conn, last_used = entry
+                if not self._healthy(conn, last_used):
+                    self._discard(conn)
+                    continue
+            with self._cond:
+                self._counters["checkouts"] += 1
+            return conn
+
+    def putconn(self, conn):
+        broken = conn.closed or conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN
+        if not broken and conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+        if broken or self._closed:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            size = len(self._born)
+            idle = len(self._idle)
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "size": size,
+                "idle": idle,
+                "in_use": size - idle,
+                **self._counters,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DATABASE_URL)
+    return _pool
+
+
+def pool_stats():
+    return get_pool().stats() if _pool is not None else {"size": 0}
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+# === Read Cache ===
+# Per-user results of the read functions decorated with @_cached. Writes mark
+# the user with _changed(); the entries are dropped once the transaction commits,
+# and other processes hear about it through the change feed (see changefeed.py).
+cache = make_cache()
+
+
+def _in_write_transaction():
+    return getattr(_local, "conn", None) is not None and not getattr(_local, "read_only", False)
+
+
+def _cached(name):
+    # Reads inside a write transaction may see uncommitted rows, so they skip the cache.
+    return cache.cached(name, bypass=_in_write_transaction)
+
+
+def _changed(user_id, event=None):
+    """Mark ``user_id``'s cached reads stale once the current transaction commits.
+
+    ``event`` is a small delta (``{"type": ...}``) published on the change feed;
+    without one, listeners are only told that something changed.
+    """
+    events = _local.changed.setdefault(str(user_id), [])
+    if event is not None:
+        events.append(event)
+
+
+def cache_stats():
+    return cache.stats()
+
+# === Data Versions ===
+# users.data_version counts committed changes per user. It is bumped in the
+# same transaction as the change, so it can stand in for "has anything I can
+# see changed" (ETags, pagers) without reading the data itself.
+
+def _bump_data_versions(conn, user_ids):
+    with conn.cursor() as cur:
+        cur.execute("UPDATE users SET data_version = data_version + 1 WHERE user_id = ANY(%s)", (sorted(user_ids),))
+
+
+@contextmanager
+def without_data_versions():
+    """Don't bump data_version for writes on this thread (migrations that run before the column exists)."""
+    outer, _local.skip_versions = getattr(_local, "skip_versions", False), True
+    try:
+        yield
+    finally:
+        _local.skip_versions = outer
+
+
+@_cached("data_version")
+def get_data_version(user_id):
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT data_version FROM users WHERE user_id = %s", (user_id,))
+            row = cur.fetchone()
+            return row[0] if row else 0
+
+# === Change Feed ===
+# Every committed write NOTIFYs CHANGE_CHANNEL once per changed user. NOTIFY is
+# transactional, so listeners only see writes that committed.
+
+NOTIFY_MAX_BYTES = 7900  # Postgres rejects payloads of 8000 bytes or more
+ORIGIN = uuid.uuid4().hex[:12]  # identifies this process's own notifications (pids can repeat across containers)
+
+
+def _json_default(value):
+    return value.isoformat()
+
+
+def change_payload(user_id, events):
+    payload = json.dumps({"user_id": user_id, "origin": ORIGIN, "events": events or [{"type": "changed"}]},
+                         default=_json_default)
+    if len(payload.encode()) > NOTIFY_MAX_BYTES:
+        payload = json.dumps({"user_id": user_id, "origin": ORIGIN, "events": [{"type": "changed"}]})
+    return payload
+
+
+def _notify(conn, changed):
+    with conn.cursor() as cur:
+        for user_id, events in changed.items():
+            cur.execute("SELECT pg_notify(%s, %s)", (CHANGE_CHANNEL, change_payload(user_id, events)))
+
+# === Open Task Index ===
+# In-memory (id, text) of each user's open tasks for /done autocomplete. Write
+# paths update it with _after_commit() so a rolled-back write never shows up.
+
+def _load_open_tasks(user_id):
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id, task FROM tasks WHERE user_id = %s AND completed = FALSE", (user_id,))
+            return cur.fetchall()
+
+
+task_index = TaskIndex(_load_open_tasks)
+
+
+def _after_commit(fn):
+    """Run ``fn()`` once the current transaction commits."""
+    _local.after_commit.append(fn)
+
+
+def search_open_tasks(user_id, query, limit=25):
+    """Up to ``limit`` ``(id, text)`` open tasks whose text starts with, then contains, ``query``."""
+    return task_index.search(user_id, query, limit)
+
+
+@contextmanager
 def get_connection():
-    return psycopg2.connect(DATABASE_URL, cursor_factory=psycopg2.extras.DictCursor)
+    """Check a pooled connection out for the duration of a ``with`` block.
+
+    The block runs as one transaction: it is committed on success and rolled
+    back on error. Nested ``get_connection()`` calls on the same thread reuse
+    the outer connection, so helpers like ``get_user`` join the caller's
+    transaction instead of checking out a second connection. Users marked
+    with ``_changed()`` have their cached reads dropped after the commit.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        yield conn
+        return
+    pool = get_pool()
+    with _pool_wait_seconds.time():
+        conn = pool.getconn()
+    _local.conn = conn
+    _local.changed = {}
+    _local.after_commit = []
+    try:
+        yield conn
+        if _local.changed and not getattr(_local, "skip_versions", False):
+            _bump_data_versions(conn, _local.changed)
+        if DB_NOTIFY and _local.changed:
+            _notify(conn, _local.changed)
+        conn.commit()
+    except BaseException:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        raise
+    finally:
+        changed, _local.changed = _local.changed, {}
+        after_commit, _local.after_commit = _local.after_commit, []
+        _local.conn = None
+        pool.putconn(conn)
+    for user_id in changed:
+        cache.invalidate_user(user_id)
+    for fn in after_commit:
+        fn()
+
+@contextmanager
+def read_snapshot():
+    """Run several db reads as one consistent, read-only transaction on one connection.
+
+    Calls to other ``db`` functions inside the block join this transaction.
+    Must be entered before any other query on the current thread's connection.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        _local.read_only = True
+        try:
+            yield conn
+        finally:
+            _local.read_only = False
 
 # === Init / Migration ===
 def init_db():
+    """Bring the schema up to date; see migrations.py. Returns the schema version.
+
+    An up-to-date schema is recognized with one query on a pooled connection,
+    so restarts skip the migration connection, advisory lock and DDL.
+    """
+    import migrations  # imported lazily: migrations itself builds on this module
+    version = migrations.current_version()
+    if version >= migrations.LATEST_VERSION:
+        return version
+    return migrations.migrate()
+
+def get_state(key):
+    """The app_state value stored under ``key``, or ``None``."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT value FROM app_state WHERE key = %s", (key,))
+            row = cur.fetchone()
+            return row["value"] if row else None
+
+def set_state(key, value):
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id TEXT PRIMARY KEY,
-                    streak INTEGER DEFAULT 0,
-                    last_check TEXT,
-                    reminder_hour INTEGER,
-                    last_dm TEXT
-                )
-            ''')
-            cur.execute('''
-                CREATE TABLE IF NOT EXISTS tasks (
-                    id SERIAL PRIMARY KEY,
-                    user_id TEXT,
-                    task TEXT,
-                    completed BOOLEAN DEFAULT FALSE,
-                    created_at TEXT,
-                    completed_at TEXT,
-                    completed_date TEXT,
-                    description TEXT DEFAULT '',
-                    due_at TEXT,
-                    FOREIGN KEY (user_id) REFERENCES users(user_id)
-                )
-            ''')
-            conn.commit()
+                INSERT INTO app_state (key, value) VALUES (%s, %s)
+                ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, updated_at = now()
+            ''', (key, value))
 
 def get_user(user_id):
     with get_connection() as conn:
@@ -43,45 +417,62 @@ def get_user(user_id):
             cur.execute("SELECT * FROM users WHERE user_id = %s", (user_id,))
             return cur.fetchone()
 
-def set_reminder(user_id, hour):
+def set_reminder(user_id, hour, minute=0, timezone=None):
+    """Set a user's daily reminder; a ``None`` timezone keeps the one already stored."""
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute('''
-                INSERT INTO users (user_id, reminder_hour)
-                VALUES (%s, %s)
-                ON CONFLICT (user_id) DO UPDATE SET reminder_hour = EXCLUDED.reminder_hour
-            ''', (user_id, hour))
-            conn.commit()
+                INSERT INTO users (user_id, reminder_hour, reminder_minute, timezone)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    reminder_hour = EXCLUDED.reminder_hour,
+                    reminder_minute = EXCLUDED.reminder_minute,
+                    timezone = COALESCE(EXCLUDED.timezone, users.timezone)
+                RETURNING user_id, reminder_hour, reminder_minute, timezone, last_dm
+            ''', (user_id, hour, minute, timezone))
+            row = cur.fetchone()
+            return row
 
 def clear_reminder(user_id):
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("UPDATE users SET reminder_hour = NULL WHERE user_id = %s", (user_id,))
-            conn.commit()
 
-def add_task(user_id, task, description='', due_at=None, recurrence=None):
-    created_at = datetime.now().isoformat()
+def add_task(user_id, task, description='', due_at=None, recurrence=None, labels=None, priority=None):
+    created_at = datetime.now(timezone.utc)
+    labels = labels_text(labels)
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute('''
-                INSERT INTO tasks (user_id, task, completed, created_at, description, due_at, recurrence)
-                VALUES (%s, %s, FALSE, %s, %s, %s, %s)
+                INSERT INTO users (user_id, streak, last_check)
+                VALUES (%s, 0, NULL)
+                ON CONFLICT (user_id) DO NOTHING
+            ''', (user_id,))
+            cur.execute('''
+                INSERT INTO tasks (user_id, task, completed, created_at, description, due_at, recurrence, labels, priority)
+                VALUES (%s, %s, FALSE, %s, %s, %s, %s, %s, %s)
                 RETURNING id
-            ''', (user_id, task, created_at, description, due_at, recurrence))
+            ''', (user_id, task, created_at, description, due_at, recurrence, labels, priority))
             task_id = cur.fetchone()[0]
-            conn.commit()
-            return {
+            _add_labels(cur, user_id, [(task_id, labels)])
+            added = {
                 "id": task_id,
                 "user_id": user_id,
                 "task": task,
                 "description": description,
                 "due_at": due_at,
                 "recurrence": recurrence,
+                "labels": labels,
+                "priority": priority,
                 "completed": False,
                 "created_at": created_at,
                 "completed_at": None
             }
+            _changed(user_id, {"type": "task_added", "task": added})
+            _after_commit(lambda: task_index.add(user_id, task_id, task))
+            return added
 
+@_cached("tasks")
 def get_tasks(user_id):
     with get_connection() as conn:
         with conn.cursor() as cur:
@@ -94,19 +485,355 @@ def get_tasks(user_id):
             rows = cur.fetchall()
             return [dict(row) for row in rows]
 
+# Keyset pages: each page resumes strictly after the sort key of the previous
+# page's last row, so a deep page costs the same as the first and rows added in
+# the meantime don't shift what the next page holds.
+
+def _filter_label_priority(where, params, user_id, label, priority):
+    # The label lookup is an index-only scan of task_labels' (user_id, label, task_id) key.
+    if label:
+        where.append("id IN (SELECT task_id FROM task_labels WHERE user_id = %s AND label = %s)")
+        params.extend((user_id, " ".join(label.split()).lower()))
+    if priority:
+        where.append("priority = %s")
+        params.append(priority)
+
+# Keyset pages order by these expressions. Legacy rows whose timestamps could not
+# be parsed (migration 3) hold NULL there; they sort as -infinity, after every
+# dated row, and a cursor ending on one carries PAGE_NULL_KEY.
+PAGE_NULL_KEY = "-infinity"
+_CREATED_KEY = "COALESCE(created_at, '-infinity'::timestamptz)"
+_COMPLETED_KEY = "COALESCE(completed_date, '-infinity'::date)"
+
+def _page(rows, limit, key):
+    """Split a ``limit + 1`` row fetch into ``(rows, next_after)``; ``next_after`` is ``None`` on the last page."""
+    rows = [dict(row) for row in rows]
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, key(rows[-1])
+
+@_cached("tasks_page")
+def get_tasks_page(user_id, limit=TASKS_PAGE_SIZE, after=None, status=None, label=None, priority=None):
+    """One page of tasks, newest first, as ``(tasks, next_after)``.
+
+    ``after`` is the previous page's ``next_after`` (``None`` for the first
+    page). ``status`` (``"open"`` or ``"done"``), ``label`` and ``priority``
+    narrow the list.
+    """
+    where = ["user_id = %s"]
+    params = [user_id]
+    if status in ("open", "done"):
+        where.append("completed = %s")
+        params.append(status == "done")
+    _filter_label_priority(where, params, user_id, label, priority)
+    if after is not None:
+        where.append(f"({_CREATED_KEY}, id) < (%s::timestamptz, %s)")
+        params.extend(after)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f'''
+                SELECT id, user_id, task, description, due_at, recurrence, labels, priority, completed, created_at, completed_at
+                FROM tasks
+                WHERE {" AND ".join(where)}
+                ORDER BY {_CREATED_KEY} DESC, id DESC
+                LIMIT %s
+            ''', params + [limit + 1])
+            return _page(cur.fetchall(), limit, lambda row: (row["created_at"] or PAGE_NULL_KEY, row["id"]))
+
+def _complete(user_id, where, params):
+    """Complete the open task(s) of ``user_id`` matching ``where``; return ``[(id, text)]``."""
+    completed_date = datetime.now().date()
+    completed_at = datetime.now(timezone.utc)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f'''
+                WITH changed AS (
+                    UPDATE tasks
+                    SET completed = TRUE, completed_date = %s, completed_at = %s
+                    WHERE {where} AND user_id = %s AND completed = FALSE
+                    RETURNING id, task, user_id, completed, completed_date AS day, {_COMPLETION_SECONDS} AS secs
+                ), rolled AS ({_ROLLUP_ADD}),
+                labelled AS ({_LABELS_COMPLETE})
+                SELECT id, task FROM changed
+            ''', (completed_date, completed_at, *params, user_id))
+            done = cur.fetchall()
+            for task_id, _ in done:
+                _changed(user_id, {"type": "task_completed", "id": task_id, "completed_at": completed_at})
+                _after_commit(lambda task_id=task_id: task_index.remove(user_id, task_id))
+            return done
+
 def complete_task(user_id, task):
-    completed_date = datetime.now().date().isoformat()
-    completed_at = datetime.now().isoformat()
+    """Complete the oldest open task named ``task``; return whether one was found."""
+    return bool(_complete(user_id, '''id = (
+        SELECT id FROM tasks
+        WHERE user_id = %s AND task = %s AND completed = FALSE
+        ORDER BY created_at, id
+        LIMIT 1
+    )''', (user_id, task)))
+
+def complete_task_by_id(user_id, task_id):
+    """Complete open task ``task_id`` (by primary key); return its text, or ``None``."""
+    done = _complete(user_id, "id = %s", (task_id,))
+    return done[0][1] if done else None
+
+def delete_task(user_id, task_id):
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f'''
+                WITH changed AS (
+                    DELETE FROM tasks
+                    WHERE id = %s AND user_id = %s
+                    RETURNING id, user_id, completed, completed_date AS day, {_COMPLETION_SECONDS} AS secs
+                ), rolled AS ({_ROLLUP_SUBTRACT}),
+                labelled AS ({_LABELS_DELETE})
+                SELECT COUNT(*) FROM changed
+            ''', (task_id, user_id))
+            deleted = cur.fetchone()[0] > 0
+            if deleted:  # a miss changes nothing: no version bump, invalidation or NOTIFY
+                _changed(user_id, {"type": "task_deleted", "id": task_id})
+                _after_commit(lambda: task_index.remove(user_id, task_id))
+            return deleted
+
+# === Bulk Task Writes ===
+# One transaction and one statement per batch, for pasted task lists and
+# multi-select actions on the dashboard.
+
+_TASK_FIELDS = ("task", "description", "due_at", "recurrence", "labels", "priority")
+
+def add_tasks(user_id, tasks):
+    """Insert many tasks for ``user_id`` in one statement; return their ids in input order.
+
+    ``tasks`` holds task names or dicts with the ``add_task`` keyword fields.
+    """
+    tasks = [{"task": t} if isinstance(t, str) else t for t in tasks]
+    if not tasks:
+        return []
+    created_at = datetime.now(timezone.utc)
+    tasks = [{**t, "labels": labels_text(t.get("labels"))} for t in tasks]
+    rows = [
+        (user_id, created_at, *(t.get(field) for field in _TASK_FIELDS))
+        for t in tasks
+    ]
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute('''
-                UPDATE tasks
-                SET completed = TRUE, completed_date = %s, completed_at = %s
-                WHERE user_id = %s AND task = %s AND completed = FALSE
-            ''', (completed_date, completed_at, user_id, task))
-            conn.commit()
-            return cur.rowcount > 0
+                INSERT INTO users (user_id, streak, last_check)
+                VALUES (%s, 0, NULL)
+                ON CONFLICT (user_id) DO NOTHING
+            ''', (user_id,))
+            ids = psycopg2.extras.execute_values(cur, '''
+                INSERT INTO tasks (user_id, created_at, task, description, due_at, recurrence, labels, priority, completed)
+                VALUES %s
+                RETURNING id
+            ''', rows, template="(%s, %s, %s, COALESCE(%s, ''), %s, %s, %s, %s, FALSE)",
+                page_size=len(rows), fetch=True)
+            ids = [row[0] for row in ids]
+            _add_labels(cur, user_id, [(task_id, t["labels"]) for task_id, t in zip(ids, tasks)])
+            _changed(user_id)
+            for task_id, row in zip(ids, rows):
+                added = dict(zip(("id", "user_id", "created_at") + _TASK_FIELDS, (task_id, *row)))
+                added.update(description=added["description"] or "", completed=False, completed_at=None)
+                _changed(user_id, {"type": "task_added", "task": added})
+                _after_commit(lambda task_id=task_id, text=added["task"]: task_index.add(user_id, task_id, text))
+            return ids
+
+def complete_tasks(user_id, task_ids):
+    """Complete many open tasks by id and check in once; return ``(completed_ids, streak)``.
+
+    The streak is only touched when at least one task was completed; otherwise
+    ``streak`` is ``None``.
+    """
+    if not task_ids:
+        return [], None
+    with get_connection():
+        done = _complete(user_id, "id = ANY(%s)", (list(task_ids),))
+        streak = update_streak(user_id) if done else None
+        return [task_id for task_id, _ in done], streak
+
+def delete_tasks(user_id, task_ids):
+    """Delete many of ``user_id``'s tasks by id in one statement; return the deleted ids."""
+    if not task_ids:
+        return []
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f'''
+                WITH changed AS (
+                    DELETE FROM tasks
+                    WHERE id = ANY(%s) AND user_id = %s
+                    RETURNING id, user_id, completed, completed_date AS day, {_COMPLETION_SECONDS} AS secs
+                ), rolled AS ({_ROLLUP_SUBTRACT}),
+                labelled AS ({_LABELS_DELETE})
+                SELECT id FROM changed
+            ''', (list(task_ids), user_id))
+            deleted = [row[0] for row in cur.fetchall()]
+            for task_id in deleted:
+                _changed(user_id, {"type": "task_deleted", "id": task_id})
+                _after_commit(lambda task_id=task_id: task_index.remove(user_id, task_id))
+            return deleted
 
+# === Labels ===
+# tasks.labels keeps the comma string clients display, normalized by labels.py.
+# task_labels maps (user_id, label) to task ids for indexed filtering, and
+# user_label_counts holds each user's per-label totals, kept current by the
+# same statements that add, complete and delete tasks, so listing a user's
+# labels reads one row per label instead of every task.
+
+def _add_labels(cur, user_id, tasks):
+    """Map newly added open tasks ``[(task_id, labels)]`` to their labels and count them."""
+    rows = [(user_id, label, task_id) for task_id, labels in tasks for label in normalize_labels(labels)]
+    if not rows:
+        return
+    psycopg2.extras.execute_values(cur, "INSERT INTO task_labels (user_id, label, task_id) VALUES %s",
+                                   rows, page_size=len(rows))
+    counts = collections.Counter(label for _, label, _ in rows)
+    psycopg2.extras.execute_values(cur, '''
+        INSERT INTO user_label_counts (user_id, label, task_count, open_count)
+        VALUES %s
+        ON CONFLICT (user_id, label) DO UPDATE SET
+            task_count = user_label_counts.task_count + EXCLUDED.task_count,
+            open_count = user_label_counts.open_count + EXCLUDED.open_count
+    ''', [(user_id, label, n, n) for label, n in sorted(counts.items())], page_size=len(counts))
+
+# Apply a ``changed (id, user_id, completed)`` CTE of just-completed or deleted
+# tasks to user_label_counts. A statement reads task_labels as it was before it
+# ran, so deleted tasks' rows (removed by ON DELETE CASCADE) are still counted.
+_LABELS_APPLY = '''
+    UPDATE user_label_counts c
+    SET {assignments}
+    FROM (
+        SELECT tl.user_id, tl.label, COUNT(*) AS tasks,
+               COUNT(*) FILTER (WHERE NOT COALESCE(changed.completed, FALSE)) AS was_open
+        FROM changed JOIN task_labels tl ON tl.task_id = changed.id
+        GROUP BY tl.user_id, tl.label
+    ) x
+    WHERE c.user_id = x.user_id AND c.label = x.label
+'''
+_LABELS_COMPLETE = _LABELS_APPLY.format(assignments="open_count = c.open_count - x.tasks")
+_LABELS_DELETE = _LABELS_APPLY.format(assignments="task_count = c.task_count - x.tasks, open_count = c.open_count - x.was_open")
+
+def backfill_labels(user_ids=None):
+    """Rebuild task_labels and user_label_counts from tasks.labels, for ``user_ids`` or for everyone."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            ids = (user_ids, user_ids)
+            cur.execute("DELETE FROM task_labels WHERE %s::text[] IS NULL OR user_id = ANY(%s::text[])", ids)
+            cur.execute("DELETE FROM user_label_counts WHERE %s::text[] IS NULL OR user_id = ANY(%s::text[])", ids)
+            cur.execute('''
+                INSERT INTO task_labels (user_id, label, task_id)
+                SELECT DISTINCT t.user_id, lower(btrim(regexp_replace(l.label, '[[:space:]]+', ' ', 'g'))), t.id
+                FROM tasks t, unnest(string_to_array(t.labels, ',')) AS l(label)
+                WHERE t.labels IS NOT NULL AND btrim(regexp_replace(l.label, '[[:space:]]+', ' ', 'g')) <> ''
+                  AND (%s::text[] IS NULL OR t.user_id = ANY(%s::text[]))
+            ''', ids)
+            cur.execute('''
+                INSERT INTO user_label_counts (user_id, label, task_count, open_count)
+                SELECT tl.user_id, tl.label, COUNT(*), COUNT(*) FILTER (WHERE NOT COALESCE(t.completed, FALSE))
+                FROM task_labels tl JOIN tasks t ON t.id = tl.task_id
+                WHERE %s::text[] IS NULL OR tl.user_id = ANY(%s::text[])
+                GROUP BY tl.user_id, tl.label
+            ''', ids)
+            rows = cur.rowcount
+            for user_id in user_ids or ():
+                _changed(user_id)
+    if user_ids is None:
+        cache.clear()
+    return rows
+
+@_cached("labels")
+def get_label_counts(user_id):
+    """``[('label', 'tasks', 'open')]`` for each label the user has tasks under, by name."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute('''
+                SELECT label, task_count AS tasks, open_count AS open
+                FROM user_label_counts
+                WHERE user_id = %s AND task_count > 0
+                ORDER BY label
+            ''', (user_id,))
+            return [dict(row) for row in cur.fetchall()]
+
+# === Calendar ===
+# One-off tasks are found with range scans on (user_id, due_at) and, for tasks
+# without a due date, (user_id, created_at); recurring tasks come from a small
+# partial index and are expanded in recurrence.py.
+
+_CALENDAR_COLUMNS = "id, task, description, due_at, recurrence, labels, priority, completed, created_at, completed_at"
+
+@_cached("calendar")
+def get_calendar_tasks(user_id, start, end):
+    """Tasks that can show up between ``start`` and ``end`` (aware datetimes).
+
+    That is one-off tasks due in the window (or created in it, if undated), and
+    recurring tasks that began before it ends and were still open when it starts.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f'''
+                SELECT {_CALENDAR_COLUMNS} FROM tasks
+                WHERE user_id = %s AND COALESCE(recurrence, '') = ''
+                  AND due_at >= %s AND due_at < %s
+                UNION ALL
+                SELECT {_CALENDAR_COLUMNS} FROM tasks
+                WHERE user_id = %s AND COALESCE(recurrence, '') = ''
+                  AND due_at IS NULL AND created_at >= %s AND created_at < %s
+                UNION ALL
+                SELECT {_CALENDAR_COLUMNS} FROM tasks
+                WHERE user_id = %s AND recurrence IS NOT NULL AND recurrence <> ''
+                  AND COALESCE(due_at, created_at) < %s
+                  AND (completed = FALSE OR completed_at >= %s)
+            ''', (user_id, start, end, user_id, start, end, user_id, end, start))
+            return [dict(row) for row in cur.fetchall()]
+
+# === Task Search ===
+# Full-text search over title (ranked highest), labels and description through
+# the GIN expression index from migration 7. Every query word matches as a prefix.
+
+_SEARCH_COLUMNS = "id, task, description, due_at, recurrence, labels, priority, completed, created_at, completed_at"
+_SEARCH_DOCUMENT = "reliabot_task_document(task, description, labels)"
+
+def search_terms(query):
+    """The lowercased words of ``query`` that are searched for (at most SEARCH_MAX_TERMS)."""
+    return re.findall(r"[^\W_]+", (query or "").lower())[:SEARCH_MAX_TERMS]
+
+@_cached("search")
+def search_tasks(user_id, query, status=None, since=None, until=None, label=None, priority=None, limit=20, offset=0):
+    """Best matches first (most recent first without search words), as task dicts with a ``rank``.
+
+    ``status`` is ``"open"`` or ``"done"``; ``since``/``until`` bound the day a
+    task was completed, or created if it is still open; ``label`` must be one
+    of the task's labels and ``priority`` its priority.
+    """
+    terms = search_terms(query)
+    tsquery = " & ".join(f"{term}:*" for term in terms)
+    where = ["user_id = %s"]
+    params = [user_id]
+    if terms:
+        where.append(f"{_SEARCH_DOCUMENT} @@ to_tsquery('simple', %s)")
+        params.append(tsquery)
+    if status in ("open", "done"):
+        where.append("completed = %s")
+        params.append(status == "done")
+    if since is not None:
+        where.append("COALESCE(completed_at, created_at) >= %s::date")
+        params.append(since)
+    if until is not None:
+        where.append("COALESCE(completed_at, created_at) < %s::date + 1")
+        params.append(until)
+    _filter_label_priority(where, params, user_id, label, priority)
+    rank = f"ts_rank({_SEARCH_DOCUMENT}, to_tsquery('simple', %s))" if terms else "0"
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f'''
+                SELECT {_SEARCH_COLUMNS}, {rank} AS rank
+                FROM tasks
+                WHERE {" AND ".join(where)}
+                ORDER BY rank DESC, created_at DESC, id DESC
+                LIMIT %s OFFSET %s
+            ''', ([tsquery] if terms else []) + params + [limit, offset])
+            return [dict(row) for row in cur.fetchall()]
+
+@_cached("completed_tasks")
 def get_completed_tasks(user_id):
     with get_connection() as conn:
         with conn.cursor() as cur:
@@ -118,37 +845,180 @@ def get_completed_tasks(user_id):
             ''', (user_id,))
             return cur.fetchall()
 
+@_cached("completed_page")
+def get_completed_tasks_page(user_id, limit=TASKS_PAGE_SIZE, after=None):
+    """One page of completed tasks, most recently completed first, as ``(tasks, next_after)``."""
+    keyset = f"AND ({_COMPLETED_KEY}, id) < (%s::date, %s)" if after is not None else ""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f'''
+                SELECT id, task, completed_date, created_at, completed_at
+                FROM tasks
+                WHERE user_id = %s AND completed = TRUE {keyset}
+                ORDER BY {_COMPLETED_KEY} DESC, id DESC
+                LIMIT %s
+            ''', [user_id, *(after or ()), limit + 1])
+            return _page(cur.fetchall(), limit, lambda row: (row["completed_date"] or PAGE_NULL_KEY, row["id"]))
+
+# === Daily Stats Rollup ===
+# user_daily_stats holds one row per user and completion day. Every write that
+# completes or removes a completed task folds its change into the rollup in the
+# same statement, so the aggregate readers below never touch raw task rows.
+
+# Seconds from creation to completion of a tasks row (NULL if either is missing).
+_COMPLETION_SECONDS = "EXTRACT(EPOCH FROM completed_at - created_at)"
+
+# Applies a ``changed (user_id, completed, day, secs)`` CTE to user_daily_stats.
+_ROLLUP_APPLY = '''
+    INSERT INTO user_daily_stats (user_id, day, completed_count, timed_count, total_completion_seconds)
+    SELECT user_id, day, {sign}COUNT(*), {sign}COUNT(secs), {sign}COALESCE(SUM(secs), 0)
+    FROM changed
+    WHERE completed AND day IS NOT NULL
+    GROUP BY user_id, day
+    ON CONFLICT (user_id, day) DO UPDATE SET
+        completed_count = user_daily_stats.completed_count + EXCLUDED.completed_count,
+        timed_count = user_daily_stats.timed_count + EXCLUDED.timed_count,
+        total_completion_seconds = user_daily_stats.total_completion_seconds + EXCLUDED.total_completion_seconds
+'''
+_ROLLUP_ADD = _ROLLUP_APPLY.format(sign="")
+_ROLLUP_SUBTRACT = _ROLLUP_APPLY.format(sign="-")
+
+def backfill_daily_stats(user_ids=None):
+    """Rebuild user_daily_stats from tasks, for ``user_ids`` or for everyone."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "DELETE FROM user_daily_stats WHERE %s::text[] IS NULL OR user_id = ANY(%s::text[])",
+                (user_ids, user_ids)
+            )
+            cur.execute(f'''
+                WITH changed AS (
+                    SELECT user_id, completed, completed_date AS day, {_COMPLETION_SECONDS} AS secs
+                    FROM tasks
+                    WHERE completed = TRUE AND (%s::text[] IS NULL OR user_id = ANY(%s::text[]))
+                ) {_ROLLUP_ADD}
+            ''', (user_ids, user_ids))
+            rows = cur.rowcount
+            for user_id in user_ids or ():
+                _changed(user_id)
+    if user_ids is None:
+        cache.clear()
+    return rows
+
+@_cached("completed_count")
+def count_completed_tasks(user_id, since=None):
+    """Number of completed tasks, optionally only those completed on or after ``since``."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute('''
+                SELECT COALESCE(SUM(completed_count), 0)
+                FROM user_daily_stats
+                WHERE user_id = %s
+                  AND (%s::date IS NULL OR day >= %s::date)
+            ''', (user_id, since, since))
+            return cur.fetchone()[0]
+
+@_cached("daily_stats")
+def get_daily_completion_stats(user_id, since, until=None):
+    """Per-day completion count and average completion time for ``since <= day [<= until]``.
+
+    ``since``/``until`` are dates or ISO date strings. Returns
+    ``{"YYYY-MM-DD": {"count": n, "avg_seconds": s}}``; ``avg_seconds``
+    is ``None`` for days without usable timestamps.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute('''
+                SELECT day,
+                       completed_count,
+                       total_completion_seconds / NULLIF(timed_count, 0)
+                FROM user_daily_stats
+                WHERE user_id = %s AND completed_count > 0
+                  AND day >= %s::date
+                  AND (%s::date IS NULL OR day <= %s::date)
+                ORDER BY day
+            ''', (user_id, since, until, until))
+            return {
+                day.isoformat(): {"count": count, "avg_seconds": float(avg) if avg is not None else None}
+                for day, count, avg in cur.fetchall()
+            }
+
 def clear_completed_tasks(user_id):
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute("DELETE FROM tasks WHERE user_id = %s AND completed = TRUE", (user_id,))
-            conn.commit()
+            cur.execute(f'''
+                WITH changed AS (
+                    DELETE FROM tasks WHERE user_id = %s AND completed = TRUE
+                    RETURNING id, user_id, completed
+                ), labelled AS ({_LABELS_DELETE})
+                SELECT COUNT(*) FROM changed
+            ''', (user_id,))
+            # Only completed tasks feed the rollup, so nothing is left for this user.
+            cur.execute("DELETE FROM user_daily_stats WHERE user_id = %s", (user_id,))
+            _changed(user_id, {"type": "completed_cleared"})
 
-def update_streak(user_id):
-    today = str(datetime.now().date())
-    user = get_user(user_id)
+# === Streak Engine ===
+# A check-in is one upsert: the row is locked by ON CONFLICT, the new streak is
+# computed from last_check in SQL, and the result comes back via RETURNING, so
+# concurrent check-ins from the bot and the API serialize instead of racing.
+
+def update_streak(user_id, today=None):
+    """Record a check-in for ``today`` (default: the server's local date); return the new streak."""
+    today = today or datetime.now().date()
     with get_connection() as conn:
         with conn.cursor() as cur:
-            if not user:
-                cur.execute("INSERT INTO users (user_id, streak, last_check) VALUES (%s, 1, %s)", (user_id, today))
-                conn.commit()
-                return 1
-            else:
-                last_check = user[2]
-                streak = user[1] or 0
-                if last_check != today:
-                    if last_check:
-                        last_date = datetime.strptime(last_check, "%Y-%m-%d").date()
-                        if (datetime.now().date() - last_date).days == 1:
-                            streak += 1
-                        else:
-                            streak = 1
-                    else:
-                        streak = 1
-                    cur.execute("UPDATE users SET streak = %s, last_check = %s WHERE user_id = %s", (streak, today, user_id))
-                    conn.commit()
-                return streak
+            cur.execute('''
+                INSERT INTO users (user_id, streak, last_check)
+                VALUES (%s, 1, %s::date)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    streak = CASE
+                        WHEN users.last_check >= EXCLUDED.last_check THEN COALESCE(users.streak, 0)
+                        WHEN users.last_check = EXCLUDED.last_check - 1 THEN COALESCE(users.streak, 0) + 1
+                        ELSE 1
+                    END,
+                    last_check = GREATEST(users.last_check, EXCLUDED.last_check)
+                RETURNING streak
+            ''', (user_id, today))
+            streak = cur.fetchone()[0]
+            _changed(user_id, {"type": "streak", "streak": streak})
+            return streak
+
+def recompute_streaks(user_ids=None, today=None):
+    """Rebuild ``streak``/``last_check`` from completion days, for ``user_ids`` or for everyone.
+
+    The streak becomes the length of the latest run of consecutive days with a
+    completed task (up to ``today``). Users who checked in after their last
+    completion day keep their current streak. Returns the number of users updated.
+    """
+    today = today or datetime.now().date()
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute('''
+                WITH days AS (
+                    SELECT user_id, day,
+                           day - (ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY day))::int AS run
+                    FROM user_daily_stats
+                    WHERE completed_count > 0 AND day <= %s::date
+                      AND (%s::text[] IS NULL OR user_id = ANY(%s::text[]))
+                ), latest AS (
+                    SELECT DISTINCT ON (user_id) user_id, MAX(day) AS last_day, COUNT(*) AS length
+                    FROM days
+                    GROUP BY user_id, run
+                    ORDER BY user_id, MAX(day) DESC
+                )
+                UPDATE users
+                SET streak = latest.length, last_check = latest.last_day
+                FROM latest
+                WHERE users.user_id = latest.user_id
+                  AND (users.last_check IS NULL OR users.last_check <= latest.last_day)
+                RETURNING users.user_id, users.streak
+            ''', (today, user_ids, user_ids))
+            updated = cur.fetchall()
+            for user_id, streak in updated:
+                _changed(user_id, {"type": "streak", "streak": streak})
+            return len(updated)
 
+@_cached("streak")
 def get_streak(user_id):
     user = get_user(user_id)
     return user[1] if user else 0
@@ -156,16 +1026,133 @@ def get_streak(user_id):
 def get_reminder_users():
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT user_id, reminder_hour, last_dm FROM users WHERE reminder_hour IS NOT NULL")
+            cur.execute('''
+                SELECT user_id, reminder_hour, reminder_minute, timezone, last_dm
+                FROM users
+                WHERE reminder_hour IS NOT NULL
+            ''')
             return cur.fetchall()
 
 def set_last_dm(user_id, date):
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("UPDATE users SET last_dm = %s WHERE user_id = %s", (date, user_id))
-            conn.commit()
 
+def set_last_dm_many(pairs):
+    """Record ``last_dm`` for a batch of ``(user_id, date)`` pairs in one statement."""
+    if not pairs:
+        return 0
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            psycopg2.extras.execute_values(cur, '''
+                UPDATE users SET last_dm = v.last_dm::date
+                FROM (VALUES %s) AS v(user_id, last_dm)
+                WHERE users.user_id = v.user_id
+            ''', pairs, page_size=max(len(pairs), 100))
+            return cur.rowcount
 
-def migrate_tasks_table():
-    # Add any migration logic here if needed in the future
-    pass
+# === Export ===
+# A user's whole history, streamed through server-side cursors so memory stays
+# flat however many rows there are. The connection is checked out directly
+# rather than through get_connection(): a streaming response may resume the
+# generator on a different thread each time, so it must not rely on _local.
+
+_EXPORT_QUERIES = [
+    ("user", '''
+        SELECT user_id, streak, last_check, reminder_hour, reminder_minute, timezone
+        FROM users WHERE user_id = %s
+    '''),
+    ("task", '''
+        SELECT id, task, description, labels, priority, recurrence, due_at,
+               completed, created_at, completed_at, completed_date
+        FROM tasks WHERE user_id = %s
+        ORDER BY created_at, id
+    '''),
+    # "streak" is the run of consecutive completion days ending on that day, the
+    # same rule recompute_streaks applies; consecutive days share day - row_number.
+    ("day", '''
+        SELECT day, completed_count, avg_completion_seconds,
+               ROW_NUMBER() OVER (PARTITION BY run ORDER BY day) AS streak
+        FROM (
+            SELECT day, completed_count, total_completion_seconds / NULLIF(timed_count, 0) AS avg_completion_seconds,
+                   day - (ROW_NUMBER() OVER (ORDER BY day))::int AS run
+            FROM user_daily_stats WHERE user_id = %s AND completed_count > 0
+        ) days
+        ORDER BY day
+    '''),
+]
+
+def iter_export(user_id, batch_size=EXPORT_BATCH_SIZE):
+    """Yield ``(record_type, row dict)`` for a user's profile, tasks and daily completions, from one snapshot.
+
+    The ``user`` row holds the current streak; each ``day`` row carries the
+    streak as of that day, so together they are the user's streak history.
+    Closing the generator early (e.g. the client went away) returns the connection.
+    """
+    pool = get_pool()
+    with _pool_wait_seconds.time():
+        conn = pool.getconn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        for record_type, query in _EXPORT_QUERIES:
+            with conn.cursor(name=f"export_{record_type}") as cur:
+                cur.itersize = batch_size
+                cur.execute(query, (user_id,))
+                for row in cur:
+                    yield record_type, dict(row)
+    finally:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        pool.putconn(conn)
+
+# === Instrumentation ===
+_function_seconds = metrics.histogram("db_function_seconds", "Wall time of db.py functions, cache hits included", ("function",))
+_function_errors = metrics.counter("db_function_errors_total", "db.py function calls that raised", ("function",))
+_query_seconds = metrics.histogram("db_query_seconds", "Time per SQL statement, by calling db.py function", ("function",))
+_query_rows = metrics.counter("db_query_rows_total", "Rows returned or affected, by calling db.py function", ("function",))
+_pool_wait_seconds = metrics.histogram("db_pool_wait_seconds", "Time spent waiting to check out a pooled connection")
+metrics.gauge("db_pool_connections", "Pooled connections by state", ("state",),
+              fn=lambda: {(state,): pool_stats().get(state, 0) for state in ("idle", "in_use", "max")})
+metrics.gauge("db_pool_events", "Cumulative pool events (checkouts, waits, timeouts, created, recycled)", ("event",),
+              fn=lambda: {(event,): value for event, value in pool_stats().items()
+                          if event in ("checkouts", "waits", "timeouts", "created", "recycled")})
+metrics.gauge("cache_entries", "Entries in the per-user read cache", fn=lambda: cache.stats()["entries"])
+metrics.gauge("cache_lookups", "Read cache lookups by result", ("result",),
+              fn=lambda: {("hit",): cache.hits, ("miss",): cache.misses})
+
+
+def _timed(fn):
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        outer, _local.function = getattr(_local, "function", None), name
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            _function_errors.inc(function=name)
+            raise
+        finally:
+            _function_seconds.observe(time.perf_counter() - started, function=name)
+            _local.function = outer
+    return wrapper
+
+
+# Every public data function is timed; plumbing (pool, transactions, stats) is not.
+_UNTIMED = {"get_pool", "pool_stats", "close_pool", "cache_stats", "change_payload", "get_connection", "read_snapshot",
+            "iter_export", "without_data_versions"}
+for _name, _fn in list(globals().items()):
+    if (callable(_fn) and not isinstance(_fn, type) and not _name.startswith("_")
+            and getattr(_fn, "__module__", None) == __name__ and _name not in _UNTIMED):
+        globals()[_name] = _timed(_fn)
+
+# === Backend Selection ===
+# With DB_BACKEND=sqlite the same names are served by sqlite_db.py, so callers
+# keep importing db either way.
+if DB_BACKEND == "sqlite":
+    import sqlite_db
+    globals().update({_name: getattr(sqlite_db, _name) for _name in sqlite_db.__all__})
@@ -0,0 +1,91 @@
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import date, datetime
+import db
+
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", str(64 * 1024)))  # bytes buffered per streamed chunk
+
+# format -> (media type, file extension)
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+}
+
+# One CSV for every record type: "type" says which columns apply to a row.
+CSV_COLUMNS = [
+    "type", "user_id", "streak", "last_check", "reminder_hour", "reminder_minute", "timezone",
+    "id", "task", "description", "labels", "priority", "recurrence", "due_at",
+    "completed", "created_at", "completed_at", "completed_date",
+    "day", "completed_count", "avg_completion_seconds",
+]
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def _ndjson_lines(user_id):
+    for record_type, row in db.iter_export(user_id):
+        yield json.dumps({"type": record_type, **{k: _plain(v) for k, v in row.items()}}, ensure_ascii=False) + "\n"
+
+
+def _csv_lines(user_id):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, CSV_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    for record_type, row in db.iter_export(user_id):
+        writer.writerow({"type": record_type, **{k: _plain(v) for k, v in row.items()}})
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+_LINES = {"ndjson": _ndjson_lines, "csv": _csv_lines}
+
+
+def _chunked(lines, size=EXPORT_CHUNK_BYTES):
+    """Join small lines into ~``size``-byte UTF-8 chunks, so a stream isn't one write per row."""
+    parts, length = [], 0
+    for line in lines:
+        encoded = line.encode()
+        parts.append(encoded)
+        length += len(encoded)
+        if length >= size:
+            yield b"".join(parts)
+            parts, length = [], 0
+    if parts:
+        yield b"".join(parts)
+
+
+def gzip_chunks(chunks):
+    """Compress a byte stream into a gzip stream incrementally."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def iter_export(user_id, fmt="ndjson", gzip=False):
+    """A user's history as a stream of byte chunks in ``fmt`` (a FORMATS key), optionally gzipped.
+
+    Rows are read, formatted and sent one chunk at a time, so memory use does
+    not grow with the number of tasks.
+    """
+    chunks = _chunked(_LINES[fmt](user_id))
+    return gzip_chunks(chunks) if gzip else chunks
+
+
+def write_export(user_id, fileobj, fmt="ndjson", gzip=False):
+    """Write ``iter_export(...)`` to a binary file object; return the number of bytes written."""
+    written = 0
+    for chunk in iter_export(user_id, fmt, gzip):
+        fileobj.write(chunk)
+        written += len(chunk)
+    return written
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+import discord
+
+DM_CONCURRENCY = int(os.getenv("DM_CONCURRENCY", "8"))
+DM_RATE_PER_SECOND = float(os.getenv("DM_RATE_PER_SECOND", "25"))  # stays well under Discord's 50 req/s global limit
+USER_CACHE_SIZE = int(os.getenv("DM_USER_CACHE_SIZE", "5000"))
+
+
+class _RateLimiter:
+    """Token bucket that spaces out request starts across concurrent senders."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class DMFanout:
+    """Sends the same DM to many users with bounded concurrency.
+
+    ``User`` objects are taken from the client cache or a small LRU of
+    previously fetched users, so repeat recipients skip ``fetch_user`` and
+    reuse their cached DM channel. discord.py still enforces per-route
+    buckets and retries 429s; the semaphore and token bucket keep a large
+    batch from tripping the global limit in the first place.
+    """
+
+    def __init__(self, client, concurrency=DM_CONCURRENCY, rate=DM_RATE_PER_SECOND, cache_size=USER_CACHE_SIZE):
+        self.client = client
+        self.concurrency = concurrency
+        self.cache_size = cache_size
+        self._limiter = _RateLimiter(rate)
+        self._users = OrderedDict()
+
+    async def _resolve(self, user_id):
+        user = self.client.get_user(user_id) or self._users.get(user_id)
+        if user is None:
+            await self._limiter.acquire()
+            user = await self.client.fetch_user(user_id)
+        self._users[user_id] = user
+        self._users.move_to_end(user_id)
+        if len(self._users) > self.cache_size:
+            self._users.popitem(last=False)
+        return user
+
+    async def _send_one(self, semaphore, user_id, content):
+        async with semaphore:
+            try:
+                user = await self._resolve(int(user_id))
+                if user.dm_channel is None:
+                    await self._limiter.acquire()
+                    await user.create_dm()
+                await self._limiter.acquire()
+                await user.dm_channel.send(content)
+                return True
+            except discord.NotFound:
+                self._users.pop(int(user_id), None)
+                print(f"Failed to DM {user_id}: user not found")
+            except discord.HTTPException as e:
+                print(f"Failed to DM {user_id}: {e}")
+            except Exception as e:  # a bad id or a network error must not sink the rest of the batch
+                print(f"Failed to DM {user_id}: {e!r}")
+            return False
+
+    async def send(self, user_ids, content):
+        """DM ``content`` to every id in ``user_ids``; return ``(sent_ids, stats)``."""
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(self._send_one(semaphore, user_id, content) for user_id in user_ids))
+        sent = [user_id for user_id, ok in zip(user_ids, results) if ok]
+        elapsed = time.perf_counter() - started
+        stats = {
+            "total": len(user_ids),
+            "sent": len(sent),
+            "failed": len(user_ids) - len(sent),
+            "seconds": round(elapsed, 3),
+            "per_second": round(len(sent) / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+        return sent, stats
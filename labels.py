@@ -0,0 +1,17 @@
+def normalize_labels(labels):
+    """``labels`` (a comma string or a list) as unique, whitespace-collapsed, lowercase names, in order."""
+    if not labels:
+        return []
+    if isinstance(labels, str):
+        labels = labels.split(",")
+    names = []
+    for label in labels:
+        label = " ".join(str(label).split()).lower()
+        if label and label not in names:
+            names.append(label)
+    return names
+
+
+def labels_text(labels):
+    """The normalized comma string stored in tasks.labels, or ``None`` without labels."""
+    return ",".join(normalize_labels(labels)) or None
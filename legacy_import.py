@@ -0,0 +1,248 @@
+import json
+import os
+import sqlite3
+from datetime import date, datetime, timezone
+from pathlib import Path
+from zoneinfo import ZoneInfo
+import sqlite_db
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+LEGACY_TIMEZONE = os.getenv("DB_LEGACY_TIMEZONE", "UTC")  # zone naive legacy timestamps were written in
+JSON_CHUNK_SIZE = 1 << 16
+
+
+# === Readers ===
+# Each reader streams one legacy store as ("user", row) / ("task", row) records,
+# so memory stays flat however large the source is. Task records carry a
+# (source, key) pair that makes re-running an import a no-op.
+
+def _parse_timestamp(value):
+    if value in (None, ""):
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=ZoneInfo(LEGACY_TIMEZONE))
+    return parsed.astimezone(timezone.utc)
+
+
+def _parse_date(value):
+    if value in (None, ""):
+        return None
+    try:
+        return date.fromisoformat(str(value).strip()[:10])
+    except ValueError:
+        return None
+
+
+def iter_json_object(path, chunk_size=JSON_CHUNK_SIZE):
+    """Yield the ``(key, value)`` members of a top-level JSON object without loading the whole file."""
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8-sig") as f:
+        buffer, pos, eof = "", 0, False
+
+        def more():
+            nonlocal buffer, pos, eof
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            return not eof
+
+        def skip_space():
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos].isspace():
+                    pos += 1
+                if pos < len(buffer) or not more():
+                    return
+
+        def expect(*chars):
+            nonlocal pos
+            skip_space()
+            if pos >= len(buffer) or buffer[pos] not in chars:
+                raise ValueError(f"{path}: expected {' or '.join(chars)} at offset {f.tell() - len(buffer) + pos}")
+            pos += 1
+            return buffer[pos - 1]
+
+        def value():
+            nonlocal pos
+            skip_space()
+            while True:
+                try:
+                    parsed, end = decoder.raw_decode(buffer, pos)
+                    if end < len(buffer) or eof:  # a number at the end of the buffer may continue
+                        pos = end
+                        return parsed
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                more()
+
+        expect("{")
+        skip_space()
+        if buffer[pos:pos + 1] == "}":
+            return
+        while True:
+            key = value()
+            expect(":")
+            yield key, value()
+            if expect(",", "}") == "}":
+                return
+
+
+def read_data_json(path):
+    """The first bot's ``data.json``: ``{user_id: {"streak", "last_check", "tasks": [text]}}``."""
+    for user_id, user in iter_json_object(path):
+        yield "user", {
+            "user_id": str(user_id),
+            "streak": int(user.get("streak") or 0),
+            "last_check": _parse_date(user.get("last_check")),
+        }
+        for i, task in enumerate(user.get("tasks") or []):
+            if isinstance(task, dict):
+                text, completed = task.get("task") or task.get("name"), bool(task.get("completed"))
+            else:
+                text, completed = str(task), False
+            yield "task", {
+                "source": "data.json",
+                "key": f"{user_id}/{i}",
+                "user_id": str(user_id),
+                "task": text,
+                "completed": completed,
+            }
+
+
+def _open_read_only(path):
+    conn = sqlite3.connect(Path(path).resolve().as_uri() + "?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _column(row, name):
+    return row[name] if name in row.keys() else None
+
+
+def read_legacy_db(path):
+    """The SQLite ``reliabot.db`` the bot used before Postgres: ``users`` and ``tasks`` tables."""
+    conn = _open_read_only(path)
+    try:
+        for row in conn.execute("SELECT * FROM users"):
+            yield "user", {
+                "user_id": str(row["user_id"]),
+                "streak": int(_column(row, "streak") or 0),
+                "last_check": _parse_date(_column(row, "last_check")),
+                "reminder_hour": _column(row, "reminder_hour"),
+                "last_dm": _parse_date(_column(row, "last_dm")),
+            }
+        for row in conn.execute("SELECT * FROM tasks ORDER BY id"):
+            completed_at = _parse_timestamp(_column(row, "completed_at"))
+            yield "task", {
+                "source": "reliabot.db",
+                "key": str(row["id"]),
+                "user_id": str(row["user_id"]),
+                "task": row["task"],
+                "completed": bool(_column(row, "completed")),
+                "created_at": _parse_timestamp(_column(row, "created_at")),
+                "completed_at": completed_at,
+                "completed_date": _parse_date(_column(row, "completed_date")) or (completed_at and completed_at.date()),
+                "description": _column(row, "description") or "",
+                "due_at": _parse_timestamp(_column(row, "remind_time")),
+            }
+    finally:
+        conn.close()
+
+
+def read_reminders_db(path):
+    """The Node backend's ``reminders.db``: one open task per reminder, due at its remind_time."""
+    conn = _open_read_only(path)
+    try:
+        for row in conn.execute("SELECT id, user_id, task, remind_time FROM reminders ORDER BY id"):
+            yield "task", {
+                "source": "reminders.db",
+                "key": str(row["id"]),
+                "user_id": str(row["user_id"]),
+                "task": row["task"],
+                "completed": False,
+                "due_at": _parse_timestamp(row["remind_time"]),
+            }
+    finally:
+        conn.close()
+
+
+READERS = {
+    "data_json": read_data_json,
+    "legacy_db": read_legacy_db,
+    "reminders_db": read_reminders_db,
+}
+
+# === Writer ===
+_UPSERT_USER = '''
+    INSERT INTO users (user_id, streak, last_check, reminder_hour, last_dm)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (user_id) DO UPDATE SET
+        streak = CASE WHEN excluded.last_check > COALESCE(users.last_check, '') THEN excluded.streak ELSE users.streak END,
+        last_check = CASE WHEN excluded.last_check > COALESCE(users.last_check, '') THEN excluded.last_check ELSE users.last_check END,
+        reminder_hour = COALESCE(users.reminder_hour, excluded.reminder_hour),
+        last_dm = COALESCE(MAX(users.last_dm, excluded.last_dm), users.last_dm, excluded.last_dm)
+'''
+_INSERT_TASK = '''
+    INSERT INTO tasks (user_id, task, completed, created_at, completed_at, completed_date, description, due_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def _write_batch(users, tasks):
+    """Runs on the sqlite_db writer thread; returns the number of tasks inserted."""
+    with sqlite_db.get_connection() as conn:
+        conn.executemany(_UPSERT_USER, [
+            (u["user_id"], u["streak"], u["last_check"], u.get("reminder_hour"), u.get("last_dm")) for u in users
+        ])
+        inserted = 0
+        for t in tasks:
+            claimed = conn.execute("INSERT OR IGNORE INTO legacy_imports (source, key) VALUES (?, ?)", (t["source"], t["key"]))
+            if claimed.rowcount == 0:
+                continue  # imported by an earlier run
+            conn.execute("INSERT INTO users (user_id, streak) VALUES (?, 0) ON CONFLICT (user_id) DO NOTHING", (t["user_id"],))
+            created_at = t.get("created_at") or datetime.now(timezone.utc)
+            conn.execute(_INSERT_TASK, (
+                t["user_id"], t["task"], t["completed"], created_at, t.get("completed_at"),
+                (t.get("completed_date") or (t.get("completed_at") or created_at).date()) if t["completed"] else None,
+                t.get("description") or "", t.get("due_at"),
+            ))
+            inserted += 1
+        return inserted
+
+
+def import_legacy(sources, batch_size=IMPORT_BATCH_SIZE):
+    """Stream ``{kind: path}`` legacy stores (kinds from READERS) into the SQLite schema.
+
+    Each batch commits on its own, so an interrupted import can simply be run
+    again. Returns ``{"users", "tasks", "skipped"}`` counts.
+    """
+    sqlite_db.init_db()
+    counts = {"users": 0, "tasks": 0, "skipped": 0}
+    touched = set()
+    users, tasks = [], []
+
+    def flush():
+        inserted = sqlite_db.write(_write_batch, users, tasks)
+        counts["users"] += len(users)
+        counts["tasks"] += inserted
+        counts["skipped"] += len(tasks) - inserted
+        users.clear()
+        tasks.clear()
+
+    for kind, path in sources.items():
+        print(f"📦 Importing {path}")
+        for record_type, row in READERS[kind](path):
+            (users if record_type == "user" else tasks).append(row)
+            touched.add(row["user_id"])
+            if len(users) + len(tasks) >= batch_size:
+                flush()
+        flush()
+    if touched:
+        # Rebuilds the rollup for imported completions and marks every imported user changed.
+        sqlite_db.backfill_daily_stats(sorted(touched))
+    return counts
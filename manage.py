@@ -0,0 +1,86 @@
+import argparse
+import os
+from dotenv import load_dotenv
+
+load_dotenv()  # before importing db, which reads DATABASE_URL at import time
+
+import db
+import migrations
+
+
+def migrate(args):
+    if db.DB_BACKEND == "sqlite":
+        # The embedded schema is created and upgraded by init_db itself.
+        import sqlite_db
+        version = sqlite_db.current_version() if args.status else db.init_db()
+        print(f"✅ SQLite schema at version {version} (latest {sqlite_db.LATEST_VERSION}).")
+        return
+    if args.status:
+        print(f"Schema version {migrations.current_version()} (latest {migrations.LATEST_VERSION}).")
+        return
+    version = migrations.migrate(args.target or migrations.LATEST_VERSION)
+    print(f"✅ Schema at version {version}.")
+
+
+def backfill_stats(args):
+    db.init_db()
+    rows = db.backfill_daily_stats(args.user or None)
+    print(f"📊 Rebuilt {rows} daily stats row(s).")
+
+
+def recompute_streaks(args):
+    db.init_db()
+    users = db.recompute_streaks(args.user or None)
+    print(f"🔥 Recomputed streaks for {users} user(s).")
+
+
+def import_legacy(args):
+    import legacy_import
+    import sqlite_db
+
+    sources = {kind: path for kind, path in (("data_json", args.data_json), ("legacy_db", args.legacy_db),
+                                             ("reminders_db", args.reminders_db)) if path}
+    missing = [path for path in sources.values() if not os.path.exists(path)]
+    if missing:
+        raise SystemExit(f"⛔ Not found: {', '.join(missing)}")
+    try:
+        counts = legacy_import.import_legacy(sources)
+    finally:
+        sqlite_db.close_pool()
+    print(f"📦 Imported {counts['users']} user row(s) and {counts['tasks']} task(s) into {sqlite_db.SQLITE_PATH} "
+          f"({counts['skipped']} task(s) were already imported).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reliabot maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate_cmd = commands.add_parser("migrate", help="Apply pending schema migrations")
+    migrate_cmd.add_argument("--target", type=int, help="Stop at this schema version")
+    migrate_cmd.add_argument("--status", action="store_true", help="Only print the current schema version")
+    migrate_cmd.set_defaults(func=migrate)
+
+    backfill = commands.add_parser("backfill-stats", help="Rebuild the per-user daily stats rollup from tasks")
+    backfill.add_argument("--user", action="append", help="Only rebuild this user id (repeatable)")
+    backfill.set_defaults(func=backfill_stats)
+
+    streaks = commands.add_parser("recompute-streaks", help="Rebuild check-in streaks from completion history")
+    streaks.add_argument("--user", action="append", help="Only recompute this user id (repeatable)")
+    streaks.set_defaults(func=recompute_streaks)
+
+    legacy = commands.add_parser("import-legacy",
+                                 help="Stream data.json / reliabot.db / reminders.db into the SQLite store (SQLITE_PATH)")
+    legacy.add_argument("--data-json", help="The first bot's JSON store")
+    legacy.add_argument("--legacy-db", help="The bot's old SQLite database (users/tasks)")
+    legacy.add_argument("--reminders-db", help="The Node backend's reminders database")
+    legacy.set_defaults(func=import_legacy)
+
+    args = parser.parse_args()
+    try:
+        args.func(args)
+    finally:
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+# Static message pools shared by the slash commands and the /motivate fallback.
+
+AFFIRMATIONS = [
+    "You are enough, exactly as you are. 💛",
+    "Progress over perfection. 🌱",
+    "You can begin again, any moment. 🌀",
+    "Your effort matters more than the result. 🎯",
+    "You’re not behind. You’re on your own path. 🌄"
+]
+
+QUOTES = [
+    "“Action is the foundational key to all success.” – Pablo Picasso",
+    "“Done is better than perfect.” – Sheryl Sandberg",
+    "“You don’t have to be great to start, but you have to start to be great.” – Zig Ziglar",
+    "“Success is the sum of small efforts repeated day in and day out.” – R. Collier",
+    "“Start where you are. Use what you have. Do what you can.” – Arthur Ashe"
+]
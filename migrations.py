@@ -0,0 +1,362 @@
+import os
+import psycopg2
+import db
+
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "5000"))
+LEGACY_TIMEZONE = os.getenv("DB_LEGACY_TIMEZONE", "UTC")  # zone naive TEXT timestamps were written in
+MIGRATION_LOCK_ID = 58_201_447  # pg_advisory_lock key shared by the bot and API processes
+
+
+def _column_type(cur, table, column):
+    cur.execute('''
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s AND column_name = %s
+    ''', (table, column))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def _create_index_concurrently(cur, name, definition):
+    """``CREATE INDEX CONCURRENTLY IF NOT EXISTS name definition``, rebuilding an interrupted attempt.
+
+    A concurrent build that fails or is cancelled leaves an INVALID index
+    behind, which IF NOT EXISTS would otherwise accept as done.
+    """
+    cur.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (name,))
+    row = cur.fetchone()
+    if row is not None and not row[0]:
+        print(f"🛠️ Dropping invalid index {name} left by an interrupted build")
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}")
+
+
+# === Migrations ===
+# Each migration takes the runner's autocommit connection (for statements such
+# as CREATE INDEX CONCURRENTLY) and uses db.get_connection() for transactional
+# work. Migrations must be safe to re-run if a previous attempt was interrupted.
+
+def _baseline(runner):
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    user_id TEXT PRIMARY KEY,
+                    streak INTEGER DEFAULT 0,
+                    last_check TEXT,
+                    reminder_hour INTEGER,
+                    last_dm TEXT
+                )
+            ''')
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id SERIAL PRIMARY KEY,
+                    user_id TEXT,
+                    task TEXT,
+                    completed BOOLEAN DEFAULT FALSE,
+                    created_at TEXT,
+                    completed_at TEXT,
+                    completed_date TEXT,
+                    description TEXT DEFAULT '',
+                    due_at TEXT,
+                    FOREIGN KEY (user_id) REFERENCES users(user_id)
+                )
+            ''')
+            cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS reminder_minute INTEGER DEFAULT 0")
+            cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS timezone TEXT")
+            cur.execute('''
+                CREATE INDEX IF NOT EXISTS idx_users_reminder_hour
+                ON users (reminder_hour) WHERE reminder_hour IS NOT NULL
+            ''')
+
+
+def _task_metadata_columns(runner):
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute('''
+                ALTER TABLE tasks
+                    ADD COLUMN IF NOT EXISTS recurrence TEXT,
+                    ADD COLUMN IF NOT EXISTS labels TEXT,
+                    ADD COLUMN IF NOT EXISTS priority TEXT
+            ''')
+
+
+_TASK_TEMPORAL_COLUMNS = [
+    # (column, target type, cast function)
+    ("created_at", "TIMESTAMPTZ", "reliabot_try_timestamptz"),
+    ("completed_at", "TIMESTAMPTZ", "reliabot_try_timestamptz"),
+    ("completed_date", "DATE", "reliabot_try_date"),
+    ("due_at", "TIMESTAMPTZ", "reliabot_try_timestamptz"),
+]
+
+
+def _temporal_types(runner):
+    """Convert TEXT dates and timestamps to DATE / TIMESTAMPTZ.
+
+    ``tasks`` can be large, so it is converted online: shadow ``*_new``
+    columns are added, kept in sync by a trigger, filled in id-range batches
+    (one short transaction each), and finally swapped in under a brief lock.
+    ``users`` has one row per user and is converted in place.
+    """
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            tz = cur.mogrify("%s", (LEGACY_TIMEZONE,)).decode()
+            cur.execute(f'''
+                CREATE OR REPLACE FUNCTION reliabot_try_timestamptz(value TEXT) RETURNS TIMESTAMPTZ AS $$
+                BEGIN
+                    IF value ~ '(Z|[+-][0-9]{{2}}(:?[0-9]{{2}})?)$' THEN
+                        RETURN value::timestamptz;
+                    END IF;
+                    RETURN value::timestamp AT TIME ZONE {tz};
+                EXCEPTION WHEN others THEN
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql STABLE
+            ''')
+            cur.execute('''
+                CREATE OR REPLACE FUNCTION reliabot_try_date(value TEXT) RETURNS DATE AS $$
+                BEGIN
+                    RETURN value::date;
+                EXCEPTION WHEN others THEN
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql STABLE
+            ''')
+            for column in ("last_check", "last_dm"):
+                if _column_type(cur, "users", column) == "text":
+                    cur.execute(f"ALTER TABLE users ALTER COLUMN {column} TYPE DATE USING reliabot_try_date({column})")
+
+            pending = [c for c in _TASK_TEMPORAL_COLUMNS if _column_type(cur, "tasks", c[0]) == "text"]
+            if not pending:
+                return
+            for column, sql_type, _ in pending:
+                cur.execute(f"ALTER TABLE tasks ADD COLUMN IF NOT EXISTS {column}_new {sql_type}")
+            sync = "\n".join(f"NEW.{column}_new := {cast}(NEW.{column});" for column, _, cast in pending)
+            cur.execute(f'''
+                CREATE OR REPLACE FUNCTION reliabot_tasks_sync_temporal() RETURNS trigger AS $$
+                BEGIN
+                    {sync}
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql
+            ''')
+            cur.execute("DROP TRIGGER IF EXISTS tasks_sync_temporal ON tasks")
+            cur.execute('''
+                CREATE TRIGGER tasks_sync_temporal BEFORE INSERT OR UPDATE ON tasks
+                FOR EACH ROW EXECUTE FUNCTION reliabot_tasks_sync_temporal()
+            ''')
+            cur.execute("SELECT COALESCE(MAX(id), 0) FROM tasks")
+            max_id = cur.fetchone()[0]
+
+    # Rows written from here on are converted by the trigger; fill the rest in batches.
+    assignments = ", ".join(f"{column}_new = {cast}({column})" for column, _, cast in pending)
+    for start in range(0, max_id, MIGRATION_BATCH_SIZE):
+        with db.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"UPDATE tasks SET {assignments} WHERE id > %s AND id <= %s",
+                            (start, start + MIGRATION_BATCH_SIZE))
+        print(f"   … converted tasks {min(start + MIGRATION_BATCH_SIZE, max_id)}/{max_id}")
+
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL lock_timeout = '10s'")
+            cur.execute("LOCK TABLE tasks IN ACCESS EXCLUSIVE MODE")
+            cur.execute("DROP TRIGGER IF EXISTS tasks_sync_temporal ON tasks")
+            cur.execute("DROP FUNCTION IF EXISTS reliabot_tasks_sync_temporal()")
+            for column, _, _ in pending:
+                cur.execute(f"ALTER TABLE tasks DROP COLUMN {column}")
+                cur.execute(f"ALTER TABLE tasks RENAME COLUMN {column}_new TO {column}")
+            cur.execute("ALTER TABLE tasks ALTER COLUMN created_at SET DEFAULT now()")
+
+
+def _daily_stats(runner):
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS user_daily_stats (
+                    user_id TEXT NOT NULL,
+                    day DATE NOT NULL,
+                    completed_count INTEGER NOT NULL DEFAULT 0,
+                    timed_count INTEGER NOT NULL DEFAULT 0,
+                    total_completion_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+                    PRIMARY KEY (user_id, day)
+                )
+            ''')
+            if _column_type(cur, "user_daily_stats", "day") == "text":
+                cur.execute("ALTER TABLE user_daily_stats ALTER COLUMN day TYPE DATE USING day::date")
+            db.backfill_daily_stats()
+
+
+def _task_indexes(runner):
+    with runner.cursor() as cur:
+        _create_index_concurrently(cur, "idx_tasks_user_completed_date", "ON tasks (user_id, completed, completed_date)")
+        _create_index_concurrently(cur, "idx_tasks_user_created_at", "ON tasks (user_id, created_at DESC, id DESC)")
+
+
+def _calendar_indexes(runner):
+    with runner.cursor() as cur:
+        _create_index_concurrently(cur, "idx_tasks_user_due_at", "ON tasks (user_id, due_at) WHERE due_at IS NOT NULL")
+        _create_index_concurrently(cur, "idx_tasks_user_recurring", "ON tasks (user_id) WHERE recurrence IS NOT NULL")
+
+
+def _task_search(runner):
+    # An expression index instead of a stored tsvector column: no table rewrite,
+    # and it can be built CONCURRENTLY. db.search_tasks queries the same expression.
+    with runner.cursor() as cur:
+        cur.execute('''
+            CREATE OR REPLACE FUNCTION reliabot_task_document(task TEXT, description TEXT, labels TEXT)
+            RETURNS tsvector AS $$
+                SELECT setweight(to_tsvector('simple', COALESCE(task, '')), 'A')
+                    || setweight(to_tsvector('simple', COALESCE(labels, '')), 'B')
+                    || setweight(to_tsvector('simple', COALESCE(description, '')), 'C')
+            $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE
+        ''')
+        _create_index_concurrently(cur, "idx_tasks_search",
+                                   "ON tasks USING GIN (reliabot_task_document(task, description, labels))")
+
+
+def _data_versions(runner):
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS data_version BIGINT NOT NULL DEFAULT 0")
+    with runner.cursor() as cur:
+        _create_index_concurrently(cur, "idx_tasks_user_completed_page",
+                                   "ON tasks (user_id, completed_date DESC, id DESC) WHERE completed = TRUE")
+
+
+def _task_labels(runner):
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS task_labels (
+                    user_id TEXT NOT NULL,
+                    label TEXT NOT NULL,
+                    task_id INTEGER NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+                    PRIMARY KEY (user_id, label, task_id)
+                )
+            ''')
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_task_labels_task_id ON task_labels (task_id)")
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS user_label_counts (
+                    user_id TEXT NOT NULL,
+                    label TEXT NOT NULL,
+                    task_count INTEGER NOT NULL DEFAULT 0,
+                    open_count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (user_id, label)
+                )
+            ''')
+            db.backfill_labels()
+
+
+def _null_safe_page_keys(runner):
+    # Keyset pages sort rows with an unparseable legacy timestamp (NULL since
+    # migration 3) as -infinity; these indexes match those ORDER BY expressions.
+    with runner.cursor() as cur:
+        _create_index_concurrently(cur, "idx_tasks_user_created_page",
+                                   "ON tasks (user_id, COALESCE(created_at, '-infinity'::timestamptz) DESC, id DESC)")
+        _create_index_concurrently(cur, "idx_tasks_user_completed_key_page",
+                                   "ON tasks (user_id, COALESCE(completed_date, '-infinity'::date) DESC, id DESC) WHERE completed = TRUE")
+        cur.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_tasks_user_completed_page")
+    # New rows always get a creation time; NOT VALID leaves the legacy NULLs alone.
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("ALTER TABLE tasks ALTER COLUMN created_at SET DEFAULT now()")
+            cur.execute("SELECT 1 FROM pg_constraint WHERE conname = 'tasks_created_at_not_null'")
+            if cur.fetchone() is None:
+                cur.execute('''
+                    ALTER TABLE tasks ADD CONSTRAINT tasks_created_at_not_null
+                    CHECK (created_at IS NOT NULL) NOT VALID
+                ''')
+
+
+def _app_state(runner):
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute('''
+                CREATE TABLE IF NOT EXISTS app_state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+            ''')
+
+
+def _stable_temporal_helpers(runner):
+    # Migration 3 first declared these IMMUTABLE, but they depend on the
+    # session's TimeZone/DateStyle. They are never used in an index.
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            for signature in ("reliabot_try_timestamptz(TEXT)", "reliabot_try_date(TEXT)"):
+                cur.execute("SELECT to_regprocedure(%s) IS NOT NULL", (signature,))
+                if cur.fetchone()[0]:
+                    cur.execute(f"ALTER FUNCTION {signature} STABLE")
+
+
+MIGRATIONS = [
+    (1, "baseline schema", _baseline),
+    (2, "task recurrence/labels/priority columns", _task_metadata_columns),
+    (3, "DATE/TIMESTAMPTZ temporal columns", _temporal_types),
+    (4, "daily stats rollup", _daily_stats),
+    (5, "task indexes", _task_indexes),
+    (6, "calendar indexes", _calendar_indexes),
+    (7, "full-text task search", _task_search),
+    (8, "per-user data versions", _data_versions),
+    (9, "normalized task labels", _task_labels),
+    (10, "app state", _app_state),
+    (11, "NULL-safe page keys", _null_safe_page_keys),
+    (12, "STABLE temporal helpers", _stable_temporal_helpers),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# === Runner ===
+def _ensure_version_table(cur):
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    ''')
+
+
+def current_version():
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+            if not cur.fetchone()[0]:
+                return 0
+            cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+            return cur.fetchone()[0]
+
+
+def migrate(target=LATEST_VERSION):
+    """Apply every pending migration up to ``target``; return the resulting version.
+
+    A session-level advisory lock on a dedicated connection keeps the bot and
+    API from migrating concurrently when they start together.
+    """
+    runner = psycopg2.connect(db.DATABASE_URL)
+    runner.autocommit = True
+    try:
+        with runner.cursor() as cur:
+            cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+            _ensure_version_table(cur)
+            cur.execute("SELECT version FROM schema_migrations")
+            applied = {row[0] for row in cur.fetchall()}
+        for version, name, migration in MIGRATIONS:
+            if version in applied or version > target:
+                continue
+            print(f"🛠️ Applying migration {version}: {name}")
+            # Migrations may write (e.g. the rollup backfill) before users.data_version exists.
+            with db.without_data_versions():
+                migration(runner)
+            with runner.cursor() as cur:
+                cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            applied.add(version)
+        return max(applied, default=0)
+    finally:
+        try:
+            with runner.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+        finally:
+            runner.close()
@@ -0,0 +1,117 @@
+import calendar
+import functools
+import os
+import re
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+RECURRENCE_CACHE_SIZE = int(os.getenv("RECURRENCE_CACHE_SIZE", "4096"))  # memoized (rule, anchor, window) expansions
+
+# unit is "days", "weekdays" or "months"; a week is 7 days and a year 12 months.
+Rule = namedtuple("Rule", "unit interval")
+
+_KEYWORDS = {
+    "daily": Rule("days", 1),
+    "weekdays": Rule("weekdays", 1),
+    "weekly": Rule("days", 7),
+    "biweekly": Rule("days", 14),
+    "monthly": Rule("months", 1),
+    "yearly": Rule("months", 12),
+    "annually": Rule("months", 12),
+}
+_EVERY = re.compile(r"^every\s+(\d+)\s+(day|week|month|year)s?$")
+_UNIT_SCALE = {"day": ("days", 1), "week": ("days", 7), "month": ("months", 1), "year": ("months", 12)}
+
+
+@functools.lru_cache(maxsize=256)
+def parse(text):
+    """The Rule for ``text`` ("weekly", "every 3 days", ...), or ``None`` if it does not repeat."""
+    text = " ".join((text or "").lower().split())
+    if text in _KEYWORDS:
+        return _KEYWORDS[text]
+    match = _EVERY.match(text)
+    if match and int(match.group(1)) > 0:
+        unit, scale = _UNIT_SCALE[match.group(2)]
+        return Rule(unit, int(match.group(1)) * scale)
+    return None
+
+
+def _add_months(anchor, months):
+    """``anchor`` moved by ``months``, its day clamped to the month's length (Jan 31 + 1 month = Feb 28/29)."""
+    index = anchor.month - 1 + months
+    year, month = anchor.year + index // 12, index % 12 + 1
+    return anchor.replace(year=year, month=month, day=min(anchor.day, calendar.monthrange(year, month)[1]))
+
+
+def occurrences(rule, anchor, start, end):
+    """Yield the occurrences of ``rule`` from ``anchor`` that fall in ``[start, end)``, lazily.
+
+    All three are naive wall-clock datetimes in the same zone, so a 09:00 task
+    stays at 09:00 across DST changes. The first occurrence in the window is
+    computed directly rather than stepped to, so the cost depends only on the
+    window, not on how long ago the series started.
+    """
+    if rule.unit == "months":
+        months = (start.year - anchor.year) * 12 + start.month - anchor.month
+        k = max(0, months // rule.interval - 1)
+        while True:
+            occurrence = _add_months(anchor, k * rule.interval)
+            if occurrence >= end:
+                return
+            if occurrence >= start:
+                yield occurrence
+            k += 1
+    step = timedelta(days=rule.interval)
+    k = max(0, -(-(start - anchor) // step))  # ceil
+    occurrence = anchor + k * step
+    while occurrence < end:
+        if rule.unit != "weekdays" or occurrence.weekday() < 5:
+            yield occurrence
+        occurrence += step
+
+
+@functools.lru_cache(maxsize=RECURRENCE_CACHE_SIZE)
+def expand(text, anchor, start, end):
+    """Memoized ``tuple(occurrences(...))`` for a rule's text; empty if ``text`` does not repeat."""
+    rule = parse(text)
+    return tuple(occurrences(rule, anchor, start, end)) if rule else ()
+
+
+def _local(value, tz):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(tz)
+
+
+def calendar_items(tasks, start, end, tz):
+    """Calendar entries for local days ``start <= day < end`` (dates) in ``tz``.
+
+    ``tasks`` are task dicts from ``db.get_calendar_tasks``. A one-off task is
+    placed at its due time, or when it was created if it has none. A recurring
+    task repeats from there until it is completed. Each entry is the task's
+    fields plus ``at`` (ISO timestamp), ``date`` (local day) and ``recurring``.
+    """
+    window_start = datetime.combine(start, datetime.min.time())
+    window_end = datetime.combine(end, datetime.min.time())
+    items = []
+    for task in tasks:
+        anchor = _local(task["due_at"] or task["created_at"], tz)
+        if parse(task["recurrence"]):
+            until = window_end
+            if task["completed"] and task["completed_at"] is not None:
+                until = min(until, _local(task["completed_at"], tz).replace(tzinfo=None))
+            times = [t.replace(tzinfo=tz) for t in expand(task["recurrence"], anchor.replace(tzinfo=None),
+                                                          window_start, max(until, window_start))]
+        else:
+            times = [anchor] if window_start <= anchor.replace(tzinfo=None) < window_end else []
+        for at in times:
+            items.append({
+                **task,
+                "at": at.isoformat(),
+                "date": at.date().isoformat(),
+                "recurring": bool(parse(task["recurrence"])),
+            })
+    items.sort(key=lambda item: (item["at"], item["id"]))
+    return items
@@ -10,10 +10,31 @@ import {
     Legend
 } from 'recharts';
 
-const AnalyticsChart = ({ userId }) => {
+const toChartData = (result) => {
+    const combined = {};
+
+    for (const [date, count] of Object.entries(result.daily_counts || {})) {
+        const key = date.slice(5); // MM-DD
+        combined[key] = { date: key, tasks: count, time: 0 };
+    }
+
+    for (const [date, time] of Object.entries(result.completion_time_minutes || {})) {
+        const key = date.slice(5);
+        if (!combined[key]) combined[key] = { date: key, tasks: 0, time: 0 };
+        combined[key].time = time;
+    }
+
+    return Object.values(combined).sort((a, b) => a.date.localeCompare(b.date));
+};
+
+const AnalyticsChart = ({ userId, data: analytics }) => {
     const [data, setData] = useState([]);
 
     useEffect(() => {
+        if (analytics) {
+            setData(toChartData(analytics));
+            return;
+        }
         if (!userId) return;
 
         fetch(`${import.meta.env.VITE_API_BASE_URL}/analytics/${userId}`, {
@@ -23,24 +44,9 @@ const AnalyticsChart = ({ userId }) => {
                 if (!res.ok) throw new Error(`Failed with status ${res.status}`);
                 return res.json();
             })
-            .then(result => {
-                const combined = {};
-
-                for (const [date, count] of Object.entries(result.daily_counts || {})) {
-                    const key = date.slice(5); // MM-DD
-                    combined[key] = { date: key, tasks: count, time: 0 };
-                }
-
-                for (const [date, time] of Object.entries(result.completion_time_minutes || {})) {
-                    const key = date.slice(5);
-                    if (!combined[key]) combined[key] = { date: key, tasks: 0, time: 0 };
-                    combined[key].time = time;
-                }
-
-                setData(Object.values(combined).sort((a, b) => a.date.localeCompare(b.date)));
-            })
+            .then(result => setData(toChartData(result)))
             .catch(err => console.error("Failed to load analytics:", err));
-    }, [userId]);
+    }, [userId, analytics]);
 
     return (
         <div className="bg-[#1a1a1d] p-6 rounded-xl border border-gray-700 mt-6">
@@ -1,4 +1,4 @@
-﻿import { useState, useEffect } from 'react';
+﻿import { useState, useEffect, useRef } from 'react';
 import Sidebar from './Sidebar';
 import { motion, AnimatePresence } from 'framer-motion';
 import Navbar from './Navbar';
@@ -16,6 +16,7 @@ function App() {
     const [streak, setStreak] = useState(null);
     const [summary, setSummary] = useState(null);
     const [user, setUser] = useState(undefined);
+    const [widgets, setWidgets] = useState({ xp: null, heatmap: null, analytics: null });
     const [showCompleted, setShowCompleted] = useState(false);
     const [filter, setFilter] = useState({
         label: '',
@@ -23,6 +24,8 @@ function App() {
         status: 'all', // all, active, completed
         search: '',
     });
+    const [labels, setLabels] = useState([]);
+    const [filteredTasks, setFilteredTasks] = useState(null); // server results for the label/priority filter, or null
 
 
 
@@ -31,47 +34,144 @@ function App() {
     const BASE_URL = import.meta.env.VITE_API_BASE_URL;
 
 
+    const applyDashboard = (data) => {
+        if ('status' in data) setStatusData(data.status);
+        if ('streak' in data) setStreak(data.streak);
+        if ('tasks' in data) setTasks(data.tasks);
+        if ('summary' in data) {
+            setSummary({
+                completedThisWeek: data.summary.completed_this_week,
+                totalCompleted: data.summary.total_completed,
+            });
+        }
+        if ('xp' in data || 'heatmap' in data || 'analytics' in data) {
+            setWidgets((prev) => ({
+                xp: data.xp ?? prev.xp,
+                heatmap: data.heatmap ?? prev.heatmap,
+                analytics: data.analytics ?? prev.analytics,
+            }));
+        }
+    };
+
+    // Task list deltas, shared by local actions and the /events stream; ids make them idempotent.
+    const addTask = (task) =>
+        setTasks((prev) => (prev.some((t) => t.id === task.id) ? prev : [task, ...prev]));
+    const markCompleted = (id, completedAt) =>
+        setTasks((prev) => prev.map((t) => (t.id === id ? { ...t, completed: true, completed_at: t.completed_at || completedAt } : t)));
+
+    const applyEvent = (event) => {
+        switch (event.type) {
+            case 'task_added':
+                addTask(event.task);
+                return false;
+            case 'task_completed':
+                markCompleted(event.id, event.completed_at);
+                return false;
+            case 'task_deleted':
+                setTasks((prev) => prev.filter((t) => t.id !== event.id));
+                return false;
+            case 'completed_cleared':
+                setTasks((prev) => prev.filter((t) => !t.completed));
+                return false;
+            case 'streak':
+                setStreak(event.streak);
+                return false;
+            default:
+                return true; // 'changed' / 'resync': reload
+        }
+    };
+
+    // One round trip on login: /dashboard/me resolves the session user and returns every widget's data.
     useEffect(() => {
-        fetch(`${BASE_URL}/me`, { credentials: 'include' })
+        fetch(`${BASE_URL}/dashboard/me?heatmap_days=180`, { credentials: 'include' })
             .then(res => res.ok ? res.json() : null)
-            .then(data => setUser(data))
+            .then(data => {
+                if (!data) {
+                    setUser(null);
+                    return;
+                }
+                applyDashboard(data);
+                setUser(data.me);
+            })
             .catch(() => setUser(null));
     }, []);
 
+    const TAB_FIELDS = {
+        Status: 'status,streak',
+        Tasks: 'tasks',
+        Calendar: 'tasks',
+        Logs: 'summary,xp,heatmap,analytics',
+    };
+
+    // Tab switches refresh only the fields that tab shows; the initial render already has everything.
+    const firstTabLoad = useRef(true);
     useEffect(() => {
         if (!user || !user.id) return;
+        if (firstTabLoad.current) {
+            firstTabLoad.current = false;
+            return;
+        }
+
+        fetch(`${BASE_URL}/dashboard/${user.id}?fields=${TAB_FIELDS[currentTab]}&heatmap_days=180`, { credentials: 'include' })
+            .then((res) => res.json())
+            .then(applyDashboard)
+            .catch((err) => console.error('Error loading dashboard data:', err));
+    }, [user, currentTab, BASE_URL]);
 
-        const fetchData = async () => {
-            try {
-                if (currentTab === 'Status') {
-                    const [statusRes, streakRes] = await Promise.all([
-                        fetch(`${BASE_URL}/status`).then((res) => res.json()),
-                        fetch(`${BASE_URL}/streak/${user.id}`, { credentials: 'include' }).then((res) => res.json())
-                    ]);
-                    setStatusData(statusRes);
-                    setStreak(streakRes.streak);
-                }
-
-                if (currentTab === 'Tasks') {
-                    const taskRes = await fetch(`${BASE_URL}/tasks/${user.id}`, { credentials: 'include' }).then((res) => res.json());
-                    setTasks(taskRes);
-                }
-
-                if (currentTab === 'Logs') {
-                    const summaryRes = await fetch(`${BASE_URL}/summary/${user.id}`, { credentials: 'include' }).then((res) => res.json());
-                    setStreak(summaryRes.streak);
-                    setSummary({
-                        completedThisWeek: summaryRes.completed_this_week,
-                        totalCompleted: summaryRes.total_completed,
-                    });
-                }
-            } catch (err) {
-                console.error('Error loading dashboard data:', err);
+    // Live updates from the bot and other tabs; replaces re-polling after each action.
+    useEffect(() => {
+        if (!user || !user.id) return;
+        const source = new EventSource(`${BASE_URL}/events`, { withCredentials: true });
+        source.onmessage = (message) => {
+            const { events } = JSON.parse(message.data);
+            const reload = events.map(applyEvent).some(Boolean);
+            if (reload) {
+                fetch(`${BASE_URL}/dashboard/${user.id}?fields=streak,tasks,summary,xp,heatmap,analytics&heatmap_days=180`, { credentials: 'include' })
+                    .then((res) => res.json())
+                    .then(applyDashboard)
+                    .catch((err) => console.error('Error reloading dashboard data:', err));
             }
         };
+        return () => source.close();
+    }, [user, BASE_URL]);
 
-        fetchData();
-    }, [user, currentTab, BASE_URL]);
+    // Label counts come from the server; an unchanged list is a cheap 304.
+    useEffect(() => {
+        if (!user || !user.id) return;
+        fetch(`${BASE_URL}/labels/${user.id}`, { credentials: 'include' })
+            .then((res) => res.json())
+            .then((data) => setLabels(data.labels))
+            .catch((err) => console.error('Error loading labels:', err));
+    }, [user, tasks, BASE_URL]);
+
+    // Label and priority filters are applied by the server's indexed lookup; every page is followed.
+    useEffect(() => {
+        if (!user || !user.id || (!filter.label && !filter.priority)) {
+            setFilteredTasks(null);
+            return;
+        }
+        let cancelled = false;
+        const loadAll = async () => {
+            const found = [];
+            let cursor = null;
+            do {
+                const params = new URLSearchParams({ limit: 200 });
+                if (filter.label) params.set('label', filter.label);
+                if (filter.priority) params.set('priority', filter.priority);
+                if (cursor) params.set('cursor', cursor);
+                const res = await fetch(`${BASE_URL}/tasks/${user.id}?${params}`, { credentials: 'include' });
+                if (!res.ok) throw new Error(`HTTP ${res.status}`);
+                const data = await res.json();
+                found.push(...data.tasks);
+                cursor = data.next_cursor;
+            } while (cursor && !cancelled);
+            if (!cancelled) setFilteredTasks(found);
+        };
+        loadAll().catch((err) => console.error('Error filtering tasks:', err));
+        return () => {
+            cancelled = true;
+        };
+    }, [user, tasks, filter.label, filter.priority, BASE_URL]);
 
     if (user === undefined) {
         return (
@@ -122,7 +222,7 @@ function App() {
                     <AnimatePresence mode="wait">
                         {currentTab === 'Calendar' && (
                             <motion.div key="calendar" initial={{ opacity: 0, y: 10 }} animate={{ opacity: 1, y: 0 }} exit={{ opacity: 0, y: -10 }} transition={{ duration: 0.3 }}>
-                                <CalendarView userId={user.id} />
+                                <CalendarView userId={user.id} tasks={tasks} />
                             </motion.div>
                         )}
                     </AnimatePresence>
@@ -190,20 +290,8 @@ function App() {
                                                     if (!res.ok) throw new Error('Failed to add task');
                                                     return res.json();
                                                 })
-                                                .then(() => {
-                                                    setTasks((prev) => [
-                                                        {
-                                                            id: Date.now(),
-                                                            user_id: user.id,
-                                                            task: newTask,
-                                                            description,
-                                                            due_at,
-                                                            completed: 0,
-                                                            created_at: new Date().toISOString(),
-                                                            completed_at: null,
-                                                        },
-                                                        ...prev,
-                                                    ]);
+                                                .then((data) => {
+                                                    addTask(data.task);
                                                     taskInput.value = '';
                                                     descriptionInput.value = '';
                                                     dueInput.value = '';
@@ -253,9 +341,9 @@ function App() {
                                                     className="p-2 rounded bg-[#1a1a1d] border border-gray-700 text-white"
                                                 >
                                                     <option value="">All Labels</option>
-                                                    {[...new Set(tasks.flatMap(t => (t.labels || '').split(',').map(l => l.trim())))].map((label, i) =>
-                                                        label && <option key={i} value={label}>{label}</option>
-                                                    )}
+                                                    {labels.map(({ label, tasks: count }) => (
+                                                        <option key={label} value={label}>{label} ({count})</option>
+                                                    ))}
                                                 </select>
                                                 <select
                                                     value={filter.priority}
@@ -279,10 +367,8 @@ function App() {
                                             </div>
 
                                             <ul className="space-y-4">
-                                                {tasks
+                                                {(filteredTasks ?? tasks)
                                                     .filter((task) => {
-                                                        const matchesLabel = !filter.label || (task.labels || '').split(',').map(l => l.trim()).includes(filter.label);
-                                                        const matchesPriority = !filter.priority || task.priority === filter.priority;
                                                         const matchesStatus =
                                                             filter.status === 'all' ||
                                                             (filter.status === 'completed' && task.completed) ||
@@ -290,7 +376,7 @@ function App() {
                                                         const matchesSearch =
                                                             !filter.search || task.task.toLowerCase().includes(filter.search.toLowerCase());
                                                         const showBasedOnCompleted = showCompleted || !task.completed;
-                                                        return matchesLabel && matchesPriority && matchesStatus && matchesSearch && showBasedOnCompleted;
+                                                        return matchesStatus && matchesSearch && showBasedOnCompleted;
                                                     })
                                                     .map((task) => (
                                                         <li key={task.id || task.task} className="p-4 bg-[#121214] border border-gray-700 rounded-xl">
@@ -306,26 +392,15 @@ function App() {
                                                                                     credentials: 'include',
                                                                                     method: 'POST',
                                                                                     headers: { 'Content-Type': 'application/json' },
-                                                                                    body: JSON.stringify({ user_id: user.id, task: task.task }),
+                                                                                    body: JSON.stringify({ user_id: user.id, id: task.id, task: task.task }),
                                                                                 })
                                                                                     .then((res) => {
                                                                                         if (!res.ok) throw new Error('Failed to mark task as done');
                                                                                         return res.json();
                                                                                     })
                                                                                     .then(() => {
-                                                                                        setTasks((prev) =>
-                                                                                            prev.map((t) =>
-                                                                                                t.task === task.task
-                                                                                                    ? { ...t, completed: 1, completed_at: new Date().toISOString() }
-                                                                                                    : t
-                                                                                            )
-                                                                                        );
-
-                                                                                        // 💡 Fetch and update streak right after
-                                                                                        fetch(`${BASE_URL}/streak/${user.id}`, { credentials: 'include' })
-                                                                                            .then(res => res.json())
-                                                                                            .then(data => setStreak(data.streak))
-                                                                                            .catch(err => console.error('Failed to refresh streak:', err));
+                                                                                        // The new streak arrives on the /events stream.
+                                                                                        markCompleted(task.id, new Date().toISOString());
                                                                                     })
                                                                                     .catch((err) => {
                                                                                         console.error('Mark done failed:', err);
@@ -418,9 +493,9 @@ function App() {
                                     </div>
 
                                     
-                                    <AnalyticsChart userId={user.id} />
-                                    <XPBar userId={user.id} />
-                                    <XPHeatmap userId={user.id} />
+                                    <AnalyticsChart userId={user.id} data={widgets.analytics} />
+                                    <XPBar userId={user.id} data={widgets.xp} />
+                                    <XPHeatmap userId={user.id} data={widgets.heatmap} />
 
                                     {!summary && <GlitchLoader />}
                                 </div>
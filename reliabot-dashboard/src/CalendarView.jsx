@@ -1,23 +1,44 @@
 import React, { useState, useEffect } from 'react';
 import './calendar-custom.css';
 
-const CalendarView = ({ userId }) => {
+const CalendarView = ({ userId, tasks: initialTasks }) => {
     const [currentDate, setCurrentDate] = useState(new Date());
     const [selectedDate, setSelectedDate] = useState(new Date());
-    const [tasks, setTasks] = useState([]);
+    const [items, setItems] = useState([]);
 
+    const isoDate = (d) =>
+        `${d.getFullYear()}-${String(d.getMonth() + 1).padStart(2, '0')}-${String(d.getDate()).padStart(2, '0')}`;
+
+    // Only the visible month is fetched; recurring tasks come back already expanded.
+    // `tasks` changes whenever a task is added or completed, which refetches the month.
     useEffect(() => {
         if (!userId) return;
-        fetch(`${import.meta.env.VITE_API_BASE_URL}/tasks/${userId}`, {
-            credentials: 'include'
+        const year = currentDate.getFullYear();
+        const month = currentDate.getMonth();
+        const params = new URLSearchParams({
+            from: isoDate(new Date(year, month, 1)),
+            to: isoDate(new Date(year, month + 1, 0)),
+            tz: Intl.DateTimeFormat().resolvedOptions().timeZone,
+        });
+        const controller = new AbortController();
+        fetch(`${import.meta.env.VITE_API_BASE_URL}/calendar/${userId}?${params}`, {
+            credentials: 'include',
+            signal: controller.signal
         })
             .then(res => res.json())
-            .then(data => setTasks(data))
+            .then(data => setItems(data.items || []))
             .catch(err => {
-                console.error("Error fetching tasks:", err);
-                setTasks([]);
+                if (err.name === 'AbortError') return;
+                console.error("Error fetching calendar:", err);
+                setItems([]);
             });
-    }, [userId]);
+        return () => controller.abort();
+    }, [userId, initialTasks, currentDate.getFullYear(), currentDate.getMonth()]);
+
+    const itemsByDate = items.reduce((byDate, item) => {
+        (byDate[item.date] = byDate[item.date] || []).push(item);
+        return byDate;
+    }, {});
 
     const getDaysInMonth = (date) => {
         const start = new Date(date.getFullYear(), date.getMonth(), 1);
@@ -40,9 +61,7 @@ const CalendarView = ({ userId }) => {
         setCurrentDate(newDate);
     };
 
-    const selectedTasks = tasks.filter(
-        t => new Date(t.created_at).toDateString() === selectedDate.toDateString()
-    );
+    const selectedTasks = itemsByDate[isoDate(selectedDate)] || [];
 
     const days = getDaysInMonth(currentDate);
 
@@ -59,9 +78,7 @@ const CalendarView = ({ userId }) => {
                     <div key={d} className="calendar-day-header">{d}</div>
                 ))}
                 {days.map((day, idx) => {
-                    const dayTasks = tasks.filter(
-                        t => day && new Date(t.created_at).toDateString() === day.toDateString()
-                    );
+                    const dayTasks = (day && itemsByDate[isoDate(day)]) || [];
 
                     const isToday = day && new Date().toDateString() === day.toDateString();
                     const isSelected = day && selectedDate.toDateString() === day.toDateString();
@@ -100,10 +117,10 @@ const CalendarView = ({ userId }) => {
                 ) : (
                     <ul className="task-list">
                         {selectedTasks.map(task => (
-                            <li key={task.id} className={`task-item ${task.completed ? 'done' : ''}`}>
-                                <span>{task.task}</span>
+                            <li key={`${task.id}-${task.at}`} className={`task-item ${task.completed && !task.recurring ? 'done' : ''}`}>
+                                <span>{task.recurring ? '🔁 ' : ''}{task.task}</span>
                                 <span className="timestamp">
-                                    {new Date(task.created_at).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })}
+                                    {new Date(task.at).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })}
                                 </span>
                             </li>
                         ))}
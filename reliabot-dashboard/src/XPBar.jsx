@@ -1,14 +1,19 @@
 ﻿import React, { useEffect, useState } from 'react';
 
-function XPBar({ userId }) {
-    const [xpData, setXpData] = useState(null);
+function XPBar({ userId, data }) {
+    const [xpData, setXpData] = useState(data ?? null);
 
     useEffect(() => {
-        fetch(`${import.meta.env.VITE_API_BASE_URL}/xp/${userId}`)
+        // Prefer data handed down from the /dashboard bootstrap; fetch only when rendered standalone.
+        if (data) {
+            setXpData(data);
+            return;
+        }
+        fetch(`${import.meta.env.VITE_API_BASE_URL}/xp/${userId}`, { credentials: 'include' })
             .then(res => res.json())
             .then(data => setXpData(data))
             .catch(err => console.error('Failed to fetch XP data:', err));
-    }, [userId]);
+    }, [userId, data]);
 
     if (!xpData) return null;
 
@@ -3,27 +3,31 @@ import CalendarHeatmap from 'react-calendar-heatmap';
 import 'react-calendar-heatmap/dist/styles.css';
 import './calendar-custom.css'; // optional custom style
 
-const XPHeatmap = ({ userId }) => {
+const toHeatmapValues = (data) =>
+    Object.entries(data || {}).map(([date, count]) => ({
+        date,
+        count: count || 0,
+    }));
+
+const XPHeatmap = ({ userId, data }) => {
     const [heatmapData, setHeatmapData] = useState([]);
 
     useEffect(() => {
+        if (data) {
+            setHeatmapData(toHeatmapValues(data));
+            return;
+        }
         if (!userId) return;
 
-        fetch(`${import.meta.env.VITE_API_BASE_URL}/xp_heatmap/${userId}`, {
+        fetch(`${import.meta.env.VITE_API_BASE_URL}/xp_heatmap/${userId}?days=180`, {
             credentials: 'include'
         })
             .then(res => res.json())
-            .then(data => {
-                const mapped = Object.entries(data || {}).map(([date, count]) => ({
-                    date,
-                    count: count || 0,
-                }));
-                setHeatmapData(mapped);
-            })
+            .then(data => setHeatmapData(toHeatmapValues(data)))
             .catch(err => {
                 console.error('Failed to load XP heatmap data:', err);
             });
-    }, [userId]);
+    }, [userId, data]);
 
     return (
         <div className="bg-[#1a1a1d] p-6 rounded-xl border border-gray-700 mt-6">
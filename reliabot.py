@@ -1,13 +1,30 @@
+import time
+STARTED = time.perf_counter()  # before the heavy imports, so the startup report includes them
+
 import discord
 from discord import app_commands
 from discord.ext import commands, tasks
-from openai import OpenAI
 import os
 import random
+import re
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timedelta
 import asyncio
+import gzip
+import hashlib
+import json
+import shutil
+import tempfile
+import traceback
 import db
+import async_db
+import ai
+import metrics
+import export
+from scheduler import ReminderScheduler, resolve_timezone
+from fanout import DMFanout
+from changefeed import ChangeFeed
+from messages import AFFIRMATIONS, QUOTES
 
 # === Load Environment Variables ===
 load_dotenv()
@@ -16,54 +33,136 @@ load_dotenv()
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
-bot = commands.Bot(command_prefix="/", intents=intents)
+DISCORD_DEV_GUILD_ID = os.getenv("DISCORD_DEV_GUILD_ID")  # set: sync commands to this guild only (instant, for development)
+DISCORD_FORCE_SYNC = os.getenv("DISCORD_FORCE_SYNC", "").lower() in ("1", "true", "yes")
 
-# === Initialize Database ===
-db.init_db()
+class Reliabot(commands.Bot):
+    async def setup_hook(self):
+        await startup()  # see Startup below
+
+    async def close(self):
+        try:
+            await change_feed.stop()
+            await ai.close()  # the shared OpenAI client's connection pool
+        finally:
+            await super().close()
+
+bot = Reliabot(command_prefix="/", intents=intents)
+change_feed = ChangeFeed()
+
+# === Metrics ===
+BOT_METRICS_PORT = os.getenv("BOT_METRICS_PORT") or os.getenv("METRICS_PORT")  # unset: no metrics server
+command_seconds = metrics.histogram("command_seconds", "Slash command latency from the interaction's creation",
+                                    ("command", "status"), buckets=(0.1, 0.25, 0.5, 1, 2, 3, 5, 10, 15, 30))
+metrics_server = None
 
-# === On Ready Event ===
 @bot.event
-async def on_ready():
-    print(f'🤖 {bot.user} is online!')
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    elapsed = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+    command_seconds.observe(elapsed, command=command.qualified_name, status="ok")
+
+@bot.tree.error
+async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    name = interaction.command.qualified_name if interaction.command else "unknown"
+    elapsed = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+    command_seconds.observe(elapsed, command=name, status="error")
+    print(f"🚨 Error in /{name}:")
+    traceback.print_exception(type(error), error, error.__traceback__)
+
+# === Startup ===
+# One-time work runs in setup_hook, once per process before the gateway
+# connects. on_ready fires again after every reconnect, so it only reports.
+startup_timings = {}  # phase -> seconds, printed once the bot is first ready
+setup_finished = None
+
+async def _timed_step(name, coro):
+    started = time.perf_counter()
+    result = await coro
+    startup_timings[name] = time.perf_counter() - started
+    return result
+
+def command_fingerprint(guild=None):
+    """A hash of the command tree as Discord would receive it; it changes only when a command does."""
+    payload = [command.to_dict(bot.tree) for command in bot.tree.get_commands(guild=guild)]
+    payload.sort(key=lambda command: (command.get("type", 1), command["name"]))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+async def sync_commands():
+    """Sync slash commands only when the tree differs from the last sync recorded in the database.
+
+    With DISCORD_DEV_GUILD_ID they go to that guild alone, which updates
+    immediately; otherwise globally. DISCORD_FORCE_SYNC=1 syncs regardless.
+    """
+    guild = discord.Object(id=int(DISCORD_DEV_GUILD_ID)) if DISCORD_DEV_GUILD_ID else None
+    if guild is not None:
+        bot.tree.copy_global_to(guild=guild)
+    key = f"command_tree:{bot.application_id}:{DISCORD_DEV_GUILD_ID or 'global'}"
+    fingerprint = command_fingerprint(guild)
+    if not DISCORD_FORCE_SYNC and await async_db.get_state(key) == fingerprint:
+        print("🔧 Slash commands unchanged; skipped sync.")
+        return
     try:
-        synced = await bot.tree.sync()
-        print(f"🔧 Synced {len(synced)} slash commands.")
+        synced = await bot.tree.sync(guild=guild)
     except Exception as e:
         print(f"Error syncing commands: {e}")
-    schedule_daily_checkins.start()
+        return
+    await async_db.set_state(key, fingerprint)
+    print(f"🔧 Synced {len(synced)} slash commands{f' to guild {DISCORD_DEV_GUILD_ID}' if guild else ''}.")
+
+async def startup():
+    global metrics_server, setup_finished
+    version = await _timed_step("init_db", async_db.init_db())
+    print(f"🗄️ Schema version {version}.")
+    await _timed_step("command_sync", sync_commands())
+    change_feed.start()  # keeps the cache and /done suggestions in step with dashboard writes
+    if BOT_METRICS_PORT and metrics_server is None:
+        metrics_server = await metrics.start_http_server(int(BOT_METRICS_PORT))
+    if not schedule_daily_checkins.is_running():
+        schedule_daily_checkins.start()
+    setup_finished = time.perf_counter()
+
+# === On Ready Event ===
+@bot.event
+async def on_ready():
+    print(f'🤖 {bot.user} is online!')
+    print(f"🗄️ DB pool: {db.pool_stats()}")
+    if "gateway" not in startup_timings and setup_finished is not None:
+        now = time.perf_counter()
+        startup_timings["gateway"] = now - setup_finished
+        print(f"⏱️ Ready in {now - STARTED:.2f}s: "
+              + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in startup_timings.items()))
 
 # === Motivational GPT Command ===
+MOTIVATE_EDIT_INTERVAL = float(os.getenv("MOTIVATE_EDIT_INTERVAL", "1.0"))  # seconds between streamed edits
+
 @bot.tree.command(name="motivate", description="Get a motivational boost from GPT-3.5")
 @app_commands.describe(input="What are you struggling with?")
 async def motivate(interaction: discord.Interaction, input: str = "I need motivation."):
     await interaction.response.defer()
-    try:
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a motivational coach who helps people refocus."},
-                {"role": "user", "content": input}
-            ],
-            max_tokens=100,
-            temperature=0.9
-        )
-        message = response.choices[0].message.content.strip()
-        await interaction.followup.send(f"🌟 {message}")
-    except Exception as e:
-        await interaction.followup.send(f"⚠️ GPT error: {e}")
+    message = None
+    last_edit = 0.0
+
+    async def on_text(text):
+        # Post as soon as the first token lands, then grow the message in place.
+        nonlocal message, last_edit
+        now = asyncio.get_running_loop().time()
+        if message is None:
+            message = await interaction.followup.send(f"🌟 {text.strip()}", wait=True)
+            last_edit = now
+        elif now - last_edit >= MOTIVATE_EDIT_INTERVAL:
+            await message.edit(content=f"🌟 {text.strip()}")
+            last_edit = now
+
+    text, _ = await ai.motivation.respond(interaction.user.id, input, on_text=on_text)
+    if message is None:
+        await interaction.followup.send(f"🌟 {text}")
+    else:
+        await message.edit(content=f"🌟 {text}")
 
 # === Affirmation and Encouragement Commands ===
 @bot.tree.command(name="affirmation", description="Send a gentle positive affirmation")
 async def affirmation(interaction: discord.Interaction):
-    affirmations = [
-        "You are enough, exactly as you are. 💛",
-        "Progress over perfection. 🌱",
-        "You can begin again, any moment. 🌀",
-        "Your effort matters more than the result. 🎯",
-        "You’re not behind. You’re on your own path. 🌄"
-    ]
-    await interaction.response.send_message(random.choice(affirmations))
+    await interaction.response.send_message(random.choice(AFFIRMATIONS))
 
 @bot.tree.command(name="panic", description="Send a calming message if you're overwhelmed")
 async def panic(interaction: discord.Interaction):
@@ -100,77 +199,254 @@ async def buddy(interaction: discord.Interaction):
 
 @bot.tree.command(name="quote", description="Send a motivational quote")
 async def quote(interaction: discord.Interaction):
-    quotes = [
-        "“Action is the foundational key to all success.” – Pablo Picasso",
-        "“Done is better than perfect.” – Sheryl Sandberg",
-        "“You don’t have to be great to start, but you have to start to be great.” – Zig Ziglar",
-        "“Success is the sum of small efforts repeated day in and day out.” – R. Collier",
-        "“Start where you are. Use what you have. Do what you can.” – Arthur Ashe"
-    ]
-    await interaction.response.send_message(random.choice(quotes))
+    await interaction.response.send_message(random.choice(QUOTES))
 
 # === Task Management Commands ===
+TASK_MAX_LENGTH = 255
+
+def split_tasks(text):
+    """One task per non-empty line, with list bullets like "-", "*" or "1." stripped."""
+    tasks = []
+    for line in text.splitlines():
+        line = re.sub(r"^\s*(?:(?:[-*•]|\d+[.)])\s+|\[ ?\]\s*)", "", line).strip()
+        if line:
+            tasks.append(line[:TASK_MAX_LENGTH])
+    return tasks
+
+async def add_tasks_reply(interaction, text):
+    tasks = split_tasks(text)
+    if not tasks:
+        await interaction.response.send_message("⚠️ That didn't contain any tasks.")
+    elif len(tasks) == 1:
+        await async_db.add_task(str(interaction.user.id), tasks[0])
+        await interaction.response.send_message(f"✅ Task added: {tasks[0]}")
+    else:
+        await async_db.add_tasks(str(interaction.user.id), tasks)
+        listed = "\n".join(f"- {t[:80]}" for t in tasks[:15])
+        more = f"\n…and {len(tasks) - 15} more" if len(tasks) > 15 else ""
+        await interaction.response.send_message(f"✅ Added {len(tasks)} tasks:\n{listed}{more}")
+
+class AddTasksModal(discord.ui.Modal, title="Add tasks"):
+    tasks = discord.ui.TextInput(
+        label="One task per line",
+        style=discord.TextStyle.paragraph,
+        placeholder="Reply to emails\nGym at 6\nRead 20 pages",
+        max_length=4000,
+    )
+
+    async def on_submit(self, interaction: discord.Interaction):
+        await add_tasks_reply(interaction, self.tasks.value)
+
 @bot.tree.command(name="addtask", description="Add a task to your to-do list")
-@app_commands.describe(task="Describe your task")
-async def addtask(interaction: discord.Interaction, task: str):
-    db.add_task(str(interaction.user.id), task)
-    await interaction.response.send_message(f"✅ Task added: {task}")
+@app_commands.describe(task="Describe your task (leave empty to paste several, one per line)")
+async def addtask(interaction: discord.Interaction, task: str = None):
+    if task is None:
+        await interaction.response.send_modal(AddTasksModal())
+    else:
+        await add_tasks_reply(interaction, task)
+
+# === Paged Listings ===
+# /progress and /listdone fetch one keyset page at a time and flip pages with
+# buttons, so a long list never runs into Discord's 2,000-character limit.
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "15"))  # 15 lines of up to ~110 characters fit one message
+PAGER_TIMEOUT = 300
+
+class Pager(discord.ui.View):
+    """Prev/Next buttons over ``fetch(after) -> (rows, next_after)``; only the user who ran the command can page."""
+
+    def __init__(self, user_id, fetch, render):
+        super().__init__(timeout=PAGER_TIMEOUT)
+        self.user_id = user_id
+        self.fetch = fetch
+        self.render = render
+        self.starts = [None]  # the key each page so far started after, so Prev can go back
+        self.next_after = None
+
+    async def load(self):
+        rows, self.next_after = await self.fetch(self.starts[-1])
+        self.prev_page.disabled = len(self.starts) == 1
+        self.next_page.disabled = self.next_after is None
+        return rows, self.render(rows, len(self.starts))
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        return str(interaction.user.id) == self.user_id
+
+    @discord.ui.button(label="◀ Prev", style=discord.ButtonStyle.secondary)
+    async def prev_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.starts.pop()
+        _, content = await self.load()
+        await interaction.response.edit_message(content=content, view=self)
+
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.starts.append(self.next_after)
+        _, content = await self.load()
+        await interaction.response.edit_message(content=content, view=self)
+
+async def send_paged(interaction, fetch, render, empty):
+    pager = Pager(str(interaction.user.id), fetch, render)
+    rows, content = await pager.load()
+    if not rows:
+        await interaction.response.send_message(empty)
+    elif pager.next_after is None:
+        await interaction.response.send_message(content)
+    else:
+        await interaction.response.send_message(content, view=pager)
 
 @bot.tree.command(name="progress", description="View your current tasks")
 async def progress(interaction: discord.Interaction):
-    tasks = db.get_tasks(str(interaction.user.id))
-    if tasks:
-        await interaction.response.send_message("📋 Your tasks:\n" + "\n".join(f"- {t}" for t in tasks))
-    else:
-        await interaction.response.send_message("You haven’t added any tasks yet. Use `/addtask` to start!")
+    user_id = str(interaction.user.id)
+    await send_paged(
+        interaction,
+        lambda after: async_db.get_tasks_page(user_id, LIST_PAGE_SIZE, after, "open"),
+        lambda tasks, page: f"📋 Your tasks (page {page}):\n" + "\n".join(f"- {t['task'][:100]}" for t in tasks),
+        "You haven’t got any open tasks. Use `/addtask` to start!")
 
 @bot.tree.command(name="done", description="Mark a task as completed")
-@app_commands.describe(task="The task to mark as done")
+@app_commands.describe(task="The task to mark as done (pick from the suggestions)")
 async def done(interaction: discord.Interaction, task: str):
-    if db.complete_task(str(interaction.user.id), task):
-        await interaction.response.send_message(f"🎉 Task marked as done: {task}")
+    user_id = str(interaction.user.id)
+    # Suggestions submit "id:<task id>"; anything else is treated as the task's text.
+    task_id = _choice_task_id(task)
+    completed = await async_db.complete_task_by_id(user_id, task_id) if task_id is not None else None
+    if completed is None and await async_db.complete_task(user_id, task):
+        completed = task
+    if completed is not None:
+        await interaction.response.send_message(f"🎉 Task marked as done: {completed}")
     else:
         await interaction.response.send_message("⚠️ Couldn't find that task. Check `/progress` to see your list.")
 
+TASK_ID_CHOICE = re.compile(r"id:([0-9]{1,10})")
+MAX_TASK_ID = 2 ** 31 - 1  # tasks.id is an INTEGER
+
+def _choice_task_id(value):
+    """The task id in an autocomplete value, or ``None`` for typed text (even "2024")."""
+    match = TASK_ID_CHOICE.fullmatch(value)
+    if match and int(match.group(1)) <= MAX_TASK_ID:
+        return int(match.group(1))
+    return None
+
+@done.autocomplete("task")
+async def done_autocomplete(interaction: discord.Interaction, current: str):
+    matches = await async_db.search_open_tasks(str(interaction.user.id), current)
+    return [app_commands.Choice(name=text[:100], value=f"id:{task_id}") for task_id, text in matches]
+
+FIND_MAX_RESULTS = int(os.getenv("FIND_MAX_RESULTS", "10"))
+
+@bot.tree.command(name="find", description="Search your tasks by title, description or label")
+@app_commands.describe(
+    query="Words to look for (matches the start of words)",
+    status="Only open or only completed tasks",
+    label="Only tasks with this label"
+)
+@app_commands.choices(status=[
+    app_commands.Choice(name="Open", value="open"),
+    app_commands.Choice(name="Completed", value="done"),
+])
+async def find(interaction: discord.Interaction, query: str, status: app_commands.Choice[str] = None, label: str = None):
+    results = await async_db.search_tasks(str(interaction.user.id), query, status=status.value if status else None,
+                                          label=label, limit=FIND_MAX_RESULTS)
+    if results:
+        lines = [f"{'✅' if t['completed'] else '⬜'} {t['task'][:80]} (#{t['id']})" for t in results]
+        await interaction.response.send_message(f"🔍 Tasks matching “{query}”:\n" + "\n".join(lines))
+    else:
+        await interaction.response.send_message(f"🔍 No tasks match “{query}”.")
+
+EXPORT_ATTACHMENT_MAX_BYTES = int(os.getenv("EXPORT_ATTACHMENT_MAX_BYTES", str(10 * 1024 * 1024)))  # Discord's upload limit
+
+def _write_export_file(user_id, fmt, f):
+    """Export into temp file ``f``; if it is over the upload limit, return a gzipped copy instead."""
+    size = export.write_export(user_id, f, fmt)
+    f.seek(0)
+    if size <= EXPORT_ATTACHMENT_MAX_BYTES:
+        return f, False
+    compressed = tempfile.TemporaryFile()
+    with gzip.GzipFile(fileobj=compressed, mode="wb") as gz:
+        shutil.copyfileobj(f, gz)
+    compressed.seek(0)
+    return compressed, True
+
+@bot.tree.command(name="export", description="Download your tasks and completion history as a file")
+@app_commands.describe(format="CSV for spreadsheets, NDJSON for scripts")
+@app_commands.choices(format=[
+    app_commands.Choice(name="CSV", value="csv"),
+    app_commands.Choice(name="NDJSON", value="ndjson"),
+])
+async def export_command(interaction: discord.Interaction, format: app_commands.Choice[str] = None):
+    fmt = format.value if format else "csv"
+    await interaction.response.defer(ephemeral=True)
+    filename = f"reliabot-export.{export.FORMATS[fmt][1]}"
+    with tempfile.TemporaryFile() as f:
+        attachment, compressed = await asyncio.to_thread(_write_export_file, str(interaction.user.id), fmt, f)
+        if compressed:
+            filename += ".gz"
+        try:
+            if attachment.seek(0, os.SEEK_END) > EXPORT_ATTACHMENT_MAX_BYTES:
+                await interaction.followup.send("⚠️ Your history is too large to attach here. Export it from the dashboard instead.",
+                                                ephemeral=True)
+                return
+            attachment.seek(0)
+            await interaction.followup.send("📦 Here’s your Reliabot history.", file=discord.File(attachment, filename=filename),
+                                            ephemeral=True)
+        finally:
+            if attachment is not f:
+                attachment.close()
+
 @bot.tree.command(name="listdone", description="List your completed tasks")
 async def listdone(interaction: discord.Interaction):
-    completed = db.get_completed_tasks(str(interaction.user.id))
-    if completed:
-        formatted = "\n".join(f"- {task} ({date})" for task, date in completed)
-        await interaction.response.send_message("✅ Completed tasks:\n" + formatted)
-    else:
-        await interaction.response.send_message("You haven’t completed any tasks yet.")
+    user_id = str(interaction.user.id)
+    await send_paged(
+        interaction,
+        lambda after: async_db.get_completed_tasks_page(user_id, LIST_PAGE_SIZE, after),
+        lambda tasks, page: f"✅ Completed tasks (page {page}):\n" + "\n".join(
+            f"- {t['task'][:100]} ({t['completed_date']})" for t in tasks),
+        "You haven’t completed any tasks yet.")
 
 @bot.tree.command(name="clearcompleted", description="Clear all completed tasks")
 async def clearcompleted(interaction: discord.Interaction):
-    db.clear_completed_tasks(str(interaction.user.id))
+    await async_db.clear_completed_tasks(str(interaction.user.id))
     await interaction.response.send_message("🗑️ Your completed tasks list has been cleared.")
 
 @bot.tree.command(name="summary", description="Weekly task and streak summary")
 async def summary(interaction: discord.Interaction):
-    completed = db.get_completed_tasks(str(interaction.user.id))
-    this_week = [t for t in completed if (datetime.now().date() - datetime.strptime(t[1], "%Y-%m-%d").date()).days <= 7]
-    streak = db.get_streak(str(interaction.user.id))
+    week_start = (datetime.now().date() - timedelta(days=7)).isoformat()
+    this_week = await async_db.count_completed_tasks(str(interaction.user.id), since=week_start)
+    streak = await async_db.get_streak(str(interaction.user.id))
     await interaction.response.send_message(
-        f"📈 This week you completed {len(this_week)} tasks.\n🔥 Your current streak is {streak} day(s). Great work!")
+        f"📈 This week you completed {this_week} tasks.\n🔥 Your current streak is {streak} day(s). Great work!")
 
 @bot.tree.command(name="streak", description="Track your daily check-in streak")
 async def streak(interaction: discord.Interaction):
-    count = db.update_streak(str(interaction.user.id))
+    count = await async_db.update_streak(str(interaction.user.id))
     await interaction.response.send_message(f"🔥 Your current streak is {count} day(s)!")
 
-@bot.tree.command(name="setreminder", description="Set the hour (0–23) for your daily check-in reminder")
-@app_commands.describe(hour="Hour of the day in 24h format (e.g. 9 for 9AM, 18 for 6PM)")
-async def setreminder(interaction: discord.Interaction, hour: int):
+@bot.tree.command(name="setreminder", description="Set the time for your daily check-in reminder")
+@app_commands.describe(
+    hour="Hour of the day in 24h format (e.g. 9 for 9AM, 18 for 6PM)",
+    minute="Minute of the hour (0–59)",
+    timezone="IANA timezone, e.g. Europe/London or America/New_York (kept from last time if omitted)"
+)
+async def setreminder(interaction: discord.Interaction, hour: int, minute: int = 0, timezone: str = None):
     if not (0 <= hour <= 23):
         await interaction.response.send_message("⛔ Please enter a valid hour between 0 and 23.")
         return
-    db.set_reminder(str(interaction.user.id), hour)
-    await interaction.response.send_message(f"✅ Daily check-in reminder set to {hour:02d}:00.")
+    if not (0 <= minute <= 59):
+        await interaction.response.send_message("⛔ Please enter a valid minute between 0 and 59.")
+        return
+    try:
+        resolve_timezone(timezone)
+    except ValueError:
+        await interaction.response.send_message(f"⛔ Unknown timezone `{timezone}`. Try something like `Europe/London`.")
+        return
+    row = await async_db.set_reminder(str(interaction.user.id), hour, minute, timezone)
+    reminders.schedule(row["user_id"], row["reminder_hour"], row["reminder_minute"], row["timezone"], last_dm=row["last_dm"])
+    tz_name = row["timezone"] or resolve_timezone(None).key
+    await interaction.response.send_message(f"✅ Daily check-in reminder set to {hour:02d}:{minute:02d} ({tz_name}).")
 
 @bot.tree.command(name="stopreminder", description="Disable your daily check-in reminder")
 async def stopreminder(interaction: discord.Interaction):
-    db.clear_reminder(str(interaction.user.id))
+    await async_db.clear_reminder(str(interaction.user.id))
+    reminders.cancel(str(interaction.user.id))
     await interaction.response.send_message("🔕 Daily check-in reminder disabled.")
 
 # === Guide Command ===
@@ -187,8 +463,10 @@ async def guide_command(interaction: discord.Interaction):
         "/addtask — Add a task\n"
         "/progress — View tasks\n"
         "/done — Mark task as done\n"
+        "/find — Search your tasks\n"
         "/listdone — View completed tasks\n"
         "/clearcompleted — Clear completed tasks\n"
+        "/export — Download your history as a file\n"
         "/summary — Weekly summary of accomplishments\n"
         "/streak — Daily check-in streak\n"
         "/review — Weekly review prompt\n\n"
@@ -204,23 +482,58 @@ async def whoami(interaction: discord.Interaction):
     await interaction.response.send_message(f"Your Discord user ID is: {interaction.user.id}")
 
 # === Daily Check-In Scheduler ===
-@tasks.loop(minutes=1)
-async def schedule_daily_checkins():
-    now = datetime.now()
-    for user_id, hour, last_dm in db.get_reminder_users():
-        if hour is not None and now.hour == hour:
-            if last_dm != str(now.date()):
-                try:
-                    user = await bot.fetch_user(int(user_id))
-                    await user.send("👋 Daily check-in! How are you feeling today? What’s one thing you want to accomplish?")
-                    db.set_last_dm(user_id, str(now.date()))
-                except Exception as e:
-                    print(f"Failed to DM {user_id}: {e}")
-
-# === Run Bot ===
-bot.run(os.getenv("DISCORD_TOKEN"))
-
+CHECKIN_MESSAGE = "👋 Daily check-in! How are you feeling today? What’s one thing you want to accomplish?"
+CHECKIN_INTERVAL = 30  # seconds
+reminders = ReminderScheduler()
+checkin_fanout = DMFanout(bot)
+checkin_tick_seconds = metrics.histogram("checkin_tick_seconds", "Duration of one reminder loop tick",
+                                         buckets=(0.001, 0.01, 0.1, 0.5, 1, 5, 15, 30, 60, 120))
+checkin_tick_drift = metrics.gauge("checkin_tick_drift_seconds", "How late the last reminder tick started")
+checkin_dms = metrics.counter("checkin_dms_total", "Daily check-in DMs by result", ("result",))
+metrics.gauge("reminders_scheduled", "Reminders in the in-memory schedule", fn=lambda: len(reminders))
+last_tick = None
+unsaved_last_dm = {}  # user_id -> local date of a sent check-in whose last_dm write failed; retried each tick
 
+async def checkin_tick():
+    due = reminders.pop_due()
+    if due:
+        local_dates = dict(due)
+        sent, stats = await checkin_fanout.send(list(local_dates), CHECKIN_MESSAGE)
+        unsaved_last_dm.update((user_id, local_dates[user_id]) for user_id in sent)
+        checkin_dms.inc(stats["sent"], result="sent")
+        checkin_dms.inc(stats["failed"], result="failed")
+        print(f"📬 Check-ins: {stats['sent']}/{stats['total']} sent, {stats['failed']} failed "
+              f"in {stats['seconds']}s ({stats['per_second']}/s)")
+    if unsaved_last_dm:
+        # Until last_dm is stored, a restart would catch these users up and DM them twice.
+        saved = dict(unsaved_last_dm)
+        await async_db.set_last_dm_many(list(saved.items()))
+        for user_id, local_date in saved.items():
+            if unsaved_last_dm.get(user_id) == local_date:
+                del unsaved_last_dm[user_id]
 
+@tasks.loop(seconds=CHECKIN_INTERVAL)
+async def schedule_daily_checkins():
+    global last_tick
+    started = time.monotonic()
+    if last_tick is not None:
+        checkin_tick_drift.set(max(0.0, started - last_tick - CHECKIN_INTERVAL))
+    last_tick = started
+    with checkin_tick_seconds.time():
+        try:
+            await checkin_tick()
+        except Exception:
+            # An escaped error would stop the loop, and with it every later check-in.
+            print("🚨 Check-in tick failed:")
+            traceback.print_exc()
 
+@schedule_daily_checkins.before_loop
+async def load_reminders():
+    await bot.wait_until_ready()
+    reminders.load(await async_db.get_reminder_users())
+    print(f"⏰ Loaded {len(reminders)} reminder(s).")
 
+# === Run Bot ===
+if __name__ == "__main__":  # importable without connecting, e.g. by bench/bot.py
+    startup_timings["import"] = time.perf_counter() - STARTED
+    bot.run(os.getenv("DISCORD_TOKEN"))
@@ -0,0 +1,101 @@
+import heapq
+import itertools
+import os
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+DEFAULT_TIMEZONE = os.getenv("REMINDER_DEFAULT_TIMEZONE", "UTC")
+
+
+def resolve_timezone(name):
+    """Return a ZoneInfo for ``name`` (falling back to the default zone), or raise ValueError."""
+    try:
+        return ZoneInfo(name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {name}")
+
+
+class ReminderScheduler:
+    """Min-heap of each user's next daily reminder, keyed by UTC fire time.
+
+    ``pop_due`` only touches users whose reminder is due, so a tick costs
+    O(due users · log n) instead of a scan over everyone with a reminder.
+    Cancelled or rescheduled entries are left in the heap and skipped lazily.
+    """
+
+    def __init__(self):
+        self._heap = []     # [(fire_at_utc, token, user_id)]
+        self._entries = {}  # user_id -> {"hour", "minute", "tz", "token"}
+        self._tokens = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self, rows, now=None):
+        """Schedule every reminder row at startup, catching up on any missed today."""
+        now = now or datetime.now(timezone.utc)
+        for row in rows:
+            try:
+                self.schedule(row["user_id"], row["reminder_hour"], row["reminder_minute"] or 0,
+                              row["timezone"], last_dm=row["last_dm"], now=now, catch_up=True)
+            except ValueError as e:
+                print(f"Skipping reminder for {row['user_id']}: {e}")
+
+    def schedule(self, user_id, hour, minute=0, tz=None, last_dm=None, now=None, catch_up=False):
+        """(Re)schedule a user's reminder.
+
+        With ``catch_up`` a reminder whose time already passed today, and that
+        was not sent today (``last_dm``), fires immediately; otherwise the next
+        occurrence strictly after ``now`` is used.
+        """
+        tzinfo = resolve_timezone(tz)
+        now = now or datetime.now(timezone.utc)
+        local_today = now.astimezone(tzinfo).date()
+        fire_at = datetime.combine(local_today, time(hour, minute), tzinfo=tzinfo)
+        sent_today = last_dm is not None and str(last_dm) == local_today.isoformat()
+        if fire_at <= now:
+            if catch_up and not sent_today:
+                fire_at = now
+            else:
+                fire_at = self._next_fire(local_today + timedelta(days=1), hour, minute, tzinfo)
+        elif sent_today:
+            fire_at = self._next_fire(local_today + timedelta(days=1), hour, minute, tzinfo)
+        self._push(user_id, hour, minute, tzinfo, fire_at)
+
+    def cancel(self, user_id):
+        self._entries.pop(user_id, None)
+
+    def next_fire(self, user_id):
+        entry = self._entries.get(user_id)
+        return entry and entry["fire_at"]
+
+    def pop_due(self, now=None):
+        """Return ``[(user_id, local_date_iso)]`` for reminders due at ``now`` and schedule their next day."""
+        now = now or datetime.now(timezone.utc)
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, token, user_id = heapq.heappop(self._heap)
+            entry = self._entries.get(user_id)
+            if entry is None or entry["token"] != token:
+                continue
+            local_date = fire_at.astimezone(entry["tz"]).date()
+            due.append((user_id, local_date.isoformat()))
+            next_fire = self._next_fire(local_date + timedelta(days=1), entry["hour"], entry["minute"], entry["tz"])
+            self._push(user_id, entry["hour"], entry["minute"], entry["tz"], next_fire)
+        return due
+
+    def _push(self, user_id, hour, minute, tzinfo, fire_at):
+        token = next(self._tokens)
+        self._entries[user_id] = {"hour": hour, "minute": minute, "tz": tzinfo, "token": token, "fire_at": fire_at}
+        heapq.heappush(self._heap, (fire_at.astimezone(timezone.utc), token, user_id))
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._compact()
+
+    def _compact(self):
+        self._heap = [item for item in self._heap
+                      if item[2] in self._entries and self._entries[item[2]]["token"] == item[1]]
+        heapq.heapify(self._heap)
+
+    @staticmethod
+    def _next_fire(local_date, hour, minute, tzinfo):
+        return datetime.combine(local_date, time(hour, minute), tzinfo=tzinfo)
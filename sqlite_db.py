@@ -0,0 +1,1220 @@
+import collections
+import functools
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from cache import make_cache
+from labels import labels_text, normalize_labels
+from task_index import TaskIndex
+import metrics
+
+# Embedded storage behind the db.py interface, selected with DB_BACKEND=sqlite.
+# Every function here takes and returns the same shapes as its db.py namesake.
+SQLITE_PATH = os.getenv("SQLITE_PATH", "reliabot.sqlite3")
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "10"))          # seconds to wait on another process's write lock
+SQLITE_WRITE_BATCH = int(os.getenv("SQLITE_WRITE_BATCH", "64"))              # queued writes committed together
+SQLITE_STATEMENT_CACHE = int(os.getenv("SQLITE_STATEMENT_CACHE", "256"))     # prepared statements kept per connection
+SQLITE_CACHE_KB = int(os.getenv("SQLITE_CACHE_KB", "16384"))                 # page cache per connection
+SQLITE_CHANGE_RETENTION = float(os.getenv("SQLITE_CHANGE_RETENTION", "600"))  # seconds change-log rows are kept
+DB_NOTIFY = os.getenv("DB_NOTIFY", "1") != "0"
+SEARCH_MAX_TERMS = int(os.getenv("SEARCH_MAX_TERMS", "8"))
+TASKS_PAGE_SIZE = int(os.getenv("TASKS_PAGE_SIZE", "50"))
+PAGE_NULL_KEY = "-infinity"  # see db.PAGE_NULL_KEY; sorts before any ISO date as text
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+ORIGIN = uuid.uuid4().hex[:12]  # identifies this process's own change-log entries
+
+
+# === Types ===
+# Columns declared DATE / TIMESTAMPTZ / BOOLEAN come back as date / aware
+# datetime / bool, like psycopg2 returns them. Timestamps are stored as UTC
+# ISO-8601 text with fixed precision so they also sort correctly as text.
+
+def _adapt_timestamp(value):
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, _adapt_timestamp)
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+sqlite3.register_converter("TIMESTAMPTZ", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter("BOOLEAN", lambda value: value != b"0")
+
+
+def _timestamp(value):
+    """A datetime for ``value`` (datetime or ISO string), as a TIMESTAMPTZ parameter would be parsed."""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+def _date(value):
+    if value is None or type(value) is date:
+        return value
+    if isinstance(value, datetime):
+        return value.date()
+    return date.fromisoformat(str(value)[:10])
+
+
+def _id_list(values):
+    # Bound as one JSON parameter and expanded with json_each(), so the statement text never varies.
+    return json.dumps([int(value) for value in values])
+
+# === Schema ===
+SCHEMA = [
+    (1, "baseline schema", [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY,
+            streak INTEGER DEFAULT 0,
+            last_check DATE,
+            reminder_hour INTEGER,
+            last_dm DATE,
+            reminder_minute INTEGER DEFAULT 0,
+            timezone TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL REFERENCES users(user_id),
+            task TEXT,
+            completed BOOLEAN NOT NULL DEFAULT 0,
+            created_at TIMESTAMPTZ,
+            completed_at TIMESTAMPTZ,
+            completed_date DATE,
+            description TEXT DEFAULT '',
+            due_at TIMESTAMPTZ,
+            recurrence TEXT,
+            labels TEXT,
+            priority TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS user_daily_stats (
+            user_id TEXT NOT NULL,
+            day DATE NOT NULL,
+            completed_count INTEGER NOT NULL DEFAULT 0,
+            timed_count INTEGER NOT NULL DEFAULT 0,
+            total_completion_seconds REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            payload TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS legacy_imports (
+            source TEXT NOT NULL,
+            key TEXT NOT NULL,
+            PRIMARY KEY (source, key)
+        ) WITHOUT ROWID
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_users_reminder_hour ON users (reminder_hour) WHERE reminder_hour IS NOT NULL",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user_completed_date ON tasks (user_id, completed, completed_date)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user_created_at ON tasks (user_id, created_at DESC, id DESC)",
+    ]),
+    (2, "calendar indexes", [
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user_due_at ON tasks (user_id, due_at) WHERE due_at IS NOT NULL",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user_recurring ON tasks (user_id) WHERE recurrence IS NOT NULL",
+    ]),
+    (3, "full-text task search", [
+        # External-content FTS5 index kept in step with tasks by triggers. user_id is
+        # indexed too, so one user's matches are found without scanning anyone else's.
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+            user_id, task, description, labels,
+            content='tasks', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts (rowid, user_id, task, description, labels)
+            VALUES (new.id, new.user_id, new.task, new.description, new.labels);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, user_id, task, description, labels)
+            VALUES ('delete', old.id, old.user_id, old.task, old.description, old.labels);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF user_id, task, description, labels ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, user_id, task, description, labels)
+            VALUES ('delete', old.id, old.user_id, old.task, old.description, old.labels);
+            INSERT INTO tasks_fts (rowid, user_id, task, description, labels)
+            VALUES (new.id, new.user_id, new.task, new.description, new.labels);
+        END
+        ''',
+        "INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')",
+    ]),
+    (4, "per-user data versions", [
+        "ALTER TABLE users ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user_completed_page ON tasks (user_id, completed_date DESC, id DESC) WHERE completed = 1",
+    ]),
+    (5, "normalized task labels", [
+        '''
+        CREATE TABLE IF NOT EXISTS task_labels (
+            user_id TEXT NOT NULL,
+            label TEXT NOT NULL,
+            task_id INTEGER NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+            PRIMARY KEY (user_id, label, task_id)
+        ) WITHOUT ROWID
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_task_labels_task_id ON task_labels (task_id)",
+        '''
+        CREATE TABLE IF NOT EXISTS user_label_counts (
+            user_id TEXT NOT NULL,
+            label TEXT NOT NULL,
+            task_count INTEGER NOT NULL DEFAULT 0,
+            open_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, label)
+        ) WITHOUT ROWID
+        ''',
+        lambda conn: _rebuild_labels(conn, None),
+    ]),
+    (6, "app state", [
+        '''
+        CREATE TABLE IF NOT EXISTS app_state (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+        ''',
+    ]),
+    (7, "NULL-safe page keys", [
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user_created_page ON tasks (user_id, COALESCE(created_at, '-infinity') DESC, id DESC)",
+        "DROP INDEX IF EXISTS idx_tasks_user_completed_page",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user_completed_page ON tasks (user_id, COALESCE(completed_date, '-infinity') DESC, id DESC) WHERE completed = 1",
+    ]),
+]
+LATEST_VERSION = SCHEMA[-1][0]
+
+# === Connections ===
+# One writer thread owns the only writing connection; every other thread gets
+# its own read-only connection. In WAL mode readers never block the writer or
+# each other, and each reader sees the last committed state.
+
+def connect(read_only=True, path=None):
+    conn = sqlite3.connect(path or SQLITE_PATH, timeout=SQLITE_BUSY_TIMEOUT, detect_types=sqlite3.PARSE_DECLTYPES,
+                           isolation_level=None, check_same_thread=False, cached_statements=SQLITE_STATEMENT_CACHE)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")  # durable at checkpoints; a crash can only lose the last commits
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_KB}")
+    if read_only:
+        conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+class _Writer:
+    """The one thread that writes to the database.
+
+    Writes queued while a transaction runs are committed together (group
+    commit), each inside its own savepoint so a failing write rolls back alone.
+    """
+
+    def __init__(self):
+        self.conn = connect(read_only=False)
+        self.jobs = 0
+        self.batches = 0
+        self.failures = 0
+        self._queue = queue.SimpleQueue()
+        self._last_prune = 0.0
+        self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def thread(self):
+        return self._thread
+
+    def submit(self, fn, args, kwargs):
+        future = Future()
+        started = time.perf_counter()
+        self._queue.put((future, fn, args, kwargs))
+        try:
+            return future.result()
+        finally:
+            _write_wait_seconds.observe(time.perf_counter() - started)
+
+    def queued(self):
+        return self._queue.qsize()
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        try:
+            stopping = False
+            while not stopping:
+                job = self._queue.get()
+                if job is None:
+                    break
+                batch = [job]
+                while len(batch) < SQLITE_WRITE_BATCH:
+                    try:
+                        job = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if job is None:
+                        stopping = True
+                        break
+                    batch.append(job)
+                try:
+                    self._commit(batch)
+                except Exception as e:
+                    # Keep the writer alive: a dead thread would leave every later write waiting forever.
+                    print(f"🚨 SQLite write batch failed: {e!r}")
+                    self._abort(batch, e)
+        finally:
+            try:
+                self.conn.execute("PRAGMA optimize")
+            except sqlite3.Error:
+                pass
+            self.conn.close()
+
+    def _commit(self, batch):
+        conn = self.conn
+        _write_batch_size.observe(len(batch))
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as e:
+            for future, *_ in batch:
+                future.set_exception(e)
+            return
+        done = []
+        for future, fn, args, kwargs in batch:
+            _tx.changed, _tx.after_commit = {}, []
+            try:
+                conn.execute("SAVEPOINT job")
+                result = fn(*args, **kwargs)
+                if _tx.changed:
+                    _bump_data_versions(conn, _tx.changed)
+                if DB_NOTIFY and _tx.changed:
+                    _log_changes(conn, _tx.changed)
+                conn.execute("RELEASE job")
+            except BaseException as e:
+                self.failures += 1
+                future.set_exception(e)
+                if not self._rollback_job():
+                    # SQLite dropped the whole transaction: the jobs before this one were undone too.
+                    self._abort(batch, sqlite3.OperationalError(f"write batch rolled back: {e}"))
+                    return
+                continue
+            done.append((future, result, _tx.changed, _tx.after_commit))
+        try:
+            if time.monotonic() - self._last_prune > 60:
+                conn.execute("DELETE FROM changes WHERE created_at < ?", (time.time() - SQLITE_CHANGE_RETENTION,))
+                self._last_prune = time.monotonic()
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            self._abort(batch, e)
+            return
+        self.jobs += len(done)
+        self.batches += 1
+        self._publish(done)
+
+    def _rollback_job(self):
+        """Undo the current job's savepoint; ``False`` if the whole transaction is already gone."""
+        conn = self.conn
+        try:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK TO job")
+                conn.execute("RELEASE job")
+                return True
+        except sqlite3.Error:
+            pass
+        return False
+
+    def _abort(self, batch, error):
+        """Roll back what is left of the batch and fail every job not yet answered."""
+        try:
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+        except sqlite3.Error:
+            pass
+        for future, *_ in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    @staticmethod
+    def _publish(done):
+        for future, result, changed, after_commit in done:
+            for user_id in changed:
+                cache.invalidate_user(user_id)
+            for fn in after_commit:
+                try:
+                    fn()
+                except Exception as e:
+                    print(f"⚠️ After-commit hook failed: {e}")
+            future.set_result(result)
+
+
+_writer = None
+_lock = threading.Lock()
+_local = threading.local()  # per-thread reader connection
+_tx = threading.local()     # the writer's current job: changed users and after-commit hooks
+_readers = []
+_generation = 0  # bumped by close_pool() so threads reopen their reader
+
+
+def _get_writer():
+    global _writer
+    if _writer is None:
+        with _lock:
+            if _writer is None:
+                _writer = _Writer()
+    return _writer
+
+
+def _on_writer_thread():
+    return _writer is not None and threading.current_thread() is _writer.thread
+
+
+def _conn():
+    """The connection for the current thread: the writer's inside a write, else this thread's reader."""
+    if _on_writer_thread():
+        return _writer.conn
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.generation != _generation:
+        conn = connect()
+        with _lock:
+            _readers.append(conn)
+            _local.conn, _local.generation = conn, _generation
+    return conn
+
+
+def write(fn, *args, **kwargs):
+    """Run ``fn(*args, **kwargs)`` on the writer thread in a transaction and return its result.
+
+    Called from inside another write, ``fn`` joins that transaction.
+    """
+    if _on_writer_thread():
+        return fn(*args, **kwargs)
+    return _get_writer().submit(fn, args, kwargs)
+
+
+def _write(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return write(fn, *args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def get_connection():
+    """This thread's connection, for ad-hoc SQLite queries (read-only outside ``write``)."""
+    yield _conn()
+
+
+@contextmanager
+def read_snapshot():
+    """Run several db reads as one consistent read transaction on this thread's connection."""
+    conn = _conn()
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.execute("COMMIT")
+
+
+def pool_stats():
+    return {
+        "backend": "sqlite",
+        "path": SQLITE_PATH,
+        "readers": len(_readers),
+        "queued": _writer.queued() if _writer else 0,
+        "writes": _writer.jobs if _writer else 0,
+        "commits": _writer.batches if _writer else 0,
+        "failed_writes": _writer.failures if _writer else 0,
+    }
+
+
+def close_pool():
+    global _writer, _generation
+    with _lock:
+        writer, _writer = _writer, None
+        readers, _readers[:] = list(_readers), []
+        _generation += 1
+    if writer is not None:
+        writer.stop()
+    for conn in readers:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+# === Read Cache ===
+cache = make_cache()
+
+
+def _cached(name):
+    # Reads inside a write see uncommitted rows, so they skip the cache.
+    return cache.cached(name, bypass=_on_writer_thread)
+
+
+def _changed(user_id, event=None):
+    """Mark ``user_id``'s cached reads stale once the current write commits; see db._changed."""
+    events = _tx.changed.setdefault(str(user_id), [])
+    if event is not None:
+        events.append(event)
+
+
+def _after_commit(fn):
+    _tx.after_commit.append(fn)
+
+
+def cache_stats():
+    return cache.stats()
+
+# === Change Log ===
+# The SQLite stand-in for NOTIFY: each committed write appends one row per
+# changed user, with the same payload, and changefeed.py tails the table.
+
+def _json_default(value):
+    return value.isoformat()
+
+
+def change_payload(user_id, events):
+    return json.dumps({"user_id": user_id, "origin": ORIGIN, "events": events or [{"type": "changed"}]},
+                      default=_json_default)
+
+
+def _log_changes(conn, changed):
+    now = time.time()
+    conn.executemany("INSERT INTO changes (payload, created_at) VALUES (?, ?)",
+                     [(change_payload(user_id, events), now) for user_id, events in changed.items()])
+
+
+def _bump_data_versions(conn, user_ids):
+    conn.execute("UPDATE users SET data_version = data_version + 1 WHERE user_id IN (SELECT value FROM json_each(?))",
+                 (json.dumps(sorted(user_ids)),))
+
+
+@_cached("data_version")
+def get_data_version(user_id):
+    row = _conn().execute("SELECT data_version FROM users WHERE user_id = ?", (user_id,)).fetchone()
+    return row[0] if row else 0
+
+
+def latest_change_id(conn):
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM changes").fetchone()[0]
+
+
+def changes_since(conn, after_id, limit=500):
+    """``[(id, payload)]`` change-log rows after ``after_id``, oldest first."""
+    return conn.execute("SELECT id, payload FROM changes WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit)).fetchall()
+
+# === Open Task Index ===
+def _load_open_tasks(user_id):
+    return _conn().execute("SELECT id, task FROM tasks WHERE user_id = ? AND completed = 0", (user_id,)).fetchall()
+
+
+task_index = TaskIndex(_load_open_tasks)
+
+
+def search_open_tasks(user_id, query, limit=25):
+    """Up to ``limit`` ``(id, text)`` open tasks whose text starts with, then contains, ``query``."""
+    return task_index.search(user_id, query, limit)
+
+# === Init ===
+def current_version():
+    return _conn().execute("PRAGMA user_version").fetchone()[0]
+
+
+@_write
+def init_db():
+    """Create or upgrade the schema (tracked in PRAGMA user_version); return its version.
+
+    A schema step is an SQL statement or a ``fn(conn)`` for data that needs Python.
+    """
+    conn = _conn()
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, name, statements in SCHEMA:
+        if target <= version:
+            continue
+        print(f"🛠️ Applying SQLite schema {target}: {name}")
+        for statement in statements:
+            statement(conn) if callable(statement) else conn.execute(statement)
+        conn.execute(f"PRAGMA user_version = {target}")
+        version = target
+    return version
+
+def get_state(key):
+    """See db.get_state."""
+    row = _conn().execute("SELECT value FROM app_state WHERE key = ?", (key,)).fetchone()
+    return row["value"] if row else None
+
+
+@_write
+def set_state(key, value):
+    _conn().execute('''
+        INSERT INTO app_state (key, value) VALUES (?, ?)
+        ON CONFLICT (key) DO UPDATE SET value = excluded.value, updated_at = datetime('now')
+    ''', (key, value))
+
+# === Users ===
+def get_user(user_id):
+    return _conn().execute("SELECT * FROM users WHERE user_id = ?", (user_id,)).fetchone()
+
+
+@_write
+def set_reminder(user_id, hour, minute=0, timezone=None):
+    """Set a user's daily reminder; a ``None`` timezone keeps the one already stored."""
+    conn = _conn()
+    conn.execute('''
+        INSERT INTO users (user_id, reminder_hour, reminder_minute, timezone)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (user_id) DO UPDATE SET
+            reminder_hour = excluded.reminder_hour,
+            reminder_minute = excluded.reminder_minute,
+            timezone = COALESCE(excluded.timezone, users.timezone)
+    ''', (user_id, hour, minute, timezone))
+    return conn.execute('''
+        SELECT user_id, reminder_hour, reminder_minute, timezone, last_dm FROM users WHERE user_id = ?
+    ''', (user_id,)).fetchone()
+
+
+@_write
+def clear_reminder(user_id):
+    _conn().execute("UPDATE users SET reminder_hour = NULL WHERE user_id = ?", (user_id,))
+
+
+def _ensure_user(conn, user_id):
+    conn.execute("INSERT INTO users (user_id, streak, last_check) VALUES (?, 0, NULL) ON CONFLICT (user_id) DO NOTHING",
+                 (user_id,))
+
+# === Tasks ===
+_INSERT_TASK = '''
+    INSERT INTO tasks (user_id, created_at, task, description, due_at, recurrence, labels, priority, completed)
+    VALUES (?, ?, ?, COALESCE(?, ''), ?, ?, ?, ?, 0)
+'''
+_TASK_FIELDS = ("task", "description", "due_at", "recurrence", "labels", "priority")
+
+
+@_write
+def add_task(user_id, task, description='', due_at=None, recurrence=None, labels=None, priority=None):
+    created_at = datetime.now(timezone.utc)
+    labels = labels_text(labels)
+    conn = _conn()
+    _ensure_user(conn, user_id)
+    task_id = conn.execute(_INSERT_TASK, (user_id, created_at, task, description, _timestamp(due_at),
+                                          recurrence, labels, priority)).lastrowid
+    _add_labels(conn, user_id, [(task_id, labels)])
+    added = {
+        "id": task_id,
+        "user_id": user_id,
+        "task": task,
+        "description": description,
+        "due_at": due_at,
+        "recurrence": recurrence,
+        "labels": labels,
+        "priority": priority,
+        "completed": False,
+        "created_at": created_at,
+        "completed_at": None
+    }
+    _changed(user_id, {"type": "task_added", "task": added})
+    _after_commit(lambda: task_index.add(user_id, task_id, task))
+    return added
+
+
+@_cached("tasks")
+def get_tasks(user_id):
+    rows = _conn().execute('''
+        SELECT id, user_id, task, description, due_at, recurrence, labels, priority, completed, created_at, completed_at
+        FROM tasks
+        WHERE user_id = ?
+        ORDER BY created_at DESC
+    ''', (user_id,)).fetchall()
+    return [dict(row) for row in rows]
+
+def _filter_label_priority(where, params, user_id, label, priority, table=""):
+    if label:
+        where.append(f"{table}id IN (SELECT task_id FROM task_labels WHERE user_id = ? AND label = ?)")
+        params.extend((user_id, " ".join(label.split()).lower()))
+    if priority:
+        where.append(f"{table}priority = ?")
+        params.append(priority)
+
+
+_CREATED_KEY = "COALESCE(created_at, '-infinity')"
+_COMPLETED_KEY = "COALESCE(completed_date, '-infinity')"
+
+
+def _page_value(value, convert):
+    return value if value == PAGE_NULL_KEY else convert(value)
+
+
+def _page(rows, limit, key):
+    """See db._page."""
+    rows = [dict(row) for row in rows]
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, key(rows[-1])
+
+
+@_cached("tasks_page")
+def get_tasks_page(user_id, limit=TASKS_PAGE_SIZE, after=None, status=None, label=None, priority=None):
+    """See db.get_tasks_page."""
+    where = ["user_id = ?"]
+    params = [user_id]
+    if status in ("open", "done"):
+        where.append("completed = ?")
+        params.append(status == "done")
+    _filter_label_priority(where, params, user_id, label, priority)
+    if after is not None:
+        where.append(f"({_CREATED_KEY}, id) < (?, ?)")
+        params.extend((_page_value(after[0], _timestamp), after[1]))
+    rows = _conn().execute(f'''
+        SELECT id, user_id, task, description, due_at, recurrence, labels, priority, completed, created_at, completed_at
+        FROM tasks
+        WHERE {" AND ".join(where)}
+        ORDER BY {_CREATED_KEY} DESC, id DESC
+        LIMIT ?
+    ''', params + [limit + 1]).fetchall()
+    return _page(rows, limit, lambda row: (row["created_at"] or PAGE_NULL_KEY, row["id"]))
+
+# Seconds from creation to completion of a tasks row (NULL if either is missing).
+_COMPLETION_SECONDS = "(julianday(completed_at) - julianday(created_at)) * 86400.0"
+
+_ROLLUP_APPLY = '''
+    INSERT INTO user_daily_stats (user_id, day, completed_count, timed_count, total_completion_seconds)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (user_id, day) DO UPDATE SET
+        completed_count = completed_count + excluded.completed_count,
+        timed_count = timed_count + excluded.timed_count,
+        total_completion_seconds = total_completion_seconds + excluded.total_completion_seconds
+'''
+
+
+def _rollup(conn, user_id, rows, sign):
+    """Fold ``(day, secs)`` of completed tasks into user_daily_stats; ``sign`` is 1 to add, -1 to remove."""
+    days = {}
+    for day, secs in rows:
+        if day is None:
+            continue
+        totals = days.setdefault(day, [0, 0, 0.0])
+        totals[0] += 1
+        if secs is not None:
+            totals[1] += 1
+            totals[2] += secs
+    conn.executemany(_ROLLUP_APPLY, [
+        (user_id, day, sign * count, sign * timed, sign * seconds)
+        for day, (count, timed, seconds) in days.items()
+    ])
+
+
+def _complete(user_id, where, params):
+    """Complete the open task(s) of ``user_id`` matching ``where``; return ``[(id, text)]``."""
+    completed_date = datetime.now().date()
+    completed_at = datetime.now(timezone.utc)
+    conn = _conn()
+    done = conn.execute(f'''
+        UPDATE tasks
+        SET completed = 1, completed_date = ?, completed_at = ?
+        WHERE {where} AND user_id = ? AND completed = 0
+        RETURNING id, task, completed_date, {_COMPLETION_SECONDS}, labels
+    ''', (completed_date, completed_at, *params, user_id)).fetchall()
+    _rollup(conn, user_id, [(day, secs) for _, _, day, secs, _ in done], 1)
+    _count_labels(conn, user_id, [(labels, True) for *_, labels in done], total=0, open=-1)
+    for task_id, *_ in done:
+        _changed(user_id, {"type": "task_completed", "id": task_id, "completed_at": completed_at})
+        _after_commit(lambda task_id=task_id: task_index.remove(user_id, task_id))
+    return [(task_id, text) for task_id, text, *_ in done]
+
+
+@_write
+def complete_task(user_id, task):
+    """Complete the oldest open task named ``task``; return whether one was found."""
+    return bool(_complete(user_id, '''id = (
+        SELECT id FROM tasks
+        WHERE user_id = ? AND task = ? AND completed = 0
+        ORDER BY created_at, id
+        LIMIT 1
+    )''', (user_id, task)))
+
+
+@_write
+def complete_task_by_id(user_id, task_id):
+    """Complete open task ``task_id`` (by primary key); return its text, or ``None``."""
+    done = _complete(user_id, "id = ?", (task_id,))
+    return done[0][1] if done else None
+
+
+def _delete(user_id, where, params):
+    conn = _conn()
+    deleted = conn.execute(f'''
+        DELETE FROM tasks
+        WHERE {where} AND user_id = ?
+        RETURNING id, completed, completed_date, {_COMPLETION_SECONDS}, labels
+    ''', (*params, user_id)).fetchall()
+    _rollup(conn, user_id, [(day, secs) for _, completed, day, secs, _ in deleted if completed], -1)
+    _count_labels(conn, user_id, [(labels, not completed) for _, completed, *_, labels in deleted], total=-1, open=-1)
+    return [row[0] for row in deleted]
+
+
+@_write
+def delete_task(user_id, task_id):
+    deleted = bool(_delete(user_id, "id = ?", (task_id,)))
+    if deleted:  # see db.delete_task
+        _changed(user_id, {"type": "task_deleted", "id": task_id})
+        _after_commit(lambda: task_index.remove(user_id, task_id))
+    return deleted
+
+# === Bulk Task Writes ===
+@_write
+def add_tasks(user_id, tasks):
+    """Insert many tasks for ``user_id`` in one transaction; return their ids in input order.
+
+    ``tasks`` holds task names or dicts with the ``add_task`` keyword fields.
+    """
+    tasks = [{"task": t} if isinstance(t, str) else t for t in tasks]
+    if not tasks:
+        return []
+    created_at = datetime.now(timezone.utc)
+    tasks = [{**t, "labels": labels_text(t.get("labels"))} for t in tasks]
+    conn = _conn()
+    _ensure_user(conn, user_id)
+    _changed(user_id)
+    ids = []
+    for t in tasks:
+        row = (user_id, created_at, *(t.get(field) for field in _TASK_FIELDS))
+        params = list(row)
+        params[4] = _timestamp(params[4])  # due_at
+        task_id = conn.execute(_INSERT_TASK, params).lastrowid
+        ids.append(task_id)
+        added = dict(zip(("id", "user_id", "created_at") + _TASK_FIELDS, (task_id, *row)))
+        added.update(description=added["description"] or "", completed=False, completed_at=None)
+        _changed(user_id, {"type": "task_added", "task": added})
+        _after_commit(lambda task_id=task_id, text=added["task"]: task_index.add(user_id, task_id, text))
+    _add_labels(conn, user_id, [(task_id, t["labels"]) for task_id, t in zip(ids, tasks)])
+    return ids
+
+
+@_write
+def complete_tasks(user_id, task_ids):
+    """Complete many open tasks by id and check in once; return ``(completed_ids, streak)``."""
+    if not task_ids:
+        return [], None
+    done = _complete(user_id, "id IN (SELECT value FROM json_each(?))", (_id_list(task_ids),))
+    streak = update_streak(user_id) if done else None
+    return [task_id for task_id, _ in done], streak
+
+
+@_write
+def delete_tasks(user_id, task_ids):
+    """Delete many of ``user_id``'s tasks by id; return the deleted ids."""
+    if not task_ids:
+        return []
+    deleted = _delete(user_id, "id IN (SELECT value FROM json_each(?))", (_id_list(task_ids),))
+    for task_id in deleted:
+        _changed(user_id, {"type": "task_deleted", "id": task_id})
+        _after_commit(lambda task_id=task_id: task_index.remove(user_id, task_id))
+    return deleted
+
+
+# === Labels ===
+# The same tables as db.py. Counts are adjusted from the labels the write
+# statements return, since task_labels rows of a deleted task are already gone.
+
+_LABEL_COUNTS_APPLY = '''
+    INSERT INTO user_label_counts (user_id, label, task_count, open_count)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (user_id, label) DO UPDATE SET
+        task_count = task_count + excluded.task_count,
+        open_count = open_count + excluded.open_count
+'''
+
+
+def _count_labels(conn, user_id, rows, total, open):
+    """Add ``total`` per task and ``open`` per open task to the counts of each label in ``rows`` ``(labels, is_open)``."""
+    deltas = collections.defaultdict(lambda: [0, 0])
+    for labels, is_open in rows:
+        for label in normalize_labels(labels):
+            deltas[label][0] += total
+            deltas[label][1] += open if is_open else 0
+    conn.executemany(_LABEL_COUNTS_APPLY, [(user_id, label, t, o) for label, (t, o) in sorted(deltas.items())])
+
+
+def _add_labels(conn, user_id, tasks):
+    """Map newly added open tasks ``[(task_id, labels)]`` to their labels and count them."""
+    conn.executemany("INSERT INTO task_labels (user_id, label, task_id) VALUES (?, ?, ?)", [
+        (user_id, label, task_id) for task_id, labels in tasks for label in normalize_labels(labels)
+    ])
+    _count_labels(conn, user_id, [(labels, True) for _, labels in tasks], total=1, open=1)
+
+
+def _rebuild_labels(conn, user_ids):
+    ids = json.dumps(user_ids) if user_ids is not None else None
+    for table in ("task_labels", "user_label_counts"):
+        conn.execute(f"DELETE FROM {table} WHERE ? IS NULL OR user_id IN (SELECT value FROM json_each(?))", (ids, ids))
+    rows = conn.execute('''
+        SELECT id, user_id, labels, completed FROM tasks
+        WHERE labels IS NOT NULL AND (? IS NULL OR user_id IN (SELECT value FROM json_each(?)))
+    ''', (ids, ids))
+    for task_id, user_id, labels, completed in rows:
+        conn.executemany("INSERT INTO task_labels (user_id, label, task_id) VALUES (?, ?, ?)",
+                         [(user_id, label, task_id) for label in normalize_labels(labels)])
+        _count_labels(conn, user_id, [(labels, not completed)], total=1, open=1)
+    return conn.execute("SELECT COUNT(*) FROM user_label_counts WHERE ? IS NULL OR user_id IN (SELECT value FROM json_each(?))",
+                        (ids, ids)).fetchone()[0]
+
+
+@_write
+def backfill_labels(user_ids=None):
+    """Rebuild task_labels and user_label_counts from tasks.labels, for ``user_ids`` or for everyone."""
+    rows = _rebuild_labels(_conn(), user_ids)
+    for user_id in user_ids or ():
+        _changed(user_id)
+    if user_ids is None:
+        _after_commit(cache.clear)
+    return rows
+
+
+@_cached("labels")
+def get_label_counts(user_id):
+    """See db.get_label_counts."""
+    rows = _conn().execute('''
+        SELECT label, task_count AS tasks, open_count AS open
+        FROM user_label_counts
+        WHERE user_id = ? AND task_count > 0
+        ORDER BY label
+    ''', (user_id,)).fetchall()
+    return [dict(row) for row in rows]
+
+# === Calendar ===
+_CALENDAR_COLUMNS = "id, task, description, due_at, recurrence, labels, priority, completed, created_at, completed_at"
+
+
+@_cached("calendar")
+def get_calendar_tasks(user_id, start, end):
+    """Tasks that can appear between ``start`` and ``end``; see db.get_calendar_tasks."""
+    rows = _conn().execute(f'''
+        SELECT {_CALENDAR_COLUMNS} FROM tasks
+        WHERE user_id = ? AND COALESCE(recurrence, '') = ''
+          AND due_at >= ? AND due_at < ?
+        UNION ALL
+        SELECT {_CALENDAR_COLUMNS} FROM tasks
+        WHERE user_id = ? AND COALESCE(recurrence, '') = ''
+          AND due_at IS NULL AND created_at >= ? AND created_at < ?
+        UNION ALL
+        SELECT {_CALENDAR_COLUMNS} FROM tasks
+        WHERE user_id = ? AND recurrence IS NOT NULL AND recurrence <> ''
+          AND COALESCE(due_at, created_at) < ?
+          AND (completed = 0 OR completed_at >= ?)
+    ''', (user_id, start, end, user_id, start, end, user_id, end, start)).fetchall()
+    return [dict(row) for row in rows]
+
+
+# === Task Search ===
+def search_terms(query):
+    """The lowercased words of ``query`` that are searched for, as in db.search_terms."""
+    return re.findall(r"[^\W_]+", (query or "").lower())[:SEARCH_MAX_TERMS]
+
+
+def _fts_query(user_id, terms):
+    # Every term is quoted (so FTS5 operators in user input are plain text) and matched as a prefix.
+    words = " AND ".join('"' + term.replace('"', '""') + '"*' for term in terms)
+    return f'user_id : "{user_id}" AND {{task description labels}} : ({words})'
+
+
+@_cached("search")
+def search_tasks(user_id, query, status=None, since=None, until=None, label=None, priority=None, limit=20, offset=0):
+    """See db.search_tasks; ranked by FTS5's bm25 with the title weighted highest."""
+    terms = search_terms(query)
+    where = ["t.user_id = ?"]
+    params = [user_id]
+    if status in ("open", "done"):
+        where.append("t.completed = ?")
+        params.append(status == "done")
+    if since is not None:
+        where.append("COALESCE(t.completed_at, t.created_at) >= ?")
+        params.append(_date(since).isoformat())
+    if until is not None:
+        where.append("COALESCE(t.completed_at, t.created_at) < date(?, '+1 day')")
+        params.append(_date(until).isoformat())
+    _filter_label_priority(where, params, user_id, label, priority, table="t.")
+    if terms:
+        # bm25 is lower-is-better; negated so rank sorts descending as in Postgres.
+        sql = f'''
+            SELECT {", ".join("t." + c for c in _CALENDAR_COLUMNS.split(", "))},
+                   -bm25(tasks_fts, 0.0, 10.0, 2.0, 5.0) AS rank
+            FROM tasks_fts JOIN tasks t ON t.id = tasks_fts.rowid
+            WHERE tasks_fts MATCH ? AND {" AND ".join(where)}
+        '''
+        params.insert(0, _fts_query(user_id, terms))
+    else:
+        sql = f"SELECT {_CALENDAR_COLUMNS}, 0.0 AS rank FROM tasks t WHERE {' AND '.join(where)}"
+    rows = _conn().execute(sql + " ORDER BY rank DESC, created_at DESC, id DESC LIMIT ? OFFSET ?",
+                           params + [limit, offset]).fetchall()
+    return [dict(row) for row in rows]
+
+
+@_cached("completed_tasks")
+def get_completed_tasks(user_id):
+    return _conn().execute('''
+        SELECT task, completed_date, created_at, completed_at
+        FROM tasks
+        WHERE user_id = ? AND completed = 1
+        ORDER BY completed_date DESC
+    ''', (user_id,)).fetchall()
+
+@_cached("completed_page")
+def get_completed_tasks_page(user_id, limit=TASKS_PAGE_SIZE, after=None):
+    """See db.get_completed_tasks_page."""
+    keyset = f"AND ({_COMPLETED_KEY}, id) < (?, ?)" if after is not None else ""
+    params = [user_id] + ([_page_value(after[0], _date), after[1]] if after is not None else [])
+    rows = _conn().execute(f'''
+        SELECT id, task, completed_date, created_at, completed_at
+        FROM tasks
+        WHERE user_id = ? AND completed = 1 {keyset}
+        ORDER BY {_COMPLETED_KEY} DESC, id DESC
+        LIMIT ?
+    ''', params + [limit + 1]).fetchall()
+    return _page(rows, limit, lambda row: (row["completed_date"] or PAGE_NULL_KEY, row["id"]))
+
+# === Daily Stats Rollup ===
+@_write
+def backfill_daily_stats(user_ids=None):
+    """Rebuild user_daily_stats from tasks, for ``user_ids`` or for everyone."""
+    conn = _conn()
+    ids = json.dumps(user_ids) if user_ids is not None else None
+    conn.execute("DELETE FROM user_daily_stats WHERE ? IS NULL OR user_id IN (SELECT value FROM json_each(?))",
+                 (ids, ids))
+    rows = conn.execute(f'''
+        INSERT INTO user_daily_stats (user_id, day, completed_count, timed_count, total_completion_seconds)
+        SELECT user_id, completed_date, COUNT(*), COUNT(secs), COALESCE(SUM(secs), 0)
+        FROM (
+            SELECT user_id, completed_date, {_COMPLETION_SECONDS} AS secs
+            FROM tasks
+            WHERE completed = 1 AND completed_date IS NOT NULL
+              AND (? IS NULL OR user_id IN (SELECT value FROM json_each(?)))
+        )
+        GROUP BY user_id, completed_date
+    ''', (ids, ids)).rowcount
+    for user_id in user_ids or ():
+        _changed(user_id)
+    if user_ids is None:
+        _after_commit(cache.clear)
+    return rows
+
+
+@_cached("completed_count")
+def count_completed_tasks(user_id, since=None):
+    """Number of completed tasks, optionally only those completed on or after ``since``."""
+    since = _date(since)
+    return _conn().execute('''
+        SELECT COALESCE(SUM(completed_count), 0)
+        FROM user_daily_stats
+        WHERE user_id = ? AND (? IS NULL OR day >= ?)
+    ''', (user_id, since, since)).fetchone()[0]
+
+
+@_cached("daily_stats")
+def get_daily_completion_stats(user_id, since, until=None):
+    """Per-day completion count and average completion time for ``since <= day [<= until]``."""
+    since, until = _date(since), _date(until)
+    rows = _conn().execute('''
+        SELECT day, completed_count, total_completion_seconds / NULLIF(timed_count, 0)
+        FROM user_daily_stats
+        WHERE user_id = ? AND completed_count > 0
+          AND day >= ?
+          AND (? IS NULL OR day <= ?)
+        ORDER BY day
+    ''', (user_id, since, until, until)).fetchall()
+    return {
+        day.isoformat(): {"count": count, "avg_seconds": float(avg) if avg is not None else None}
+        for day, count, avg in rows
+    }
+
+
+@_write
+def clear_completed_tasks(user_id):
+    conn = _conn()
+    deleted = conn.execute("DELETE FROM tasks WHERE user_id = ? AND completed = 1 RETURNING labels", (user_id,)).fetchall()
+    _count_labels(conn, user_id, [(labels, False) for labels, in deleted], total=-1, open=-1)
+    # Only completed tasks feed the rollup, so nothing is left for this user.
+    conn.execute("DELETE FROM user_daily_stats WHERE user_id = ?", (user_id,))
+    _changed(user_id, {"type": "completed_cleared"})
+
+# === Streak Engine ===
+# Writes are serialized by the writer thread, so the check-in upsert cannot race.
+
+@_write
+def update_streak(user_id, today=None):
+    """Record a check-in for ``today`` (default: the server's local date); return the new streak."""
+    today = _date(today) or datetime.now().date()
+    streak = _conn().execute('''
+        INSERT INTO users (user_id, streak, last_check)
+        VALUES (?, 1, ?)
+        ON CONFLICT (user_id) DO UPDATE SET
+            streak = CASE
+                WHEN users.last_check >= excluded.last_check THEN COALESCE(users.streak, 0)
+                WHEN users.last_check = date(excluded.last_check, '-1 day') THEN COALESCE(users.streak, 0) + 1
+                ELSE 1
+            END,
+            last_check = MAX(COALESCE(users.last_check, excluded.last_check), excluded.last_check)
+        RETURNING streak
+    ''', (user_id, today)).fetchone()[0]
+    _changed(user_id, {"type": "streak", "streak": streak})
+    return streak
+
+
+@_write
+def recompute_streaks(user_ids=None, today=None):
+    """Rebuild ``streak``/``last_check`` from completion days, for ``user_ids`` or for everyone.
+
+    Same rules as db.recompute_streaks. Returns the number of users updated.
+    """
+    today = _date(today) or datetime.now().date()
+    ids = json.dumps(user_ids) if user_ids is not None else None
+    updated = _conn().execute('''
+        WITH days AS (
+            SELECT user_id, day,
+                   julianday(day) - ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY day) AS run
+            FROM user_daily_stats
+            WHERE completed_count > 0 AND day <= ?
+              AND (? IS NULL OR user_id IN (SELECT value FROM json_each(?)))
+        ), runs AS (
+            SELECT user_id, MAX(day) AS last_day, COUNT(*) AS length,
+                   ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY MAX(day) DESC) AS recency
+            FROM days
+            GROUP BY user_id, run
+        )
+        UPDATE users
+        SET streak = runs.length, last_check = runs.last_day
+        FROM runs
+        WHERE runs.recency = 1 AND users.user_id = runs.user_id
+          AND (users.last_check IS NULL OR users.last_check <= runs.last_day)
+        RETURNING users.user_id, users.streak
+    ''', (today, ids, ids)).fetchall()
+    for user_id, streak in updated:
+        _changed(user_id, {"type": "streak", "streak": streak})
+    return len(updated)
+
+
+@_cached("streak")
+def get_streak(user_id):
+    user = get_user(user_id)
+    return user[1] if user else 0
+
+# === Reminders ===
+def get_reminder_users():
+    return _conn().execute('''
+        SELECT user_id, reminder_hour, reminder_minute, timezone, last_dm
+        FROM users
+        WHERE reminder_hour IS NOT NULL
+    ''').fetchall()
+
+
+@_write
+def set_last_dm(user_id, date):
+    _conn().execute("UPDATE users SET last_dm = ? WHERE user_id = ?", (_date(date), user_id))
+
+
+@_write
+def set_last_dm_many(pairs):
+    """Record ``last_dm`` for a batch of ``(user_id, date)`` pairs in one transaction."""
+    if not pairs:
+        return 0
+    return _conn().executemany("UPDATE users SET last_dm = ? WHERE user_id = ?",
+                               [(_date(day), user_id) for user_id, day in pairs]).rowcount
+
+# === Export ===
+_EXPORT_QUERIES = [
+    ("user", "SELECT user_id, streak, last_check, reminder_hour, reminder_minute, timezone FROM users WHERE user_id = ?"),
+    ("task", '''
+        SELECT id, task, description, labels, priority, recurrence, due_at,
+               completed, created_at, completed_at, completed_date
+        FROM tasks WHERE user_id = ?
+        ORDER BY created_at, id
+    '''),
+    ("day", '''
+        SELECT day, completed_count, avg_completion_seconds,
+               ROW_NUMBER() OVER (PARTITION BY run ORDER BY day) AS streak
+        FROM (
+            SELECT day, completed_count, total_completion_seconds / NULLIF(timed_count, 0) AS avg_completion_seconds,
+                   julianday(day) - ROW_NUMBER() OVER (ORDER BY day) AS run
+            FROM user_daily_stats WHERE user_id = ? AND completed_count > 0
+        ) days
+        ORDER BY day
+    '''),
+]
+
+
+def iter_export(user_id, batch_size=EXPORT_BATCH_SIZE):
+    """See db.iter_export. Uses its own connection, so it may be resumed on any thread."""
+    conn = connect()
+    try:
+        conn.execute("BEGIN")  # one snapshot across all three queries
+        for record_type, query in _EXPORT_QUERIES:
+            cur = conn.execute(query, (user_id,))
+            for rows in iter(lambda: cur.fetchmany(batch_size), []):
+                for row in rows:
+                    yield record_type, dict(row)
+    finally:
+        conn.close()
+
+# === Instrumentation ===
+# Shares db.py's per-function metrics, plus the writer's queueing and batching.
+_function_seconds = metrics.histogram("db_function_seconds", "Wall time of db.py functions, cache hits included", ("function",))
+_function_errors = metrics.counter("db_function_errors_total", "db.py function calls that raised", ("function",))
+_write_wait_seconds = metrics.histogram("sqlite_write_seconds", "Time from queueing a write to its commit")
+_write_batch_size = metrics.histogram("sqlite_write_batch_size", "Writes committed per SQLite transaction",
+                                      buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+
+
+def _timed(fn):
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            _function_errors.inc(function=name)
+            raise
+        finally:
+            _function_seconds.observe(time.perf_counter() - started, function=name)
+    return wrapper
+
+
+# The names db.py takes over when DB_BACKEND=sqlite.
+__all__ = [
+    "ORIGIN", "cache", "task_index", "change_payload", "get_connection", "read_snapshot",
+    "pool_stats", "close_pool", "cache_stats", "init_db", "get_state", "set_state", "search_open_tasks", "get_data_version",
+    "get_user", "set_reminder", "clear_reminder", "add_task", "get_tasks", "get_tasks_page",
+    "complete_task", "complete_task_by_id", "delete_task", "add_tasks", "complete_tasks", "delete_tasks",
+    "backfill_labels", "get_label_counts", "get_calendar_tasks", "search_tasks", "get_completed_tasks", "get_completed_tasks_page", "backfill_daily_stats", "count_completed_tasks", "get_daily_completion_stats",
+    "clear_completed_tasks", "update_streak", "recompute_streaks", "get_streak",
+    "get_reminder_users", "set_last_dm", "set_last_dm_many", "iter_export",
+]
+_UNTIMED = {"ORIGIN", "cache", "task_index", "change_payload", "get_connection", "read_snapshot",
+            "pool_stats", "close_pool", "cache_stats", "iter_export"}
+for _name in __all__:
+    if _name not in _UNTIMED:
+        globals()[_name] = _timed(globals()[_name])
@@ -0,0 +1,137 @@
+import bisect
+import os
+import threading
+import time
+from collections import OrderedDict
+
+TASK_INDEX_MAX_USERS = int(os.getenv("TASK_INDEX_MAX_USERS", "5000"))
+TASK_INDEX_TTL_SECONDS = float(os.getenv("TASK_INDEX_TTL_SECONDS", "300"))  # bounds staleness from other processes
+
+
+class _UserTasks:
+    """One user's open tasks: id -> text, plus (lowercased text, id) kept sorted for prefix search."""
+
+    def __init__(self, rows, expires_at):
+        self.expires_at = expires_at
+        self.by_id = {}
+        self.sorted = []
+        for task_id, text in rows:
+            self.add(task_id, text)
+
+    def add(self, task_id, text):
+        if task_id in self.by_id:
+            self.remove(task_id)
+        self.by_id[task_id] = text
+        bisect.insort(self.sorted, (text.lower(), task_id))
+
+    def remove(self, task_id):
+        text = self.by_id.pop(task_id, None)
+        if text is None:
+            return
+        entry = (text.lower(), task_id)
+        i = bisect.bisect_left(self.sorted, entry)
+        if i < len(self.sorted) and self.sorted[i] == entry:
+            del self.sorted[i]
+
+    def search(self, query, limit):
+        """Prefix matches in alphabetical order, then substring matches."""
+        query = query.lower().strip()
+        results = []
+        seen = set()
+        i = bisect.bisect_left(self.sorted, (query,))
+        while i < len(self.sorted) and len(results) < limit and self.sorted[i][0].startswith(query):
+            task_id = self.sorted[i][1]
+            results.append((task_id, self.by_id[task_id]))
+            seen.add(task_id)
+            i += 1
+        for lowered, task_id in self.sorted:
+            if len(results) >= limit:
+                break
+            if task_id not in seen and query in lowered:
+                results.append((task_id, self.by_id[task_id]))
+        return results
+
+
+class TaskIndex:
+    """In-memory index of each user's open tasks, for autocomplete and id lookups.
+
+    A user's tasks are loaded with ``loader(user_id) -> [(id, text)]`` on first
+    use and then kept current by ``add``/``remove`` from the write paths. Like
+    the read cache, a per-user generation stops a load that raced a write from
+    installing stale rows.
+    """
+
+    def __init__(self, loader, max_users=TASK_INDEX_MAX_USERS, ttl=TASK_INDEX_TTL_SECONDS):
+        self.loader = loader
+        self.max_users = max_users
+        self.ttl = ttl
+        self.loads = 0
+        self.lookups = 0
+        self._lock = threading.Lock()
+        self._users = OrderedDict()  # user_id -> _UserTasks
+        self._generations = {}
+
+    def _entry(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            self.lookups += 1
+            entry = self._users.get(user_id)
+            if entry is not None and entry.expires_at >= time.monotonic():
+                self._users.move_to_end(user_id)
+                return entry
+            generation = self._generations.get(user_id, 0)
+        self.loads += 1
+        entry = _UserTasks(self.loader(user_id), time.monotonic() + self.ttl)
+        with self._lock:
+            if self._generations.get(user_id, 0) == generation:
+                self._users[user_id] = entry
+                self._users.move_to_end(user_id)
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+        return entry
+
+    def search(self, user_id, query, limit=25):
+        """Return up to ``limit`` ``(id, text)`` open tasks matching ``query``."""
+        entry = self._entry(user_id)
+        with self._lock:
+            return entry.search(query, limit)
+
+    def get(self, user_id, task_id):
+        """Return the text of open task ``task_id`` or ``None``."""
+        entry = self._entry(user_id)
+        with self._lock:
+            return entry.by_id.get(task_id)
+
+    def add(self, user_id, task_id, text):
+        self._apply(user_id, lambda entry: entry.add(task_id, text))
+
+    def remove(self, user_id, task_id):
+        self._apply(user_id, lambda entry: entry.remove(task_id))
+
+    def invalidate_user(self, user_id):
+        self._apply(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            for user_id in self._users:
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self._users.clear()
+
+    def _apply(self, user_id, change):
+        user_id = str(user_id)
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            entry = self._users.get(user_id)
+            if entry is None:
+                return
+            if change is None:
+                del self._users[user_id]
+            else:
+                change(entry)
+
+    def stats(self):
+        return {
+            "users": len(self._users),
+            "lookups": self.lookups,
+            "loads": self.loads,
+        }